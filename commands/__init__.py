@@ -2,10 +2,9 @@
 テキストコマンド登録モジュール
 ? から始まるテキストベースコマンドを管理します
 """
-from typing import Callable, Awaitable
-
 import discord
 
+from .router import CommandHandler, TextCommandRouter
 from .balance import on_balance_command
 from .transfer import on_transfer_command
 from .exchange import on_exchange_command
@@ -18,11 +17,12 @@ from .blackjack import on_blackjack_command
 from .dice import on_dice_command
 from .hitandblow import on_hitandblow_command
 from .rps import on_rps_command
+from .seed import on_seed_command
 
 # ========================================
 # コマンド定義
 # ========================================
-TEXT_COMMANDS: dict[str, Callable[[discord.Message], Awaitable[None]]] = {
+TEXT_COMMANDS: dict[str, CommandHandler] = {
     "?残高": on_balance_command,
     "?送金": on_transfer_command,
     "?交換": on_exchange_command,
@@ -33,10 +33,24 @@ TEXT_COMMANDS: dict[str, Callable[[discord.Message], Awaitable[None]]] = {
     "?フリップ": on_coinflip_command,
     "?ダイス": on_dice_command,
     "?bj": on_blackjack_command,
+    "?シード": on_seed_command,
     # "?ヒットアンドブロー": on_hitandblow_command,
     # "?じゃんけん": on_rps_command
 }
 
+# 残高を動かすコマンド（ユーザーごとに1つずつ実行する）
+# ヒットアンドブローは対戦終了までハンドラーが戻らないため含めない
+LOCKED_COMMANDS: frozenset[str] = frozenset({
+    "?送金",
+    "?交換",
+    "?引換",
+    "?マインズ",
+    "?フリップ",
+    "?ダイス",
+    "?bj",
+    "?シード",
+})
+
 
 # ========================================
 # コマンド登録
@@ -48,19 +62,19 @@ async def register_all_text_commands(bot) -> None:
     Args:
         bot: Discordボットインスタンス
     """
+    router = TextCommandRouter()
+    for name, handler in TEXT_COMMANDS.items():
+        router.register(name, handler, locked=name in LOCKED_COMMANDS)
+
     @bot.event
     async def on_message(message: discord.Message) -> None:
         # ボット自身のメッセージは無視
         if message.author.bot:
             return
 
-        content = message.content.strip()
-
-        # テキストコマンドの処理
-        for cmd_prefix, handler in TEXT_COMMANDS.items():
-            if content.startswith(cmd_prefix):
-                await handler(message)
-                return
+        # テキストコマンドの処理（? で始まらないメッセージは解析せずに通常のコマンド処理へ）
+        if await router.dispatch(message):
+            return
 
         # 通常のコマンド処理
-        await bot.process_commands(message)
\ No newline at end of file
+        await bot.process_commands(message)
@@ -4,29 +4,31 @@
 """
 import discord
 
-from database.db import get_user_balance, users_collection
+from database import async_db
 from utils.embed_factory import EmbedFactory
+from commands.router import CommandArgs
 
 
-async def on_balance_command(message: discord.Message) -> None:
+async def on_balance_command(message: discord.Message, args: CommandArgs) -> None:
     """
     残高確認コマンドハンドラー
     
     Args:
         message: Discordメッセージオブジェクト
+        args: 解析済みのコマンド引数
     """
     user_id = message.author.id
 
     try:
         # ユーザー登録確認
-        user_info = users_collection.find_one({"user_id": user_id})
+        user_info = await async_db.get_user_info(user_id)
         if not user_info:
             embed = EmbedFactory.require_registration_prompt()
             await message.channel.send(embed=embed)
             return
 
         # 残高取得と表示
-        balance = get_user_balance(user_id)
+        balance = user_info.get("balance", 0)
         embed = EmbedFactory.balance_display(balance=balance)
         embed.set_author(name=f"{message.author.display_name} | {message.author.name}")
         embed.set_thumbnail(url=message.author.display_avatar.url)
@@ -1,30 +1,29 @@
 import discord
-import re
-import io
-from io import BytesIO
-import secrets
-import aiohttp
 
-from database.db import get_user_balance, update_user_balance, load_pf_params, save_pf_params
+from database import async_db
 from utils.embed import create_embed
 from utils.emojis import PNC_EMOJI_STR
 from utils.color import BLACKJACK_COLOR
 from utils.embed_factory import EmbedFactory
+from utils.avatar import avatar_service
+from utils.render import render_service
+from utils.seed_pool import acquire_game_seed
 
-from ui.game.blackjack import BlackjackGame, BlackjackView, blackjack_games
+from ui.game.assets import blackjack_assets
+from ui.game.blackjack import IMAGE_FILENAME, BlackjackGame, BlackjackView, blackjack_games
+from utils.session_registry import session_registry
 from config import CURRENCY_NAME
+from commands.router import CommandArgs
 
-async def on_blackjack_command(message: discord.Message):
+async def on_blackjack_command(message: discord.Message, args: CommandArgs):
     try:
-        pattern = r"\?bj\s+(\d+)"
-        match = re.match(pattern, message.content)
+        bet = args.int_arg(0)
 
-        if not match:
+        if bet is None:
             embed = create_embed("", "`?bj <掛け金>`の形式で入力してください。", discord.Color.red())
             await message.channel.send(embed=embed)
             return
 
-        bet = int(match.group(1))
         user = message.author
         user_id = user.id
         min_bet = 100
@@ -34,53 +33,57 @@ async def on_blackjack_command(message: discord.Message):
             await message.channel.send(embed=embed)
             return
 
-        balance = get_user_balance(user_id)
-        if balance is None:
+        rejected = session_registry.check_start("blackjack", user_id)
+        if rejected:
+            embed = create_embed("", rejected, discord.Color.red())
+            await message.channel.send(embed=embed)
+            return
+
+        # シードの取得・保存はDBへの書き込みで失敗しうるため、引き落とす前に行う
+        # （引き落とし後に失敗すると、精算するセッションがないまま賭け金だけが減る）
+        seed = await acquire_game_seed(user_id)
+        # rotate では acquire_game_seed() がnonceを進めているため保存不要
+        if seed.reveal:
+            await async_db.save_pf_params(user_id, seed.client_seed, seed.server_seed, seed.nonce + 1)
+
+        debit = await async_db.try_debit(user_id, bet)
+        if not debit.registered:
             embed = EmbedFactory.not_registered()
             await message.channel.send(embed=embed)
             return
-        if balance < bet:
-            embed = EmbedFactory.insufficient_balance(balance=balance)
+        if not debit.ok:
+            embed = EmbedFactory.insufficient_balance(balance=debit.balance)
             await message.channel.send(embed=embed)
             return
-        
-        update_user_balance(user_id, -bet)
 
-        params = load_pf_params(user_id)
-        if params and len(params) == 3:
-            client_seed, server_seed, nonce = params
-        else:
-            client_seed = secrets.token_hex(8)
-            server_seed = secrets.token_hex(32)
-            nonce = 0
-
-        game = BlackjackGame(bet=bet, client_seed=client_seed, nonce=nonce)
+        game = BlackjackGame(
+            bet=bet,
+            client_seed=seed.client_seed,
+            server_seed=seed.server_seed,
+            nonce=seed.nonce,
+            server_seed_hash=seed.server_seed_hash,
+            reveal_seed=seed.reveal
+        )
         game.deal_initial()
         blackjack_games[user_id] = game
 
-        save_pf_params(user_id, client_seed, server_seed, nonce + 1)
-
         await message.channel.send(f"🔐 サーバーシードハッシュ: `{game.pf.server_seed_hash}`")
 
         async with message.channel.typing():
-            async with aiohttp.ClientSession() as session:
-                async with session.get(user.display_avatar.url) as resp:
-                    avatar_bytes = BytesIO(await resp.read())
-
-            img = game.render_image(user_displayname=user.display_name, user_avatar_data=avatar_bytes)
-            buf = io.BytesIO()
-            img.save(buf, format='PNG')
-            buf.seek(0)
-            file = discord.File(buf, filename="blackjack.png")
+            user_icon = await avatar_service.get_avatar(user, blackjack_assets.ICON_SIZE[0])
+            buf = await render_service.render_encoded("blackjack", game.render_image, user_displayname=user.display_name, user_icon=user_icon)
+            file = discord.File(buf, filename=IMAGE_FILENAME)
 
             embed = create_embed(f"{CURRENCY_NAME}ブラックジャック", f"{user.mention}", BLACKJACK_COLOR)
-            embed.set_image(url="attachment://blackjack.png")
+            embed.set_image(url=f"attachment://{IMAGE_FILENAME}")
             embed.add_field(name="掛け金", value=f"{PNC_EMOJI_STR}`{bet:,}`", inline=False)
             embed.set_author(name=user.display_name, icon_url=user.display_avatar.url)
             embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1219916908485283880/1386317663231414272/ChatGPT_Image_2025622_21_11_08.png?ex=6859446f&is=6857f2ef&hm=19507da3f6ae2ea49377b1112e687a6690cd37bb229cc4ebcd5a1fef2c5965e6&")
 
             view = BlackjackView(user_id)
-            await message.channel.send(embed=embed, view=view, file=file)
+            game_message = await message.channel.send(embed=embed, view=view, file=file)
+            game.message_id = game_message.id
+            blackjack_games.save(user_id)
 
     except Exception as e:
         print(f"[ERROR] on_blackjack_command: {e}")
@@ -3,21 +3,22 @@ from discord import File
 import random
 import asyncio
 
-from database.db import get_user_balance, update_user_balance
+from database import async_db
 from utils.embed import create_embed
-from utils.logs import send_casino_log
+from utils.logs import log_transaction, send_casino_log
 from utils.color import BASE_COLOR_CODE
 from utils.emojis import PNC_EMOJI_STR, WIN_EMOJI
 from utils.embed_factory import EmbedFactory
 
 from ui.game.dice import ongoing_games
 from ui.game.dice import ContinueButton
+from utils.session_registry import session_registry
 from config import DICE_FOLDER, CURRENCY_NAME
+from commands.router import CommandArgs
 
-async def on_dice_command(message):
+async def on_dice_command(message, args: CommandArgs):
     try:
-        args = message.content.strip().split()
-        if len(args) != 2 or not args[1].isdigit():
+        if len(args) != 1 or args.int_arg(0) is None:
             embed = create_embed("", "`?ダイス 金額`の形式で入力してください。", discord.Color.red())
             embed.set_author(
                 name=f"{message.author.name}",
@@ -26,7 +27,7 @@ async def on_dice_command(message):
         
             return await message.channel.send(embed=embed)
 
-        bet_amount = int(args[1])
+        bet_amount = args.int_arg(0)
         min_bet = 50
         if bet_amount < min_bet:
             embed = EmbedFactory.bet_too_low(min_bet=min_bet)
@@ -37,19 +38,24 @@ async def on_dice_command(message):
             return await message.channel.send(embed=embed)
 
         user_id = message.author.id
-        balance = get_user_balance(user_id)
-        if balance is None:
+        rejected = session_registry.check_start("dice", user_id)
+        if rejected:
+            embed = create_embed("", rejected, discord.Color.red())
+            await message.channel.send(embed=embed)
+            return
+
+        debit = await async_db.try_debit(user_id, bet_amount)
+        if not debit.registered:
             embed = EmbedFactory.not_registered()
             await message.channel.send(embed=embed)
             return
-        if bet_amount > balance:
-            embed = EmbedFactory.insufficient_balance(balance=balance)
+        if not debit.ok:
+            embed = EmbedFactory.insufficient_balance(balance=debit.balance)
             embed.set_author(
                 name=f"{message.author.name}",
                 icon_url=message.author.display_avatar.url
             )
             return await message.channel.send(embed=embed)
-        update_user_balance(user_id, -bet_amount)
 
         def roll():
             return random.randint(1, 6), random.randint(1, 6)
@@ -91,7 +97,8 @@ async def on_dice_command(message):
 
         if total in [7, 11]:
             winnings = bet_amount * 2
-            update_user_balance(user_id, winnings)
+            await async_db.update_user_balance(user_id, winnings)
+            log_transaction(user_id, "dice", bet_amount, winnings)
             result_text = f"### {PNC_EMOJI_STR}`{winnings}` **WIN**"
             summary_embed = create_embed("", result_text, BASE_COLOR_CODE)
             await message.channel.send(embed=summary_embed)
@@ -109,6 +116,7 @@ async def on_dice_command(message):
             )
 
         elif total in [2, 3, 12]:
+            log_transaction(user_id, "dice", bet_amount, 0)
             result_text = f"### クラップス！\n# {PNC_EMOJI_STR}`{bet_amount}` **LOSE**"
             summary_embed = create_embed("", result_text, BASE_COLOR_CODE)
             await message.channel.send(embed=summary_embed)
@@ -116,8 +124,11 @@ async def on_dice_command(message):
         else:
             result_text = f"### ポイント: {total}\n# {PNC_EMOJI_STR}`{bet_amount}` 継続可能！"
             summary_embed = create_embed("", result_text, BASE_COLOR_CODE)
-            await message.channel.send(embed=summary_embed, view=ContinueButton(user_id, bet_amount, total))
-            ongoing_games[user_id] = {"bet": bet_amount, "point": total}
+            # ボタン送信中に掃除されないよう、先にセッションを登録してからメッセージIDを記録
+            ongoing_games[user_id] = {"bet": bet_amount, "point": total, "message_id": None}
+            summary_message = await message.channel.send(embed=summary_embed, view=ContinueButton(user_id, bet_amount, total))
+            ongoing_games[user_id]["message_id"] = summary_message.id
+            ongoing_games.save(user_id)
 
     except Exception as e:
         print("Dice error:", e)
@@ -4,9 +4,9 @@ PNC残高を景品に交換します（直接換金ではなく景品交換方
 """
 import discord
 
+from database import async_db
 from database.db import (
     get_user_balance,
-    update_user_balance,
     users_collection,
     get_prize_pocket,
     add_prizes_to_pocket,
@@ -25,14 +25,16 @@ from config import (
     PRIZE_SMALL_JPY,
     ACCOUNT_EXCHANGE_JPY
 )
+from commands.router import CommandArgs
 
 
-async def on_exchange_command(message: discord.Message) -> None:
+async def on_exchange_command(message: discord.Message, args: CommandArgs) -> None:
     """
     景品交換コマンドハンドラー
     
     Args:
         message: Discordメッセージオブジェクト
+        args: 解析済みのコマンド引数
     """
     # 機能が有効かチェック
     if not EXCHANGE_ENABLED:
@@ -210,6 +212,27 @@ async def on_exchange_command(message: discord.Message) -> None:
         await message.channel.send(embed=embed)
 
 
+async def debit_exchange_balance(interaction: discord.Interaction, user_id: int, balance: int) -> bool:
+    """
+    確認時の残高を原子的に引き落とす
+
+    残高条件付きで引き落とすため、確認ボタンの連打や確認中の他コマンドで
+    残高が減っていた場合は交換せず、エラーを表示します。
+
+    Returns:
+        bool: 引き落としに成功したか
+    """
+    debit = await async_db.try_debit(user_id, balance)
+    if debit.ok:
+        return True
+    if not debit.registered:
+        embed = EmbedFactory.not_registered()
+    else:
+        embed = EmbedFactory.insufficient_balance(debit.balance)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+    return False
+
+
 class ExchangeConfirmView(discord.ui.View):
     """景品交換確認ビュー"""
     
@@ -304,8 +327,9 @@ class ExchangeConfirmView(discord.ui.View):
             account_exchange_count: 交換するアカウント数
             carry_over_amount: 繰越ポイント額
         """
-        # 残高を減らす（元の残高のみ、繰越ポイント分も含めて）
-        update_user_balance(self.user.id, -self.balance)
+        # 残高を減らす（確認中に残高が減っていた場合は交換しない）
+        if not await debit_exchange_balance(interaction, self.user.id, self.balance):
+            return
         
         # 繰越ポイントをクリア
         if self.carry_over > 0:
@@ -325,7 +349,7 @@ class ExchangeConfirmView(discord.ui.View):
             add_carry_over_points(self.user.id, carry_over_amount)
         
         # 金銭トランザクションとして記録
-        log_financial_transaction(
+        await log_financial_transaction(
             user_id=self.user.id,
             transaction_type="exchange",
             amount=self.balance + self.carry_over,
@@ -478,8 +502,9 @@ class AccountExchangeView(discord.ui.View):
     
     async def _complete_with_account_exchange(self, interaction: discord.Interaction):
         """アカウント交換ありで完了"""
-        # 残高を減らす
-        update_user_balance(self.user.id, -self.balance)
+        # 残高を減らす（確認中に残高が減っていた場合は交換しない）
+        if not await debit_exchange_balance(interaction, self.user.id, self.balance):
+            return
         
         # 繰越ポイントをクリア
         if self.carry_over > 0:
@@ -499,7 +524,7 @@ class AccountExchangeView(discord.ui.View):
             add_carry_over_points(self.user.id, self.remainder_after)
         
         # 金銭トランザクションとして記録
-        log_financial_transaction(
+        await log_financial_transaction(
             user_id=self.user.id,
             transaction_type="exchange",
             amount=self.balance + self.carry_over,
@@ -578,8 +603,9 @@ class AccountExchangeView(discord.ui.View):
     
     async def _complete_with_carry_over(self, interaction: discord.Interaction):
         """繰越ポイントありで完了（アカウント交換なし）"""
-        # 残高を減らす
-        update_user_balance(self.user.id, -self.balance)
+        # 残高を減らす（確認中に残高が減っていた場合は交換しない）
+        if not await debit_exchange_balance(interaction, self.user.id, self.balance):
+            return
         
         # 繰越ポイントをクリア
         if self.carry_over > 0:
@@ -598,7 +624,7 @@ class AccountExchangeView(discord.ui.View):
         add_carry_over_points(self.user.id, self.remainder)
         
         # 金銭トランザクションとして記録
-        log_financial_transaction(
+        await log_financial_transaction(
             user_id=self.user.id,
             transaction_type="exchange",
             amount=self.balance + self.carry_over,
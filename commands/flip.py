@@ -4,11 +4,12 @@
 """
 import discord
 
-from database.db import get_user_balance
+from database import async_db
 from utils.emojis import PNC_EMOJI_STR
 from utils.embed_factory import EmbedFactory
 from ui.game.flip import CoinFlipView
 from config import THUMBNAIL_URL, FLIP_GIF_URL, CURRENCY_NAME
+from commands.router import CommandArgs
 
 # ========================================
 # 定数
@@ -16,17 +17,17 @@ from config import THUMBNAIL_URL, FLIP_GIF_URL, CURRENCY_NAME
 MIN_BET = 50
 
 
-async def on_coinflip_command(message: discord.Message) -> None:
+async def on_coinflip_command(message: discord.Message, args: CommandArgs) -> None:
     """
     コインフリップコマンドハンドラー
     
     Args:
         message: Discordメッセージオブジェクト
+        args: 解析済みのコマンド引数
     """
     # ベット額の解析
-    try:
-        bet = int(message.content.split()[1])
-    except (IndexError, ValueError):
+    bet = args.int_arg(0)
+    if bet is None:
         embed = discord.Embed(
             description="`?フリップ ベット額`の形式で入力してください。",
             color=discord.Color.red()
@@ -41,7 +42,7 @@ async def on_coinflip_command(message: discord.Message) -> None:
         return
     
     # ユーザー残高の確認
-    balance = get_user_balance(message.author.id)
+    balance = await async_db.get_user_balance(message.author.id)
     if balance is None:
         embed = EmbedFactory.not_registered()
         await message.channel.send(embed=embed)
@@ -1,31 +1,31 @@
 import discord
-import re
 import random
-from database.db import get_user_balance
+from database import async_db
 from utils.embed import create_embed
 from utils.embed_factory import EmbedFactory
 from utils.emojis import PNC_EMOJI_STR
 from utils.color import BASE_COLOR_CODE
+from utils.avatar import avatar_service
+from utils.render import render_service
 from config import HITANDBLOW_CATEGORY_ID
+from commands.router import CommandArgs
 from ui.game.hitandblow import (
     DigitInputView,
     HitAndBlowAcceptButton,
-    generate_board_image,
-    download_avatar,
+    AVATAR_SIZE,
+    HitAndBlowBoard,
 )
 
-async def on_hitandblow_command(message: discord.Message):
+async def on_hitandblow_command(message: discord.Message, args: CommandArgs):
     try:
-        pattern = r"\?ヒットアンドブロー\s+<@!?(\d+)>\s+(\d+)"
-        match = re.match(pattern, message.content)
-        if not match:
+        opponent_id = args.mention_arg(0)
+        amount = args.int_arg(1)
+        if opponent_id is None or amount is None:
             embed = create_embed("", "`?ヒットアンドブロー @ユーザー 掛け金` の形式で入力してください。", discord.Color.red())
             await message.channel.send(embed=embed)
             return
 
         challenger = message.author
-        opponent_id = int(match.group(1))
-        amount = int(match.group(2))
 
         if challenger.id == opponent_id:
             embed = create_embed("", "自分自身には対戦を申し込めません。", BASE_COLOR_CODE)
@@ -34,8 +34,8 @@ async def on_hitandblow_command(message: discord.Message):
 
         opponent = await message.guild.fetch_member(opponent_id)
 
-        challenger_balance = get_user_balance(challenger.id)
-        opponent_balance = get_user_balance(opponent.id)
+        challenger_balance = await async_db.get_user_balance(challenger.id)
+        opponent_balance = await async_db.get_user_balance(opponent.id)
 
         if challenger_balance is None or opponent_balance is None:
             embed = EmbedFactory.not_registered()
@@ -116,19 +116,22 @@ async def on_hitandblow_command(message: discord.Message):
             opponent_id = [other_pid for other_pid in players if other_pid != pid][0]
             opponent = players[opponent_id]["member"]
 
-            user_icon_path = await download_avatar(member.display_avatar.url, member.id)
-            opponent_icon_path = await download_avatar(opponent.display_avatar.url, opponent.id)
-
-            image_path = generate_board_image(
-                digits=digits,
-                user_id=member.id,
-                user_icon_path=user_icon_path,
-                user_name=member.display_name,
-                opponent_icon_path=opponent_icon_path,
-                opponent_name=opponent.display_name
+            user_icon = await avatar_service.get_avatar(member, AVATAR_SIZE)
+            opponent_icon = await avatar_service.get_avatar(opponent, AVATAR_SIZE)
+
+            board = await render_service.run(
+                "hitandblow",
+                HitAndBlowBoard,
+                digits,
+                user_icon,
+                member.display_name,
+                opponent_icon,
+                opponent.display_name
             )
+            pdata["board"] = board
+            buf = await render_service.render_png("hitandblow", board.render)
 
-            file = discord.File(image_path, filename="board.png")
+            file = discord.File(buf, filename="board.png")
             embed = discord.Embed(
                 title="🎮 ゲーム開始！",
                 description="あなたが選んだ数字がこちらです。\n" +
@@ -1,30 +1,28 @@
 import discord
-import re
-import secrets
 
-from database.db import get_user_balance, update_user_balance, load_pf_params
+from database import async_db
 
 from utils.embed import create_embed
 from utils.color import BASE_COLOR_CODE
 from utils.embed_factory import EmbedFactory
 
-from ui.game.mines import MinesGame, MinesView, CashoutButton, create_mines_embed
+from ui.game.mines import MinesGame, MinesView, create_cashout_view, create_mines_embed, games
+from utils.seed_pool import SeedCommitment, acquire_game_seed
+from utils.session_registry import session_registry
+from commands.router import CommandArgs
 
 MINE_OPTIONS = list(range(1, 25))
 
-games = {}
-async def on_mines_command(message: discord.Message):
+async def on_mines_command(message: discord.Message, args: CommandArgs):
     try:
-        pattern = r"\?マインズ\s+(\d+)\s+(\d+)"
-        match = re.match(pattern, message.content)
+        amount = args.int_arg(0)
+        mine_count = args.int_arg(1)
 
-        if not match:
+        if amount is None or mine_count is None:
             embed = create_embed("", "`?マインズ 金額 地雷数`の形式で入力してください。", discord.Color.red())
             await message.channel.send(embed=embed)
             return
 
-        amount = int(match.group(1))
-        mine_count = int(match.group(2))
         user = message.author
         user_id = user.id
         
@@ -39,24 +37,30 @@ async def on_mines_command(message: discord.Message):
             await message.channel.send(embed=embed)
             return
 
-        balance = get_user_balance(user_id)
-        if balance is None:
+        rejected = session_registry.check_start("mines", user_id)
+        if rejected:
+            embed = create_embed("", rejected, discord.Color.red())
+            await message.channel.send(embed=embed)
+            return
+
+        # シードの取得はDBへの書き込みで失敗しうるため、引き落とす前に行う
+        # （引き落とし後に失敗すると、精算するセッションがないまま賭け金だけが減る）
+        seed = await acquire_game_seed(user_id)
+
+        debit = await async_db.try_debit(user_id, amount)
+        if not debit.registered:
             embed = EmbedFactory.not_registered()
             await message.channel.send(embed=embed)
             return
-        if balance < amount:
-            embed = EmbedFactory.insufficient_balance(balance=balance)
+        if not debit.ok:
+            embed = EmbedFactory.insufficient_balance(balance=debit.balance)
             await message.channel.send(embed=embed)
             return
 
-        update_user_balance(user_id, -amount)
-        client_seed, nonce = load_pf_params(user_id)
-        if client_seed is None:
-            client_seed = secrets.token_hex(8)
-            nonce = 0
-
         game = MinesGame(user, bet=amount, mine_count=mine_count,
-                        client_seed=client_seed, nonce=nonce)
+                        client_seed=seed.client_seed, nonce=seed.nonce,
+                        seed=SeedCommitment(seed.server_seed, seed.server_seed_hash),
+                        reveal_seed=seed.reveal)
         games[user_id] = game
         await message.channel.send(f"🔐 サーバーシードハッシュ: `{game.server_seed_hash}`")
         
@@ -66,10 +70,10 @@ async def on_mines_command(message: discord.Message):
         game.message_id = game_message.id
 
         cashout_embed = create_embed("", "現在の報酬を引き出すにはボタンを押してください。", color=BASE_COLOR_CODE)
-        cashout_view = discord.ui.View()
-        cashout_view.add_item(CashoutButton(user_id, game, disabled=False))
+        cashout_view = create_cashout_view(user_id, game)
         cashout_message = await message.channel.send(embed=cashout_embed, view=cashout_view)
         game.cashout_message_id = cashout_message.id
+        games.save(user_id)
     except Exception as e:
         print(f"[ERROR] on_mines_command: {e}")
         import traceback
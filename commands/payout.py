@@ -2,13 +2,13 @@ import re
 import discord
 from decimal import Decimal, ROUND_DOWN
 
-from database.db import get_user_balance, update_user_balance, users_collection
+from database.db import get_user_balance, try_debit, update_user_balance, users_collection
 from paypay_session import paypay_session
 from bot import bot
 
 from utils.embed import create_embed
 from utils.emojis import PNC_EMOJI_STR
-from utils.logs import log_transaction
+from utils.logs import log_financial_transaction
 from utils.embed_factory import EmbedFactory
 
 from config import PAYOUT_DISABLED, PAYOUT_LOG_CHANNEL_ID
@@ -49,15 +49,21 @@ async def on_payout_command(message: discord.Message):
         embed = create_embed("", f"❌ 手数料込みで {PNC_EMOJI_STR}`{total_pnc:,}（＝¥{total_pnc//10:,}）` が必要です。", discord.Color.red())
         return await message.reply(embed=embed, mention_author=False)
 
+    # リンク生成前に原子的に引き落とし、同時出金による二重引き落としを防ぐ
+    debit = try_debit(user_id, int(total_pnc))
+    if not debit.ok:
+        embed = EmbedFactory.insufficient_balance(debit.balance)
+        return await message.reply(embed=embed, mention_author=False)
+    new_balance = debit.balance
+
     try:
         link_info = paypay_session.paypay.create_link(int(amount))
         link_url = link_info.link
     except Exception as e:
+        update_user_balance(user_id, int(total_pnc))
         embed = create_embed("❌ エラー", "出金リンクの生成に失敗しました。", discord.Color.red())
         return await message.reply(embed=embed, mention_author=False)
-
-    update_user_balance(user_id, -int(total_pnc))
-    log_transaction(user_id=user_id, type="payout", amount=amount_jpy, payout=amount_pnc)
+    await log_financial_transaction(user_id, "payout", amount_jpy, amount_pnc)
 
     dm_embed = discord.Embed(title="出金リンクが生成されました", description="以下のリンクからPayPayで受け取りができます。", color=discord.Color.green())
     dm_embed.add_field(name="受け取りリンク", value=f"[受け取りはこちら]({link_url})", inline=False)
@@ -67,7 +73,7 @@ async def on_payout_command(message: discord.Message):
     embed.add_field(name="出金額（円/PNC）", value=f"`¥{amount:,}` → {PNC_EMOJI_STR}`{amount_pnc:,}`", inline=False)
     embed.add_field(name="手数料", value=f"{PNC_EMOJI_STR}`{fee_pnc:,}`（＝¥{fee_pnc//10:,}）", inline=False)
     embed.add_field(name="合計引き落とし", value=f"{PNC_EMOJI_STR}`{total_pnc:,}`（＝¥{total_pnc//10:,}）", inline=False)
-    embed.add_field(name="現在の残高", value=f"{PNC_EMOJI_STR}`{get_user_balance(user_id):,}`", inline=False)
+    embed.add_field(name="現在の残高", value=f"{PNC_EMOJI_STR}`{new_balance:,}`", inline=False)
     embed.set_footer(text="※PNCは内部で小数扱い可ですが、出金は整数PNC単位でのみ可能です")
     await message.reply(embed=embed, mention_author=False)
 
@@ -87,7 +93,7 @@ async def on_payout_command(message: discord.Message):
     log_embed.add_field(name="手数料", value=f"{PNC_EMOJI_STR}`{fee_pnc:,}`", inline=True)
     log_embed.add_field(name="合計PNC引落とし", value=f"{PNC_EMOJI_STR}`{total_pnc:,}`", inline=False)
     log_embed.add_field(name="決済番号", value=f"`{link_info.order_id}`", inline=False)
-    log_embed.set_footer(text=f"残高: {get_user_balance(user_id):,} PNC")
+    log_embed.set_footer(text=f"残高: {new_balance:,} PNC")
 
     try:
         channel = await bot.fetch_channel(int(PAYOUT_LOG_CHANNEL_ID))
@@ -9,14 +9,16 @@ from utils.embed_factory import EmbedFactory
 from utils.emojis import PNC_EMOJI_STR
 from utils.pnc import calculate_prize_pnc, calculate_account_exchange_pnc
 from config import PRIZE_LARGE_JPY, PRIZE_MEDIUM_JPY, PRIZE_SMALL_JPY, ACCOUNT_EXCHANGE_JPY
+from commands.router import CommandArgs
 
 
-async def on_pocket_command(message: discord.Message) -> None:
+async def on_pocket_command(message: discord.Message, args: CommandArgs) -> None:
     """
     ポケット確認コマンドハンドラー
     
     Args:
         message: Discordメッセージオブジェクト
+        args: 解析済みのコマンド引数
     """
     user_id = message.author.id
     
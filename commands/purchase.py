@@ -9,9 +9,10 @@ import config
 from bot import bot
 from database.db import clear_prize_pocket
 from utils.emojis import PNC_EMOJI_STR
+from commands.router import CommandArgs
 
 
-async def on_purchase_command(message: discord.Message) -> None:
+async def on_purchase_command(message: discord.Message, args: CommandArgs) -> None:
     """
     景品買取コマンド - 指定ユーザーの景品を全てクリア
     使用方法: ?買取 @ユーザー
@@ -20,6 +21,7 @@ async def on_purchase_command(message: discord.Message) -> None:
     
     Args:
         message: Discordメッセージオブジェクト
+        args: 解析済みのコマンド引数
     """
     # ロール確認
     if not isinstance(message.author, discord.Member):
@@ -15,14 +15,16 @@ from database.db import (
 from utils.embed_factory import EmbedFactory
 from utils.emojis import PNC_EMOJI_STR
 from config import ACCOUNT_EXCHANGE_JPY, EXCHANGE_ENABLED
+from commands.router import CommandArgs
 
 
-async def on_redeem_account_command(message: discord.Message) -> None:
+async def on_redeem_account_command(message: discord.Message, args: CommandArgs) -> None:
     """
     アカウント引き換えコマンドハンドラー
     
     Args:
         message: Discordメッセージオブジェクト
+        args: 解析済みのコマンド引数
     """
     # 機能が有効かチェック
     if not EXCHANGE_ENABLED:
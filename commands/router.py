@@ -0,0 +1,157 @@
+"""
+テキストコマンドルーター
+メッセージを一度だけ分割してコマンド名を辞書で引き、解析済みの引数をハンドラーに渡します
+
+    - 高速経路: プレフィックス（?）で始まらないメッセージは分割・検索をせずに通常のコマンド処理へ
+    - 検索: 先頭の語をコマンド名として dict で O(1) で検索（"?残高です" のような前方一致では反応しない）
+    - 引数: CommandArgs（args[i]・int_arg(i)・mention_arg(i)）で取得し、各ハンドラーで再解析しない
+    - 制限: ユーザー・チャンネルごとのレート制限と、locked で登録したコマンドのユーザーごとの処理中ロック（utils.rate_limit）
+    - メトリクス: コマンドごとの処理時間（text_command_seconds）と実行数・エラー数
+"""
+import re
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import discord
+
+import config
+from utils.embed import create_embed
+from utils.metrics import metrics
+from utils.rate_limit import IN_FLIGHT_TEXT, RATE_LIMITED_TEXT, check_command_rate, user_locks
+
+COMMAND_PREFIX = "?"
+MENTION_PATTERN = re.compile(r"^<@!?(\d+)>$")
+
+# ========================================
+# メトリクス
+# ========================================
+TEXT_COMMAND_SECONDS = metrics.histogram("text_command_seconds", "テキストコマンドの処理時間（秒）")
+TEXT_COMMANDS_TOTAL = metrics.counter("text_commands_total", "実行したテキストコマンド数")
+TEXT_COMMAND_ERRORS = metrics.counter("text_command_errors_total", "ハンドラーで例外が発生したテキストコマンド数")
+
+
+@dataclass(frozen=True)
+class CommandArgs:
+    """
+    解析済みのコマンド引数
+
+    Attributes:
+        name: コマンド名（プレフィックスを含む。例: "?bj"）
+        args: コマンド名より後の語
+        rest: コマンド名より後の文字列（前後の空白を除く）
+    """
+    name: str
+    args: tuple[str, ...]
+    rest: str
+
+    def __len__(self) -> int:
+        return len(self.args)
+
+    def __getitem__(self, index: int) -> str:
+        return self.args[index]
+
+    def int_arg(self, index: int) -> Optional[int]:
+        """index 番目の語を0以上の整数として取得（数字以外・範囲外はNone）"""
+        if index >= len(self.args) or not self.args[index].isdecimal():
+            return None
+        return int(self.args[index])
+
+    def mention_arg(self, index: int) -> Optional[int]:
+        """index 番目の語をユーザーメンション（<@id>）として取得し、ユーザーIDを返す"""
+        if index >= len(self.args):
+            return None
+        match = MENTION_PATTERN.match(self.args[index])
+        return int(match.group(1)) if match else None
+
+
+CommandHandler = Callable[[discord.Message, CommandArgs], Awaitable[None]]
+
+
+def parse_command(content: str, prefix: str = COMMAND_PREFIX) -> Optional[CommandArgs]:
+    """
+    メッセージ本文をコマンド名と引数に分割
+
+    Returns:
+        CommandArgs: プレフィックスで始まらない場合はNone
+    """
+    content = content.strip()
+    if not content.startswith(prefix):
+        return None
+    parts = content.split(maxsplit=1)
+    rest = parts[1] if len(parts) > 1 else ""
+    return CommandArgs(parts[0], tuple(rest.split()), rest)
+
+
+class TextCommandRouter:
+    """テキストコマンドのルーター"""
+
+    def __init__(self, prefix: str = COMMAND_PREFIX):
+        self.prefix = prefix
+        self._handlers: dict[str, CommandHandler] = {}
+        self._locked: set[str] = set()
+
+    def register(self, name: str, handler: CommandHandler, locked: bool = False) -> None:
+        """
+        コマンドを登録
+
+        Args:
+            name: コマンド名（プレフィックスを含む）
+            locked: 同じユーザーの処理中ロックを取ってから実行するか（ゲーム・送金など残高を動かすコマンド）
+        """
+        self._handlers[name] = handler
+        if locked:
+            self._locked.add(name)
+        else:
+            self._locked.discard(name)
+
+    def resolve(self, content: str) -> Optional[tuple[CommandHandler, CommandArgs]]:
+        """本文からハンドラーと引数を取得（コマンドでなければNone）"""
+        # 高速経路: プレフィックスで始まらないメッセージは分割しない
+        if not content.lstrip().startswith(self.prefix):
+            return None
+        args = parse_command(content, self.prefix)
+        if args is None:
+            return None
+        handler = self._handlers.get(args.name)
+        return (handler, args) if handler else None
+
+    async def dispatch(self, message: discord.Message) -> bool:
+        """
+        メッセージをハンドラーに渡す
+
+        Returns:
+            bool: コマンドとして処理した場合True
+        """
+        resolved = self.resolve(message.content)
+        if resolved is None:
+            return False
+
+        handler, args = resolved
+        allowed, notify = check_command_rate(message)
+        if not allowed:
+            if notify:
+                await message.channel.send(embed=create_embed("", RATE_LIMITED_TEXT, discord.Color.red()))
+            return True
+
+        if args.name not in self._locked:
+            await self._run(handler, message, args)
+            return True
+
+        async with user_locks.hold(message.author.id, config.GAME_LOCK_WAIT_SECONDS, source="command") as acquired:
+            if not acquired:
+                await message.channel.send(embed=create_embed("", IN_FLIGHT_TEXT, discord.Color.red()))
+                return True
+            await self._run(handler, message, args)
+        return True
+
+    async def _run(self, handler: CommandHandler, message: discord.Message, args: CommandArgs) -> None:
+        started = time.perf_counter()
+        try:
+            await handler(message, args)
+        except Exception:
+            TEXT_COMMAND_ERRORS.inc(command=args.name)
+            raise
+        finally:
+            TEXT_COMMANDS_TOTAL.inc(command=args.name)
+            TEXT_COMMAND_SECONDS.observe(time.perf_counter() - started, command=args.name)
@@ -1,52 +1,82 @@
 import discord
 import random
-import re
-import hmac
 import hashlib
 import secrets
-from PIL import Image, ImageDraw, ImageFont
-from io import BytesIO
+import threading
+from PIL import ImageDraw
 from utils.embed import create_embed
 from utils.emojis import PNC_EMOJI_STR, WIN_EMOJI, ROCK_HAND_EMOJI, SCISSOR_HAND_EMOJI, PAPER_HAND_EMOJI
-from utils.logs import send_casino_log
+from utils.logs import log_transaction, send_casino_log
 from utils.color import RPS_COLOR, SUCCESS_COLOR, DRAW_COLOR
-from database.db import get_user_balance, update_user_balance, load_pf_params, is_blacklisted
+from database import async_db
+from database.pf_records import build_pf_record
+from database.result_writer import game_result_writer
+from database.session_store import create_session_store
+from utils.avatar import avatar_service
+from utils.render import render_service
+from ui.game.assets import RPSAssets, rps_assets
+from utils.pf_engine import rps_hand, rps_number
+from utils.seed_pool import acquire_game_seed
+from ui.pf import HIDDEN_SEED_TEXT
+from utils.session_registry import GameSessionSpec, session_registry
+from utils.rate_limit import guard_interaction
 from config import CURRENCY_NAME
-import aiohttp
+from commands.router import CommandArgs
 import traceback
 
-FONT_PATH = "assets/font/NotoSansJP-VariableFont_wght.ttf"
-SLOT_CARD_BACK = "assets/rps/slot_back.png"
+AVATAR_SIZE = 60
+# 1ゲームの最大ラウンド数（到達で自動キャッシュアウト。rotate ではこの数のnonceを予約する）
+MAX_ROUNDS = 20
 
 class ProvablyFairParams:
-    def __init__(self, client_seed=None, server_seed=None, nonce=0):
+    def __init__(self, client_seed=None, server_seed=None, nonce=0, server_seed_hash=None, reveal=True):
         self.client_seed = client_seed or secrets.token_hex(8)
         self.server_seed = server_seed or secrets.token_hex(32)
-        self.server_seed_hash = hashlib.sha256(self.server_seed.encode()).hexdigest()
+        self.server_seed_hash = server_seed_hash if server_seed and server_seed_hash else hashlib.sha256(self.server_seed.encode()).hexdigest()
         self.nonce = nonce
+        self.reveal = reveal
 
     def generate_number(self):
-        msg = f"{self.client_seed}:{self.nonce}".encode()
-        h = hmac.new(self.server_seed.encode(), msg, hashlib.sha256).hexdigest()
-        r = int(h[:8], 16)
-        return r / 0xFFFFFFFF
+        return rps_number(self.server_seed, self.client_seed, self.nonce)
 
-    def get_opponent_hand(self):  
-        num = self.generate_number()
-        hands = ["rock", "paper", "scissors"]
-        return hands[int(num * 3)]
+    def get_opponent_hand(self):
+        return rps_hand(self.server_seed, self.client_seed, self.nonce)
 
-    def get_pf_info(self):
-        return f"ServerSeed: `{self.server_seed}`\nClientSeed: `{self.client_seed}`\nNonce: `{self.nonce}`"
+    def get_pf_info(self, finished=False):
+        """PF情報（サーバーシードはゲーム終了後のみ公開。進行中に見せると以降の手が計算できる）"""
+        server_seed = self.server_seed if finished and self.reveal else HIDDEN_SEED_TEXT
+        return f"ServerSeed: `{server_seed}`\nClientSeed: `{self.client_seed}`\nNonce: `{self.nonce}`"
 
 class RPSGameSession:
-    def __init__(self, user_id, bet_amount, client_seed=None, server_seed=None, nonce=0):
+    def __init__(self, user_id, bet_amount, client_seed=None, server_seed=None, nonce=0, server_seed_hash=None, reveal_seed=True):
         self.user_id = user_id
         self.bet_amount = bet_amount
         self.base_multiplier = 1.96
         self.round = 0
-        self.pf = ProvablyFairParams(client_seed, server_seed, nonce)
+        self.pf = ProvablyFairParams(client_seed, server_seed, nonce, server_seed_hash, reveal_seed)
         self.history = []
+        self.message_id = None
+        self._reset_layer()
+
+    def _reset_layer(self):
+        """描画レイヤーを破棄（スナップショットには含めない）"""
+        self._layer = None
+        self._layer_columns = 0
+        self._layer_wins = 0
+        self._layer_user_avatar = None
+        self._layer_username = None
+        self._layer_lock = threading.Lock()
+
+    def _build_layer(self, user_avatar, username):
+        """背景・アバター・名前を描いたレイヤーを作成（履歴は generate_rps_progress_image で追加）"""
+        layer = rps_assets.new_background()
+        layer.paste(user_avatar, AVATAR_POS, user_avatar)
+        ImageDraw.Draw(layer).text(USERNAME_POS, username, font=rps_assets.font, fill=(255, 255, 255))
+        self._layer = layer
+        self._layer_columns = 0
+        self._layer_wins = 0
+        self._layer_user_avatar = user_avatar
+        self._layer_username = username
 
     def next_round(self):
         self.round += 1
@@ -62,7 +92,45 @@ class RPSGameSession:
         multiplier = self.base_multiplier * (2 ** (win_count - 1))
         return int(self.bet_amount * multiplier)
 
-game_sessions = {}
+    def pf_record(self):
+        """検証用のPF記録を作成（ラウンドごとのnonceと相手の手）"""
+        rounds = [entry for entry in self.history if "nonce" in entry]
+        return build_pf_record(
+            "rps", self.user_id, self.pf.server_seed, self.pf.client_seed,
+            rounds[0]["nonce"] if rounds else self.pf.nonce,
+            outcome=[entry["opponent"] for entry in rounds],
+            params={"nonces": [entry["nonce"] for entry in rounds]},
+            server_seed_hash=self.pf.server_seed_hash
+        )
+
+    def to_snapshot(self):
+        """セッション保存用のスナップショットを作成"""
+        return {
+            "user_id": self.user_id,
+            "bet_amount": self.bet_amount,
+            "round": self.round,
+            "history": self.history,
+            "client_seed": self.pf.client_seed,
+            "server_seed": self.pf.server_seed,
+            "nonce": self.pf.nonce,
+            "reveal_seed": self.pf.reveal,
+            "message_id": self.message_id,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """スナップショットからセッションを復元"""
+        session = cls(
+            data["user_id"], data["bet_amount"], data["client_seed"], data["server_seed"], data["nonce"],
+            reveal_seed=data.get("reveal_seed", True)
+        )
+        session.round = data["round"]
+        session.history = data["history"]
+        session.message_id = data["message_id"]
+        return session
+
+# 進行中のゲーム（user_id → RPSGameSession）
+game_sessions = create_session_store("rps", encode=RPSGameSession.to_snapshot, decode=RPSGameSession.from_snapshot)
 
 def determine_result(player, opponent):
     if player == opponent:
@@ -74,168 +142,146 @@ def determine_result(player, opponent):
     else:
         return "lose"
 
-def resize_by_width(image: Image.Image, target_width: int) -> Image.Image:
-    w, h = image.size
-    aspect_ratio = h / w
-    new_height = int(target_width * aspect_ratio)
-    return image.resize((target_width, new_height))
-
-def resize_keep_aspect(image: Image.Image, target_width: int) -> Image.Image:
-    w, h = image.size
-    scale = target_width / w
-    return image.resize((int(w * scale), int(h * scale)))
-
-
-async def generate_rps_progress_image(session, user_avatar, username):
-    width = 1280
-    height = 500
-    bg = Image.new("RGBA", (width, height), (20, 20, 30, 255))
-    draw = ImageDraw.Draw(bg)
-    font = ImageFont.truetype(FONT_PATH, 20)
-
-    # カードと手のサイズ
-    focus_card_w = 120
-    focus_card_h = int(focus_card_w * 1.45)
-
-    # 手の最大幅（カードの幅に対して90%くらいが自然）
-    hand_target_width = int(focus_card_w * 0.89)
-    hand_size = 80
-
-    # 中央のカード位置（右寄せ）
-    card_x = width - focus_card_w - 100
-    center_y = height // 2
-    opponent_card_y = center_y - focus_card_h - 20
-    player_card_y = center_y + 20
-
-
-    # カード描画
-    card_back = resize_by_width(Image.open(SLOT_CARD_BACK), focus_card_w)
+# ========================================
+# 進行画像
+# ========================================
+CANVAS_WIDTH, CANVAS_HEIGHT = RPSAssets.CANVAS_SIZE
+
+# 中央のカード（右寄せ）
+FOCUS_CARD_W = RPSAssets.CARD_WIDTH
+FOCUS_CARD_H = int(FOCUS_CARD_W * 1.45)
+FOCUS_CARD_X = CANVAS_WIDTH - FOCUS_CARD_W - 100
+OPPONENT_CARD_Y = CANVAS_HEIGHT // 2 - FOCUS_CARD_H - 20
+PLAYER_CARD_Y = CANVAS_HEIGHT // 2 + 20
+
+# 左上の履歴
+HISTORY_CARD_W = RPSAssets.THUMB_SIZE[0]
+HISTORY_SPACING = 50
+HISTORY_OFFSET_X = 30
+HISTORY_BOT_Y = 50
+HISTORY_PLAYER_Y = HISTORY_BOT_Y + 60
+HISTORY_MULTIPLIER_Y = HISTORY_PLAYER_Y + HISTORY_CARD_W + 5
+RESULT_COLORS = {"win": (0, 255, 0), "draw": (255, 255, 0), "lose": (255, 0, 0)}
+
+AVATAR_POS = (20, CANVAS_HEIGHT - 70)
+USERNAME_POS = (90, CANVAS_HEIGHT - 60)
+
+
+def history_multiplier(result, win_count):
+    """履歴に表示する倍率（win_count はこのラウンドまでの勝利数）"""
+    if result == "win":
+        return 1.96 * (2 ** (win_count - 1))
+    if result == "draw":
+        return 1.00 if win_count == 0 else 1.96 * (2 ** (win_count - 1))
+    return 0
+
+
+def draw_history_column(layer, draw, index, entry, win_count):
+    """履歴の1列（相手・自分のサムネイルと倍率）を描画"""
+    assets = rps_assets
+    x = HISTORY_OFFSET_X + index * HISTORY_SPACING
+    border_color = RESULT_COLORS[entry["result"]]
+
+    for y in (HISTORY_PLAYER_Y, HISTORY_BOT_Y):
+        draw.rectangle([x - 2, y - 2, x + HISTORY_CARD_W + 2, y + HISTORY_CARD_W + 2], outline=border_color, width=2)
+
+    p_img = assets.thumb(entry["player"], 1)
+    o_img = assets.thumb(entry["opponent"], 2)
+    layer.paste(p_img, (x, HISTORY_PLAYER_Y), p_img)
+    layer.paste(o_img, (x, HISTORY_BOT_Y), o_img)
+
+    multiplier_str = f"{history_multiplier(entry['result'], win_count):.2f}x"
+    text_width = draw.textlength(multiplier_str, font=assets.font)
+    draw.text((x + (HISTORY_CARD_W - text_width) / 2, HISTORY_MULTIPLIER_Y), multiplier_str, font=assets.font, fill=border_color)
+
+
+def generate_rps_progress_image(session, user_avatar, username):
+    """
+    進行画像を描画
+
+    背景・アバター・名前・履歴を描いたレイヤーをセッションに保持し、
+    各ラウンドでは新しい履歴の列だけを追加してから、コピーに中央のカードを描きます。
+    """
+    assets = rps_assets
+
+    with session._layer_lock:
+        if (
+            session._layer is None
+            or session._layer_user_avatar is not user_avatar
+            or session._layer_username != username
+            or session._layer_columns > len(session.history)
+        ):
+            session._build_layer(user_avatar, username)
+
+        layer = session._layer
+        draw = ImageDraw.Draw(layer)
+        for i in range(session._layer_columns, len(session.history)):
+            entry = session.history[i]
+            if entry["result"] == "win":
+                session._layer_wins += 1
+            draw_history_column(layer, draw, i, entry, session._layer_wins)
+        session._layer_columns = len(session.history)
+        bg = layer.copy()
 
     if session.history:
         latest = session.history[-1]
-        player_hand = latest["player"]
-        opponent_hand = latest["opponent"]
-
-        # カード画像描画
-        bg.paste(card_back, (card_x, opponent_card_y), card_back)
-        bg.paste(card_back, (card_x, player_card_y), card_back)
-
-        # この位置で読み込んだ後に定義する
-        player_img = resize_keep_aspect(Image.open(f"assets/rps/{player_hand}.1.png").convert("RGBA"), hand_target_width)
-        opponent_img = resize_keep_aspect(Image.open(f"assets/rps/{opponent_hand}.2.png").convert("RGBA"), hand_target_width)
-
-        # ←画像読み込み後なのでこれでOK
-        opponent_hand_x = card_x - opponent_img.width - 10
-        player_hand_x = card_x - player_img.width - 10
-
-        # 正しいX座標を後から設定
-        opponent_hand_x = card_x - opponent_img.width - 10
-        player_hand_x = card_x - player_img.width - 10
-
-        # Y座標（中央合わせ）
-        oy = opponent_card_y + (focus_card_h - opponent_img.height) // 2 + 5
-        py = player_card_y + (focus_card_h - player_img.height) // 2 + 5
-
-        # 手を描画
-        bg.paste(opponent_img, (opponent_hand_x, oy), opponent_img)
-        bg.paste(player_img, (player_hand_x, py), player_img)
-
-
-    # 左下の履歴表示
-    card_w = 40
-    spacing = 50
-    offset_x = 30
-    bot_y = 50
-    player_y = bot_y + 60
-    multiplier_y = player_y + card_w + 5
-    win_count = 0
-
-    for i, entry in enumerate(session.history):
-        x = offset_x + i * spacing
-        result = entry["result"]
-        player_hand = entry["player"]
-        opponent_hand = entry["opponent"]
-
-        p_img = Image.open(f"assets/rps/{player_hand}.1.thumb.png").resize((card_w, card_w))
-        o_img = Image.open(f"assets/rps/{opponent_hand}.2.thumb.png").resize((card_w, card_w))
-
-
-        border_color = {"win": (0, 255, 0), "draw": (255, 255, 0), "lose": (255, 0, 0)}[result]
-
-        draw.rectangle([x - 2, player_y - 2, x + card_w + 2, player_y + card_w + 2], outline=border_color, width=2)
-        draw.rectangle([x - 2, bot_y - 2, x + card_w + 2, bot_y + card_w + 2], outline=border_color, width=2)
-
-        bg.paste(p_img, (x, player_y), p_img)
-        bg.paste(o_img, (x, bot_y), o_img)
-
-        # 倍率計算
-        if result == "win":
-            win_count += 1
-            multiplier = 1.96 * (2 ** (win_count - 1))
-        elif result == "draw":
-            multiplier = 1.00 if win_count == 0 else 1.96 * (2 ** (win_count - 1))
-        else:
-            multiplier = 0
-
-        color = border_color
-        multiplier_str = f"{multiplier:.2f}x"
-        text_width = draw.textlength(multiplier_str, font=font)
-        draw.text((x + (card_w - text_width) / 2, multiplier_y), multiplier_str, font=font, fill=color)
-
-    # プレイヤー情報
-    avatar = Image.open(user_avatar).resize((60, 60)).convert("RGBA")
-    mask = Image.new("L", (60, 60), 0)
-    ImageDraw.Draw(mask).ellipse((0, 0, 60, 60), fill=255)
-    avatar = Image.composite(avatar, Image.new("RGBA", avatar.size), mask)
-    bg.paste(avatar, (20, height - 70), avatar)
-    draw.text((90, height - 60), username, font=font, fill=(255, 255, 255))
+        card_back = assets.card_back
+        bg.paste(card_back, (FOCUS_CARD_X, OPPONENT_CARD_Y), card_back)
+        bg.paste(card_back, (FOCUS_CARD_X, PLAYER_CARD_Y), card_back)
+
+        # 手はカードの左に、カードの高さの中央に合わせて描画
+        for img, card_y in (
+            (assets.hand(latest["opponent"], 2), OPPONENT_CARD_Y),
+            (assets.hand(latest["player"], 1), PLAYER_CARD_Y),
+        ):
+            x = FOCUS_CARD_X - img.width - 10
+            y = card_y + (FOCUS_CARD_H - img.height) // 2 + 5
+            bg.paste(img, (x, y), img)
 
     return bg
 
-async def on_rps_command(message):
+async def on_rps_command(message, args: CommandArgs):
     try: 
-        m = re.match(r"\?じゃんけん\s+(\d+)", message.content)
-        if not m:
+        amount = args.int_arg(0)
+        if amount is None:
             embed = create_embed("コマンドの使い方", "`?じゃんけん <金額>`の形式で入力してください。", discord.Color.red())
             await message.channel.send(embed=embed)
             return
 
-        amount = int(m.group(1))
         uid = message.author.id
-        balance = get_user_balance(uid)
 
         if amount < 100:
             embed = create_embed("", f"掛け金は最低{PNC_EMOJI_STR}`100`以上にしてください。", discord.Color.red())
             await message.channel.send(embed=embed)
             return
 
-        if amount > balance:
-            embed = create_embed("", f"残高が足りません。\n現在の残高: {PNC_EMOJI_STR}`{balance}`", discord.Color.red())
+        rejected = session_registry.check_start("rps", uid)
+        if rejected:
+            embed = create_embed("", rejected, discord.Color.red())
             await message.channel.send(embed=embed)
             return
 
-        # PFロード部分にtry入れるとより厳密だが、上位でcatchでもOK
-        pf_data = load_pf_params(uid)
-        if pf_data and len(pf_data) == 3:
-            client_seed, server_seed, nonce = pf_data
-        else:
-            client_seed = None
-            server_seed = None
-            nonce = 0
-        session = RPSGameSession(uid, amount, client_seed, server_seed, nonce)
+        # ラウンドごとにnonceを進めるため、最大ラウンド数分を予約
+        # （シードの取得はDBへの書き込みで失敗しうるため、引き落とす前に行う）
+        seed = await acquire_game_seed(uid, nonces=MAX_ROUNDS)
+
+        debit = await async_db.try_debit(uid, amount)
+        if not debit.ok:
+            embed = create_embed("", f"残高が足りません。\n現在の残高: {PNC_EMOJI_STR}`{debit.balance or 0}`", discord.Color.red())
+            await message.channel.send(embed=embed)
+            return
+
+        session = RPSGameSession(
+            uid, amount, seed.client_seed, seed.server_seed, seed.nonce,
+            server_seed_hash=seed.server_seed_hash, reveal_seed=seed.reveal
+        )
         game_sessions[uid] = session
 
-        update_user_balance(uid, -amount)
         await message.channel.send(f"🔐 サーバーシードハッシュ: `{session.pf.server_seed_hash}`")
 
-        async with aiohttp.ClientSession() as session_http:
-            async with session_http.get(message.author.display_avatar.url) as resp:
-                avatar_bytes = BytesIO(await resp.read())
+        avatar = await avatar_service.get_avatar(message.author, AVATAR_SIZE)
 
-        image = await generate_rps_progress_image(session, avatar_bytes, message.author.display_name)
-        buf = BytesIO()
-        image.save(buf, format="PNG")
-        buf.seek(0)
+        buf = await render_service.render_png("rps", generate_rps_progress_image, session, avatar, message.author.display_name)
         file = discord.File(buf, filename="rps_result.png")
 
         embed = create_embed(f"{CURRENCY_NAME}じゃんけん", "じゃんけんぽん！", discord.Color(RPS_COLOR))
@@ -243,7 +289,9 @@ async def on_rps_command(message):
         embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1219916908485283880/1387141204604620918/ChatGPT_Image_2025625_03_43_31.png")
         embed.set_author(name=message.author.display_name, icon_url=message.author.display_avatar.url)
 
-        await message.channel.send(embed=embed, view=RPSPlayView(session), file=file)
+        game_message = await message.channel.send(embed=embed, view=RPSPlayView(session), file=file)
+        session.message_id = game_message.id
+        game_sessions.save(uid)
 
     except Exception as e:
         traceback.print_exc()  # ターミナル用ログ
@@ -256,18 +304,21 @@ class RPSResultView(discord.ui.View):
         self.session = session
 
     @discord.ui.button(label="継続", style=discord.ButtonStyle.success)
+    @guard_interaction
     async def continue_button(self, interaction, button):
         self.session.next_round(True)
         await send_rps_prompt(interaction, self.session)
 
     @discord.ui.button(label="キャッシュアウト", style=discord.ButtonStyle.secondary)
+    @guard_interaction
     async def cashout_button(self, interaction, button):
         amount = self.session.calc_win_amount()
         if self.session.round == 0:
             amount = self.session.bet_amount 
         profit = amount - self.session.bet_amount  
 
-        update_user_balance(self.session.user_id, amount)
+        await async_db.update_user_balance(self.session.user_id, amount)
+        log_transaction(self.session.user_id, "rps", self.session.bet_amount, amount)
         embed = create_embed(
             "キャッシュアウト成功！",
             f"{PNC_EMOJI_STR}`{amount}` **WIN**\n＋{PNC_EMOJI_STR}`{profit}`",
@@ -286,6 +337,7 @@ class RPSResultView(discord.ui.View):
                 color=discord.Color(SUCCESS_COLOR)
             )
         game_sessions.pop(self.session.user_id, None)
+        game_result_writer.record_pf(self.session.pf_record())
 
 
 async def send_rps_prompt(interaction, session):
@@ -296,27 +348,35 @@ class RPSPlayView(discord.ui.View):
     def __init__(self, session):
         super().__init__(timeout=None) 
         self.session = session
+        session_registry.track_view("rps", session.user_id, self)
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         if interaction.user.id != self.session.user_id:
             await interaction.response.send_message("これはあなたのゲームではありません。", ephemeral=True)
             return False
+        if game_sessions.get(self.session.user_id) is not self.session:
+            await interaction.response.send_message("このゲームはすでに終了しています。", ephemeral=True)
+            return False
         return True
 
-    @discord.ui.button(emoji=ROCK_HAND_EMOJI, style=discord.ButtonStyle.success)
+    @discord.ui.button(emoji=ROCK_HAND_EMOJI, style=discord.ButtonStyle.success, custom_id="rps:rock")
+    @guard_interaction
     async def rock(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.resolve(interaction, "rock")
 
-    @discord.ui.button(emoji=SCISSOR_HAND_EMOJI, style=discord.ButtonStyle.success)
+    @discord.ui.button(emoji=SCISSOR_HAND_EMOJI, style=discord.ButtonStyle.success, custom_id="rps:scissors")
+    @guard_interaction
     async def scissors(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.resolve(interaction, "scissors")
 
-    @discord.ui.button(emoji=PAPER_HAND_EMOJI, style=discord.ButtonStyle.success)
+    @discord.ui.button(emoji=PAPER_HAND_EMOJI, style=discord.ButtonStyle.success, custom_id="rps:paper")
+    @guard_interaction
     async def paper(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.resolve(interaction, "paper")
 
 
-    @discord.ui.button(label="キャッシュアウト", style=discord.ButtonStyle.secondary, row=1)
+    @discord.ui.button(label="キャッシュアウト", style=discord.ButtonStyle.secondary, row=1, custom_id="rps:cashout")
+    @guard_interaction
     async def cashout(self, interaction: discord.Interaction, button: discord.ui.Button):
         amount = self.session.calc_win_amount()
         profit = amount - self.session.bet_amount
@@ -324,17 +384,12 @@ class RPSPlayView(discord.ui.View):
             amount = self.session.bet_amount
             profit = 0
 
-        update_user_balance(self.session.user_id, amount)
+        await async_db.update_user_balance(self.session.user_id, amount)
+        log_transaction(self.session.user_id, "rps", self.session.bet_amount, amount)
 
-        # 🔁 アイコン取得
-        async with aiohttp.ClientSession() as session_http:
-            async with session_http.get(interaction.user.display_avatar.url) as resp:
-                avatar_bytes = BytesIO(await resp.read())
+        avatar = await avatar_service.get_avatar(interaction.user, AVATAR_SIZE)
 
-        image = await generate_rps_progress_image(self.session, avatar_bytes, interaction.user.display_name)
-        buf = BytesIO()
-        image.save(buf, format="PNG")
-        buf.seek(0)
+        buf = await render_service.render_png("rps", generate_rps_progress_image, self.session, avatar, interaction.user.display_name)
         file = discord.File(buf, filename="rps_result.png")
 
         embed = create_embed(
@@ -344,6 +399,7 @@ class RPSPlayView(discord.ui.View):
         )
         embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1219916908485283880/1387141204604620918/ChatGPT_Image_2025625_03_43_31.png")
         embed.set_image(url="attachment://rps_result.png")
+        embed.add_field(name="🔐 Provably Fair", value=self.session.pf.get_pf_info(finished=True), inline=False)
 
         # 🔒 全ボタンを無効化した新しいビューを作成
         disabled_view = RPSPlayView(self.session)
@@ -362,6 +418,7 @@ class RPSPlayView(discord.ui.View):
             )
 
         game_sessions.pop(self.session.user_id, None)
+        game_result_writer.record_pf(self.session.pf_record())
         self.stop()
 
     async def resolve(self, interaction, player_choice):
@@ -375,17 +432,13 @@ class RPSPlayView(discord.ui.View):
             session.history.append({
                 "player": player_choice,
                 "opponent": opponent_choice,
-                "result": result
+                "result": result,
+                "nonce": pf.nonce
             })
 
-            async with aiohttp.ClientSession() as session_http:
-                async with session_http.get(interaction.user.display_avatar.url) as resp:
-                    avatar_bytes = BytesIO(await resp.read())
+            avatar = await avatar_service.get_avatar(interaction.user, AVATAR_SIZE)
 
-            image = await generate_rps_progress_image(session, avatar_bytes, interaction.user.display_name)
-            buf = BytesIO()
-            image.save(buf, format="PNG")
-            buf.seek(0)
+            buf = await render_service.render_png("rps", generate_rps_progress_image, session, avatar, interaction.user.display_name)
             file = discord.File(buf, filename="rps_result.png")
 
             result_str = {"win": "WIN", "lose": "LOSE", "draw": "DRAW"}[result]
@@ -394,19 +447,23 @@ class RPSPlayView(discord.ui.View):
             embed = create_embed(f"{CURRENCY_NAME}じゃんけん", f"### {PNC_EMOJI_STR}`{session.calc_win_amount()}` **{result_str}**", color)
             embed.set_image(url="attachment://rps_result.png")
             embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1219916908485283880/1387141204604620918/ChatGPT_Image_2025625_03_43_31.png?ex=685c436b&is=685af1eb&hm=ee447640b7d37905669af4ea5364e84788e9a0874a010b2fb5a13205968b4154&")
-            embed.add_field(name="🔐 Provably Fair", value=pf.get_pf_info(), inline=False)
+            finished = result == "lose" or (result == "win" and len(session.history) >= MAX_ROUNDS)
+            embed.add_field(name="🔐 Provably Fair", value=pf.get_pf_info(finished=finished), inline=False)
             embed.set_author(name=interaction.user.display_name, icon_url=interaction.user.display_avatar.url)
 
             if result == "lose":
                 # update_user_balance(session.user_id, -session.bet_amount)
+                log_transaction(session.user_id, "rps", session.bet_amount, 0)
                 game_sessions.pop(session.user_id, None)
+                game_result_writer.record_pf(session.pf_record())
                 await interaction.response.edit_message(embed=embed, attachments=[file], view=None)
                 self.stop()
             elif result == "win":
-                if len(session.history) >= 20:
+                if len(session.history) >= MAX_ROUNDS:
                     amount = session.calc_win_amount()
                     profit = amount - session.bet_amount
-                    update_user_balance(session.user_id, amount)
+                    await async_db.update_user_balance(session.user_id, amount)
+                    log_transaction(session.user_id, "rps", session.bet_amount, amount)
 
                     await interaction.followup.send(
                         f"20連勝達成！自動キャッシュアウトで {PNC_EMOJI_STR}`{amount}`n＋{PNC_EMOJI_STR}`{profit}`",
@@ -421,11 +478,14 @@ class RPSPlayView(discord.ui.View):
                         color=discord.Color(SUCCESS_COLOR)
                     )
                     game_sessions.pop(session.user_id, None)
+                    game_result_writer.record_pf(session.pf_record())
                     self.stop()
                     return
                 session.next_round()
+                game_sessions.save(session.user_id)
                 await interaction.response.edit_message(embed=embed, attachments=[file], view=self)
             else:  # draw の場合もembed更新が必要
+                game_sessions.save(session.user_id)
                 await interaction.response.edit_message(embed=embed, attachments=[file], view=self)
 
         except Exception as e:
@@ -434,4 +494,30 @@ class RPSPlayView(discord.ui.View):
             try:
                 await interaction.response.send_message("⚠️ 内部エラーが発生しました。", ephemeral=True)
             except discord.InteractionResponded:
-                pass
\ No newline at end of file
+                pass
+
+
+def restore_rps_views(bot) -> int:
+    """
+    復元したセッションのボタンをメッセージIDに紐付けて再登録
+
+    Returns:
+        int: 再登録したセッション数
+    """
+    count = 0
+    for _, session in game_sessions.items():
+        if session.message_id:
+            bot.add_view(RPSPlayView(session), message_id=session.message_id)
+            count += 1
+    return count
+
+
+session_registry.register(GameSessionSpec(
+    name="rps",
+    store=game_sessions,
+    bet_of=lambda session: session.bet_amount,
+    cashout_of=lambda session: session.calc_win_amount(),
+    restore_views=restore_rps_views,
+    pf_record_of=lambda user_id, session: session.pf_record(),
+    revealed_of=lambda session: bool(session.history),
+))
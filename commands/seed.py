@@ -0,0 +1,99 @@
+"""
+シード確認・変更コマンド
+Provably Fair のシードペア（PF_SEED_MODE=rotate）を表示し、次のシードへの変更と使用済みシードの公開を行います
+
+    ?シード                       現在のハッシュ・次のシードのハッシュ・クライアントシード・nonce を表示
+    ?シード 変更 [クライアントシード]  次のシードに切り替え、使用済みのサーバーシードを公開
+"""
+import re
+
+import discord
+
+from database import async_db
+from utils.color import BASE_COLOR_CODE, SUCCESS_COLOR
+from utils.embed import create_embed
+from utils.embed_factory import EmbedFactory
+from utils.seed_pool import rotates_seeds, seed_pool
+from utils.session_registry import session_registry
+from commands.router import CommandArgs
+
+CLIENT_SEED_PATTERN = re.compile(r"^[0-9A-Za-z_-]{1,64}$")
+
+
+async def on_seed_command(message: discord.Message, args: CommandArgs) -> None:
+    """
+    シードコマンドハンドラー
+
+    Args:
+        message: Discordメッセージオブジェクト
+        args: 解析済みのコマンド引数
+    """
+    user_id = message.author.id
+    try:
+        if not rotates_seeds():
+            client_seed, nonce = await async_db.load_pf_params(user_id)
+            embed = create_embed(
+                "🔐 Provably Fair",
+                "サーバーシードはゲームごとに新しく作成され、ゲーム終了時に公開されます。\n"
+                f"Client: `{client_seed or '未作成'}`\nNonce: `{nonce}`",
+                BASE_COLOR_CODE
+            )
+            await message.channel.send(embed=embed)
+            return
+
+        if not args:
+            doc = await async_db.get_pf_seed(user_id)
+            if not doc or "next_server_seed_hash" not in doc:
+                embed = create_embed("🔐 Provably Fair", "シードは最初のゲーム開始時に作成されます。", BASE_COLOR_CODE)
+            else:
+                embed = create_embed("🔐 Provably Fair", (
+                    f"Hash: `{doc['server_seed_hash']}`\n"
+                    f"Next Hash: `{doc['next_server_seed_hash']}`\n"
+                    f"Client: `{doc['client_seed']}`\n"
+                    f"Nonce: `{doc.get('nonce', 0)}`\n"
+                    "`?シード 変更` で次のシードに切り替えると、現在のシードが公開されます。"
+                ), BASE_COLOR_CODE)
+            await message.channel.send(embed=embed)
+            return
+
+        if args[0] != "変更" or len(args) > 2:
+            embed = create_embed("", "`?シード` または `?シード 変更 [クライアントシード]` の形式で入力してください。", discord.Color.red())
+            await message.channel.send(embed=embed)
+            return
+
+        client_seed = args[1] if len(args) == 2 else None
+        if client_seed and not CLIENT_SEED_PATTERN.match(client_seed):
+            embed = create_embed("", "クライアントシードは英数字・`_`・`-` の64文字以内で指定してください。", discord.Color.red())
+            await message.channel.send(embed=embed)
+            return
+
+        # 進行中のゲームは現在のシードを使っているため、終了するまで公開できない
+        if session_registry.count_user_sessions(user_id):
+            embed = create_embed("", "進行中のゲームがあります。終了してからシードを変更してください。", discord.Color.red())
+            await message.channel.send(embed=embed)
+            return
+
+        previous = await async_db.rotate_pf_seed(user_id, seed_pool.pop(), client_seed)
+        if previous is None:
+            embed = create_embed("", "シードは最初のゲーム開始時に作成されます。", discord.Color.red())
+            await message.channel.send(embed=embed)
+            return
+
+        current = await async_db.get_pf_seed(user_id)
+        embed = create_embed("🔐 シードを変更しました", (
+            "**公開されたシード**\n"
+            f"Seed: `{previous['server_seed']}`\n"
+            f"Hash: `{previous['server_seed_hash']}`\n"
+            f"Client: `{previous['client_seed']}`\n"
+            f"Nonce: `0`〜`{max(previous.get('nonce', 0) - 1, 0)}`\n\n"
+            "**新しいシード**\n"
+            f"Hash: `{current['server_seed_hash']}`\n"
+            f"Next Hash: `{current['next_server_seed_hash']}`\n"
+            f"Client: `{current['client_seed']}`"
+        ), SUCCESS_COLOR)
+        await message.channel.send(embed=embed)
+
+    except Exception as e:
+        print(f"[ERROR] on_seed_command: {e}")
+        embed = EmbedFactory.error("内部エラーが発生しました。")
+        await message.channel.send(embed=embed)
@@ -78,6 +78,47 @@ def safe_get_db_name() -> str:
 MONGO_URI: Final[str] = safe_get_mongo_uri()
 DB_NAME: Final[str] = safe_get_db_name()
 
+# 非同期DBバックエンド（"native": AsyncMongoClient/motor, "thread": 同期pymongoをスレッドプールで実行）
+DB_ASYNC_BACKEND: Final[str] = os.getenv("DB_ASYNC_BACKEND", "native").lower()
+DB_THREAD_POOL_SIZE: Final[int] = int(os.getenv("DB_THREAD_POOL_SIZE", "8"))
+
+# 残高キャッシュ（ライトスルー）
+BALANCE_CACHE_SIZE: Final[int] = int(os.getenv("BALANCE_CACHE_SIZE", "10000"))
+BALANCE_CACHE_TTL: Final[float] = float(os.getenv("BALANCE_CACHE_TTL", "300"))  # 秒
+
+# ゲームセッションの保存先（memory: メモリのみ / mongo: 再起動後に復元できるようスナップショットを保存）
+SESSION_BACKEND: Final[str] = os.getenv("SESSION_BACKEND", "mongo").lower()
+SESSION_SNAPSHOT_RETENTION_SECONDS: Final[int] = int(os.getenv("SESSION_SNAPSHOT_RETENTION_SECONDS", "86400"))
+
+# ゲームセッションの放置タイムアウト（秒）と、放置されたときの精算方法
+# refund: 賭け金を返す（結果に関わる情報を見せる前のセッションのみ、見せた後は forfeit）
+# cashout: その時点の払い戻し額を支払う（mines・rpsのみ） / forfeit: 没収
+SESSION_IDLE_TIMEOUT_DEFAULT: Final[int] = int(os.getenv("SESSION_IDLE_TIMEOUT", "900"))
+SESSION_IDLE_TIMEOUTS: Final[dict[str, int]] = {
+    game: int(os.getenv(f"SESSION_IDLE_TIMEOUT_{game.upper()}", str(SESSION_IDLE_TIMEOUT_DEFAULT)))
+    for game in ("mines", "blackjack", "dice", "rps")
+}
+SESSION_EXPIRE_ACTIONS: Final[dict[str, str]] = {
+    "mines": os.getenv("SESSION_EXPIRE_ACTION_MINES", "cashout").lower(),
+    "blackjack": os.getenv("SESSION_EXPIRE_ACTION_BLACKJACK", "forfeit").lower(),
+    "dice": os.getenv("SESSION_EXPIRE_ACTION_DICE", "forfeit").lower(),
+    "rps": os.getenv("SESSION_EXPIRE_ACTION_RPS", "cashout").lower(),
+}
+SESSION_SWEEP_INTERVAL_SECONDS: Final[int] = int(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+SESSION_MAX_PER_USER: Final[int] = int(os.getenv("SESSION_MAX_PER_USER", "3"))
+SESSION_MAX_GLOBAL: Final[int] = int(os.getenv("SESSION_MAX_GLOBAL", "1000"))
+
+# ゲーム結果（ベット履歴・ストリーク）のまとめ書き込み
+RESULT_WRITER_FLUSH_MS: Final[int] = int(os.getenv("RESULT_WRITER_FLUSH_MS", "500"))
+RESULT_WRITER_MAX_BATCH: Final[int] = int(os.getenv("RESULT_WRITER_MAX_BATCH", "200"))
+
+# ログチャンネルへの送信キュー（チャンネルごとの送信レート・連続送信数・まとめ待ち時間・未送信数の上限）
+LOG_DISPATCH_RATE: Final[float] = float(os.getenv("LOG_DISPATCH_RATE", "1"))
+LOG_DISPATCH_BURST: Final[int] = int(os.getenv("LOG_DISPATCH_BURST", "5"))
+LOG_DISPATCH_LINGER_MS: Final[int] = int(os.getenv("LOG_DISPATCH_LINGER_MS", "250"))
+LOG_DISPATCH_MAX_PENDING: Final[int] = int(os.getenv("LOG_DISPATCH_MAX_PENDING", "1000"))
+LOG_DISPATCH_DRAIN_SECONDS: Final[float] = float(os.getenv("LOG_DISPATCH_DRAIN_SECONDS", "10"))  # 停止時に未送信分を送り切るまで待つ秒数
+
 # コレクション名
 TOKENS_COLLECTION: Final[str] = os.getenv("TOKENS_COLLECTION", "tokens")
 USERS_COLLECTION: Final[str] = os.getenv("USERS_COLLECTION", "users")
@@ -86,11 +127,65 @@ CASINO_STATS_COLLECTION: Final[str] = os.getenv("CASINO_STATS_COLLECTION", "casi
 MODELS_COLLECTION: Final[str] = os.getenv("MODELS_COLLECTION", "models")
 BLACKJACK_LOGS_COLLECTION: Final[str] = os.getenv("BLACKJACK_LOGS_COLLECTION", "blackjack_logs")
 FINANCIAL_TRANSACTIONS_COLLECTION: Final[str] = os.getenv("FINANCIAL_TRANSACTIONS_COLLECTION", "financial_transactions")
+FINANCIAL_LEDGER_COLLECTION: Final[str] = os.getenv("FINANCIAL_LEDGER_COLLECTION", "financial_ledger")
+DAILY_ROLLUPS_COLLECTION: Final[str] = os.getenv("DAILY_ROLLUPS_COLLECTION", "daily_rollups")
 CASINO_TRANSACTION_COLLECTION: Final[str] = os.getenv("CASINO_TRANSACTION_COLLECTION", "casino_transactions")
 BET_HISTORY_COLLECTION: Final[str] = os.getenv("BET_HISTORY_COLLECTION", "bet_history")
+PF_RECORDS_COLLECTION: Final[str] = os.getenv("PF_RECORDS_COLLECTION", "pf_records")
+GAME_SESSIONS_COLLECTION: Final[str] = os.getenv("GAME_SESSIONS_COLLECTION", "game_sessions")
+BET_HISTORY_BUCKET_CAP: Final[int] = int(os.getenv("BET_HISTORY_BUCKET_CAP", "500"))  # 1バケット（ユーザー×ゲーム×日）に残すベット数
 BOT_STATE_COLLECTION: Final[str] = os.getenv("BOT_STATE_COLLECTION", "bot_state")
 BLACKLIST_COLLECTION: Final[str] = os.getenv("BLACKLIST_COLLECTION", "blacklist")
 
+# ========================================
+# レポート設定
+# ========================================
+ROLLUP_CATCHUP_MINUTES: Final[int] = int(os.getenv("ROLLUP_CATCHUP_MINUTES", "10"))  # 日次集計の追いつき処理間隔（分）
+ROLLUP_RESCAN_SECONDS: Final[int] = int(os.getenv("ROLLUP_RESCAN_SECONDS", "600"))  # 追いつき処理で毎回再計算する直近の範囲（秒）
+
+# レポートのグラフ描画（matplotlib、ワーカープロセスで実行）
+CHART_WORKERS: Final[int] = int(os.getenv("CHART_WORKERS", "1"))  # 描画プロセス数
+CHART_CACHE_SIZE: Final[int] = int(os.getenv("CHART_CACHE_SIZE", "8"))  # キャッシュするグラフ数（メモリ・ファイルそれぞれ）
+CHART_TIMEOUT_SECONDS: Final[float] = float(os.getenv("CHART_TIMEOUT_SECONDS", "60"))  # 1件あたりの待機上限（秒、初回はプロセス起動を含む）
+CHART_CACHE_DIR: Final[str] = os.getenv("CHART_CACHE_DIR", "reports")  # 描画したグラフの保存先
+
+# ========================================
+# 画像描画設定
+# ========================================
+RENDER_WORKERS: Final[int] = int(os.getenv("RENDER_WORKERS", "2"))  # 描画スレッド数
+RENDER_QUEUE_SIZE: Final[int] = int(os.getenv("RENDER_QUEUE_SIZE", "16"))  # 実行中以外に待機できる描画数
+RENDER_TIMEOUT_SECONDS: Final[float] = float(os.getenv("RENDER_TIMEOUT_SECONDS", "10"))  # 1件あたりの待機上限（秒）
+# ゲーム画像の出力形式（png: 通常のPNG / png8: 256色に減色したPNG / webp: WebP）
+RENDER_IMAGE_FORMAT: Final[str] = os.getenv("RENDER_IMAGE_FORMAT", "png").lower()
+RENDER_WEBP_QUALITY: Final[int] = int(os.getenv("RENDER_WEBP_QUALITY", "85"))
+
+# アバター画像キャッシュ
+AVATAR_CACHE_SIZE: Final[int] = int(os.getenv("AVATAR_CACHE_SIZE", "512"))  # キャッシュする画像数
+AVATAR_CACHE_TTL: Final[int] = int(os.getenv("AVATAR_CACHE_TTL", "3600"))  # キャッシュの有効期限（秒）
+AVATAR_FETCH_TIMEOUT: Final[float] = float(os.getenv("AVATAR_FETCH_TIMEOUT", "3"))  # 取得のタイムアウト（秒）
+AVATAR_FETCH_SIZE: Final[int] = int(os.getenv("AVATAR_FETCH_SIZE", "128"))  # 取得する画像サイズ（2の累乗）
+
+# ========================================
+# Provably Fair設定
+# ========================================
+# サーバーシードの使い方（game: ゲームごとに新しいシード / rotate: ユーザーごとのシードをnonceで使い回し、変更時に公開）
+PF_SEED_MODE: Final[str] = os.getenv("PF_SEED_MODE", "game").lower()
+PF_SEED_POOL_SIZE: Final[int] = int(os.getenv("PF_SEED_POOL_SIZE", "256"))  # 事前生成しておくシード数
+PF_SEED_POOL_LOW_WATER: Final[int] = int(os.getenv("PF_SEED_POOL_LOW_WATER", "64"))  # この数を下回ったら補充
+
+# ========================================
+# レート制限設定
+# ========================================
+# トークンバケット（RATE: 1秒あたりの補充数、0で無効 / BURST: 連続で実行できる数）
+RATE_LIMIT_COMMAND_RATE: Final[float] = float(os.getenv("RATE_LIMIT_COMMAND_RATE", "0.5"))  # コマンド（ユーザーごと）
+RATE_LIMIT_COMMAND_BURST: Final[int] = int(os.getenv("RATE_LIMIT_COMMAND_BURST", "3"))
+RATE_LIMIT_CHANNEL_RATE: Final[float] = float(os.getenv("RATE_LIMIT_CHANNEL_RATE", "5"))  # コマンド（チャンネルごと）
+RATE_LIMIT_CHANNEL_BURST: Final[int] = int(os.getenv("RATE_LIMIT_CHANNEL_BURST", "15"))
+RATE_LIMIT_INTERACTION_RATE: Final[float] = float(os.getenv("RATE_LIMIT_INTERACTION_RATE", "3"))  # ゲームのボタン（ユーザーごと）
+RATE_LIMIT_INTERACTION_BURST: Final[int] = int(os.getenv("RATE_LIMIT_INTERACTION_BURST", "5"))
+# ゲーム・送金コマンドが同じユーザーの前の処理の完了を待つ最大秒数
+GAME_LOCK_WAIT_SECONDS: Final[float] = float(os.getenv("GAME_LOCK_WAIT_SECONDS", "3"))
+
 # ========================================
 # 通貨設定
 # ========================================
@@ -0,0 +1,380 @@
+"""
+非同期データベースアクセスモジュール
+database.db と同じ関数群を async で提供し、イベントループをブロックせずにMongoDBへアクセスします
+
+バックエンドは config.DB_ASYNC_BACKEND で切り替えます:
+    native: AsyncMongoClient（pymongo 4.9+）または motor を使用
+    thread: database.db の同期関数を上限付きスレッドプールで実行
+"""
+import asyncio
+import datetime
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Optional, TypeVar
+
+from pymongo import ReturnDocument
+
+import config
+from database import db
+from database.balance import DebitResult, balance_cache
+from database.result_writer import game_result_writer
+
+# 非同期ドライバはオプション依存（未導入時はスレッドプールにフォールバック）
+try:
+    from pymongo import AsyncMongoClient as _AsyncClient
+except ImportError:
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient as _AsyncClient
+    except ImportError:
+        _AsyncClient = None
+
+T = TypeVar("T")
+
+# ========================================
+# 接続（シングルトン）
+# ========================================
+_async_client: Optional[Any] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def use_thread_backend() -> bool:
+    """スレッドプールバックエンドを使用するか判定"""
+    return config.DB_ASYNC_BACKEND == "thread" or _AsyncClient is None
+
+
+def get_async_client() -> Any:
+    """非同期MongoDBクライアントのシングルトンインスタンスを取得"""
+    global _async_client
+    if _async_client is None:
+        if _AsyncClient is None:
+            raise RuntimeError("非同期MongoDBドライバ（pymongo 4.9+ または motor）がインストールされていません")
+        _async_client = _AsyncClient(config.MONGO_URI)
+    return _async_client
+
+
+def get_async_collection(collection_name: str) -> Any:
+    """指定された非同期コレクションを取得"""
+    return get_async_client()[config.DB_NAME][collection_name]
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """同期DB呼び出し用のスレッドプールを取得"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=config.DB_THREAD_POOL_SIZE,
+            thread_name_prefix="db"
+        )
+    return _executor
+
+
+async def run_in_db_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    同期DB関数をスレッドプールで実行
+
+    Args:
+        func: 実行する同期関数
+        *args: 位置引数
+        **kwargs: キーワード引数
+
+    Returns:
+        関数の戻り値
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _threaded(func: Callable[..., T]) -> Callable[..., Any]:
+    """同期DB関数をスレッドプール実行の async 関数に変換"""
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        return await run_in_db_thread(func, *args, **kwargs)
+    return wrapper
+
+
+async def close() -> None:
+    """クライアントとスレッドプールを解放"""
+    global _async_client, _executor
+    if _async_client is not None:
+        result = _async_client.close()
+        if asyncio.iscoroutine(result):
+            await result
+        _async_client = None
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+# ========================================
+# Provably Fair関連
+# ========================================
+async def load_pf_params(user_id: int) -> tuple[Optional[str], int]:
+    """ユーザーのProvably Fairパラメータを読み込む"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.load_pf_params, user_id)
+
+    doc = await get_async_collection("pf_params").find_one({"user_id": user_id})
+    if doc:
+        return doc.get("client_seed"), doc.get("nonce", 0)
+    return None, 0
+
+
+async def save_pf_params(user_id: int, client_seed: str, server_seed: str, nonce: int) -> None:
+    """ユーザーのProvably Fairパラメータを保存"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.save_pf_params, user_id, client_seed, server_seed, nonce)
+
+    await get_async_collection("pf_params").update_one(
+        {"user_id": user_id},
+        {
+            "$set": {
+                "client_seed": client_seed,
+                "server_seed": server_seed,
+                "nonce": nonce
+            }
+        },
+        upsert=True
+    )
+
+
+# ========================================
+# ブラックリスト管理
+# ========================================
+async def is_blacklisted(user_id: int) -> bool:
+    """ユーザーがブラックリストに登録されているか確認"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.is_blacklisted, user_id)
+
+    doc = await get_async_collection(config.BLACKLIST_COLLECTION).find_one({"user_id": user_id})
+    return doc is not None
+
+
+# ========================================
+# ユーザー残高管理
+# ========================================
+async def get_user_balance(user_id: int) -> Optional[int]:
+    """ユーザーのPNC残高を取得（キャッシュ優先）"""
+    cached = balance_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    if use_thread_backend():
+        return await run_in_db_thread(db.get_user_balance, user_id)
+
+    token = balance_cache.read_token()
+    user = await get_async_collection(config.USERS_COLLECTION).find_one(
+        {"user_id": user_id}, {"balance": 1}
+    )
+    if not user:
+        return None
+    balance_cache.fill(user_id, user["balance"], token)
+    return user["balance"]
+
+
+async def update_user_balance(user_id: int, amount: int) -> int:
+    """ユーザーのPNC残高を更新（増減）し、更新後の残高を返す"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.update_user_balance, user_id, amount)
+
+    token = balance_cache.begin_write(user_id)
+    balance = None
+    try:
+        user = await get_async_collection(config.USERS_COLLECTION).find_one_and_update(
+            {"user_id": user_id},
+            {"$inc": {"balance": amount}},
+            projection={"balance": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        balance = user["balance"]
+    finally:
+        balance_cache.end_write(user_id, token, balance)
+    return balance
+
+
+async def try_debit(user_id: int, amount: int) -> DebitResult:
+    """残高が足りる場合のみ原子的に引き落とす（database.db.try_debit の非同期版）"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.try_debit, user_id, amount)
+
+    token = balance_cache.begin_write(user_id)
+    balance = None
+    try:
+        user = await get_async_collection(config.USERS_COLLECTION).find_one_and_update(
+            {"user_id": user_id, "balance": {"$gte": amount}},
+            {"$inc": {"balance": -amount}},
+            projection={"balance": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if user:
+            balance = user["balance"]
+    finally:
+        balance_cache.end_write(user_id, token, balance)
+    if balance is not None:
+        return DebitResult(ok=True, balance=balance)
+
+    return DebitResult(ok=False, balance=await get_user_balance(user_id))
+
+
+async def get_user_info(user_id: int) -> Optional[dict[str, Any]]:
+    """ユーザードキュメントを取得（登録確認用）"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.users_collection.find_one, {"user_id": user_id})
+
+    return await get_async_collection(config.USERS_COLLECTION).find_one({"user_id": user_id})
+
+
+# ========================================
+# ユーザーストリーク管理
+# ========================================
+async def update_user_streak(user_id: int, game_type: str, is_win: bool) -> None:
+    """勝敗の連勝・連敗データを更新（書き込みキュー経由でまとめて反映）"""
+    game_result_writer.record_streak(user_id, game_type, is_win)
+
+
+async def get_user_streaks(user_id: int, game_type: str) -> tuple[int, int]:
+    """ゲームタイプごとのユーザーの連勝・連敗記録を取得（未書き込み分を含む）"""
+    if use_thread_backend():
+        win_streak, lose_streak = await run_in_db_thread(db.get_user_streaks, user_id, game_type)
+    else:
+        user = await get_async_collection(config.USERS_COLLECTION).find_one({"user_id": user_id}, {"streaks": 1})
+        game_streaks = (user or {}).get("streaks", {}).get(game_type, {})
+        win_streak, lose_streak = game_streaks.get("win_streak", 0), game_streaks.get("lose_streak", 0)
+
+    pending = game_result_writer.pending_streak(user_id, game_type)
+    if pending is not None:
+        return pending.apply_to(win_streak, lose_streak)
+    return win_streak, lose_streak
+
+
+# ========================================
+# ベット履歴管理
+# ========================================
+async def update_bet_history(user_id: int, game_type: str, amount: int, is_win: bool) -> None:
+    """ユーザーのベット履歴を記録（書き込みキュー経由でまとめて反映）"""
+    game_result_writer.record_bet(user_id, game_type, amount, is_win)
+
+
+# ========================================
+# ユーザー登録
+# ========================================
+async def register_user(user_id: int, sender_external_id: str) -> None:
+    """新規ユーザーを登録"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.register_user, user_id, sender_external_id)
+
+    token = balance_cache.begin_write(user_id)
+    balance = None
+    try:
+        await get_async_collection(config.USERS_COLLECTION).update_one(
+            {"user_id": user_id},
+            {"$set": {
+                "sender_external_id": sender_external_id,
+                "balance": 0
+            }},
+            upsert=True
+        )
+        balance = 0
+    finally:
+        balance_cache.end_write(user_id, token, balance)
+
+
+# ========================================
+# トランザクション管理
+# ========================================
+async def get_user_transactions(
+    user_id: int,
+    game_type: Optional[str] = None,
+    days: Optional[int] = None
+) -> list[dict[str, Any]]:
+    """指定ユーザーの金銭取引履歴を取得（payin、payout、exchangeのみ）"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.get_user_transactions, user_id, game_type, days)
+
+    query: dict[str, Any] = {"user_id": user_id}
+
+    if game_type:
+        query["type"] = game_type
+
+    if days:
+        query["timestamp"] = {"$gte": datetime.datetime.now(datetime.timezone.utc) - timedelta(days=days)}
+
+    cursor = get_async_collection(config.FINANCIAL_LEDGER_COLLECTION).find(query, {"_id": 0}).sort("timestamp", 1)
+    return await cursor.to_list(length=None)
+
+
+# ========================================
+# ボット状態管理
+# ========================================
+async def save_account_panel_message_id(message_id: int) -> None:
+    """アカウントパネルメッセージIDを保存"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.bot_state_collection.update_one,
+                                      {"_id": "account_panel"}, {"$set": {"message_id": message_id}}, upsert=True)
+
+    await get_async_collection(config.BOT_STATE_COLLECTION).update_one(
+        {"_id": "account_panel"},
+        {"$set": {"message_id": message_id}},
+        upsert=True
+    )
+
+
+async def get_account_panel_message_id() -> Optional[int]:
+    """アカウントパネルメッセージIDを取得"""
+    if use_thread_backend():
+        doc = await run_in_db_thread(db.bot_state_collection.find_one, {"_id": "account_panel"})
+    else:
+        doc = await get_async_collection(config.BOT_STATE_COLLECTION).find_one({"_id": "account_panel"})
+    return doc["message_id"] if doc and "message_id" in doc else None
+
+
+# ========================================
+# 設定管理
+# ========================================
+async def is_no_fee_mode_enabled() -> bool:
+    """手数料無料モードが有効かチェック"""
+    if use_thread_backend():
+        return await run_in_db_thread(db.is_no_fee_mode_enabled)
+
+    config_doc = await get_async_collection("payin_settings").find_one({"_id": "conversion_rate"})
+    return bool(config_doc and config_doc.get("no_fee_mode", False))
+
+
+# ========================================
+# その他（ホットパス外のためスレッドプール経由）
+# ========================================
+acquire_pf_seed = _threaded(db.acquire_pf_seed)
+get_pf_seed = _threaded(db.get_pf_seed)
+rotate_pf_seed = _threaded(db.rotate_pf_seed)
+
+get_tokens = _threaded(db.get_tokens)
+save_tokens = _threaded(db.save_tokens)
+get_all_user_balances = _threaded(db.get_all_user_balances)
+
+get_user_invite = _threaded(db.get_user_invite)
+save_user_invite = _threaded(db.save_user_invite)
+log_invited_user = _threaded(db.log_invited_user)
+get_invited_users = _threaded(db.get_invited_users)
+get_unredeemed_users = _threaded(db.get_unredeemed_users)
+mark_users_as_redeemed = _threaded(db.mark_users_as_redeemed)
+has_already_been_invited = _threaded(db.has_already_been_invited)
+mark_user_as_invited = _threaded(db.mark_user_as_invited)
+
+save_casino_table = _threaded(db.save_casino_table)
+get_all_casino_tables = _threaded(db.get_all_casino_tables)
+delete_casino_table = _threaded(db.delete_casino_table)
+clear_all_casino_tables = _threaded(db.clear_all_casino_tables)
+get_casino_table_count = _threaded(db.get_casino_table_count)
+
+get_prize_pocket = _threaded(db.get_prize_pocket)
+add_prizes_to_pocket = _threaded(db.add_prizes_to_pocket)
+clear_prize_pocket = _threaded(db.clear_prize_pocket)
+
+get_carry_over_points = _threaded(db.get_carry_over_points)
+add_carry_over_points = _threaded(db.add_carry_over_points)
+clear_carry_over_points = _threaded(db.clear_carry_over_points)
+
+get_random_unused_account = _threaded(db.get_random_unused_account)
+mark_accounts_as_exchanged = _threaded(db.mark_accounts_as_exchanged)
+get_available_account_count = _threaded(db.get_available_account_count)
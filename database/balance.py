@@ -0,0 +1,170 @@
+"""
+残高キャッシュモジュール
+ユーザー残高のLRUライトスルーキャッシュと、引き落とし結果の型を提供します
+
+残高の書き込みはすべて database.db / database.async_db の関数を経由し、
+他の書き込みと重ならなかった場合のみ書き込み後の残高（MongoDBが返した値）でキャッシュを更新します。
+読み取りはキャッシュにあればMongoDBへ問い合わせません。
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import config
+
+
+@dataclass(frozen=True)
+class DebitResult:
+    """
+    引き落とし結果
+
+    Attributes:
+        ok: 引き落としに成功したか
+        balance: 成功時は引き落とし後の残高、失敗時は現在の残高（未登録ならNone）
+    """
+    ok: bool
+    balance: Optional[int]
+
+    @property
+    def registered(self) -> bool:
+        """ユーザーが登録済みか"""
+        return self.balance is not None
+
+
+class BalanceCache:
+    """
+    ユーザー残高のLRUキャッシュ（スレッドセーフ）
+
+    DBスレッドプールとネイティブ非同期クライアントの両方から更新されるため、
+    書き込みごとに連番（バージョン）を振り、古い結果で新しい値を上書きしないようにします。
+
+        - 書き込み: begin_write でキャッシュを破棄し、end_write で重なった書き込みがなければ結果を保存する
+        - 読み取り: read_token を取ってから問い合わせ、その後にそのユーザーへの書き込みがなければ fill で保存する
+
+    他プロセスからの書き込みに備えて ttl 秒で失効させます。
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._seq = 0
+        # ユーザーID → 最後に書き込みを開始・終了した連番
+        self._written: OrderedDict[int, int] = OrderedDict()
+        # _written から追い出したユーザーの連番の最大値（追い出したユーザーはこの時点で書き込まれたとみなす）
+        self._written_floor = 0
+        # ユーザーID → 実行中の書き込み数
+        self._inflight: dict[int, int] = {}
+
+    def get(self, user_id: int) -> Optional[int]:
+        """キャッシュ済みの残高を取得（未キャッシュ・失効時はNone）"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            balance, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return balance
+
+    # ========================================
+    # 読み取り結果の保存
+    # ========================================
+    def read_token(self) -> int:
+        """DBへ問い合わせる前に取得する連番（fill に渡す）"""
+        with self._lock:
+            return self._seq
+
+    def fill(self, user_id: int, balance: int, token: int) -> None:
+        """
+        DBから読んだ残高をキャッシュ
+
+        token の取得後にそのユーザーへの書き込みが始まっていた場合は保存しません。
+        """
+        with self._lock:
+            if self._inflight.get(user_id) or self._last_write(user_id) > token:
+                return
+            self._store(user_id, balance)
+
+    # ========================================
+    # 書き込み
+    # ========================================
+    def begin_write(self, user_id: int) -> int:
+        """
+        残高の書き込み前に呼び出し、キャッシュを破棄
+
+        Returns:
+            int: end_write に渡す連番
+        """
+        with self._lock:
+            token = self._mark_written(user_id)
+            self._inflight[user_id] = self._inflight.get(user_id, 0) + 1
+            self._entries.pop(user_id, None)
+            return token
+
+    def end_write(self, user_id: int, token: int, balance: Optional[int] = None) -> None:
+        """
+        残高の書き込み後に呼び出す（失敗時は balance を省略）
+
+        この書き込みの後に別の書き込みが始まっていた場合や、実行中の書き込みが残っている場合は
+        どちらの結果が新しいか分からないため、保存せずに破棄したままにします。
+        """
+        with self._lock:
+            remaining = self._inflight.get(user_id, 1) - 1
+            if remaining > 0:
+                self._inflight[user_id] = remaining
+            else:
+                self._inflight.pop(user_id, None)
+
+            latest = balance is not None and remaining == 0 and self._last_write(user_id) == token
+            # 書き込み中に始まった読み取りの結果を保存させない
+            self._mark_written(user_id)
+            if latest:
+                self._store(user_id, balance)
+            else:
+                self._entries.pop(user_id, None)
+
+    def invalidate(self, user_id: int) -> None:
+        """ユーザーのキャッシュを破棄"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """全キャッシュを破棄"""
+        with self._lock:
+            self._entries.clear()
+
+    # ========================================
+    # 内部処理（ロック内で呼び出す）
+    # ========================================
+    def _last_write(self, user_id: int) -> int:
+        return self._written.get(user_id, self._written_floor)
+
+    def _mark_written(self, user_id: int) -> int:
+        self._seq += 1
+        self._written[user_id] = self._seq
+        self._written.move_to_end(user_id)
+        # 実行中の書き込みがあるユーザーは追い出さない（end_write で連番を照合するため）
+        while len(self._written) > max(self.max_size, 1):
+            oldest, seq = next(iter(self._written.items()))
+            if oldest in self._inflight:
+                break
+            del self._written[oldest]
+            self._written_floor = max(self._written_floor, seq)
+        return self._seq
+
+    def _store(self, user_id: int, balance: int) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[user_id] = (balance, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+balance_cache = BalanceCache(config.BALANCE_CACHE_SIZE, config.BALANCE_CACHE_TTL)
@@ -0,0 +1,144 @@
+"""
+ベット履歴・ストリークの更新定義モジュール
+bet_history のバケット形式と、連勝・連敗の差分（まとめて1回で書き込める形）を提供します
+
+bet_history ドキュメント形式（ユーザー × ゲーム × JST日付で1ドキュメント）:
+    {
+        "user_id": int,
+        "game_type": str,
+        "day": "YYYY-MM-DD",
+        "bets": [{"amount": int, "is_win": bool, "result": "win" | "lose" | "draw", "timestamp": datetime}, ...]
+                （最新 BET_HISTORY_BUCKET_CAP 件）,
+        "count": int,
+        "wins": int,
+        "draws": int,
+        "total_amount": int
+    }
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+import pymongo
+
+import config
+from config import JST
+
+# ========================================
+# 定数
+# ========================================
+# ゲームの勝敗（引き分け・返金は連勝・連敗を変えない）
+GAME_WIN = "win"
+GAME_LOSE = "lose"
+GAME_DRAW = "draw"
+
+BET_HISTORY_INDEXES: list[tuple[list[tuple[str, int]], dict[str, Any]]] = [
+    ([("user_id", pymongo.ASCENDING), ("game_type", pymongo.ASCENDING), ("day", pymongo.ASCENDING)], {
+        "name": "user_id_game_type_day",
+        "unique": True,
+        "partialFilterExpression": {"day": {"$exists": True}}
+    }),
+]
+
+
+# ========================================
+# ベット履歴
+# ========================================
+def game_result(amount: int, payout: int) -> str:
+    """賭け金と払い戻しから勝敗を判定（同額の払い戻しは引き分け）"""
+    if payout > amount:
+        return GAME_WIN
+    if payout == amount:
+        return GAME_DRAW
+    return GAME_LOSE
+
+
+def build_bet_entry(
+    amount: int,
+    is_win: bool,
+    timestamp: Optional[datetime.datetime] = None,
+    result: Optional[str] = None
+) -> dict[str, Any]:
+    """ベット履歴の1件分を作成（result 省略時は is_win から勝ち・負けを設定）"""
+    return {
+        "amount": amount,
+        "is_win": bool(is_win),
+        "result": result or (GAME_WIN if is_win else GAME_LOSE),
+        "timestamp": timestamp or datetime.datetime.now(datetime.timezone.utc)
+    }
+
+
+def bucket_filter(user_id: int, game_type: str, timestamp: datetime.datetime) -> dict[str, Any]:
+    """ベットが属するバケットの検索条件を作成"""
+    return {
+        "user_id": user_id,
+        "game_type": game_type,
+        "day": timestamp.astimezone(JST).strftime("%Y-%m-%d")
+    }
+
+
+def bucket_update(entries: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """
+    同じバケットに入るベットをまとめて追記する更新を作成
+
+    配列は $slice で最新 BET_HISTORY_BUCKET_CAP 件に制限し、件数・勝利数・合計額は別フィールドで保持します。
+    """
+    entries = list(entries)
+    return {
+        "$push": {"bets": {"$each": entries, "$slice": -config.BET_HISTORY_BUCKET_CAP}},
+        "$inc": {
+            "count": len(entries),
+            "wins": sum(1 for entry in entries if entry["is_win"]),
+            "draws": sum(1 for entry in entries if entry.get("result") == GAME_DRAW),
+            "total_amount": sum(entry["amount"] for entry in entries)
+        }
+    }
+
+
+# ========================================
+# ストリーク
+# ========================================
+@dataclass
+class StreakDelta:
+    """
+    未反映の連勝・連敗の変化
+
+    Attributes:
+        is_win: 末尾の連続結果が勝ちか
+        count: 末尾の連続結果の回数
+        reset: Trueなら既存の記録を count で上書き、Falseなら既存の同方向の記録に count を加算
+    """
+    is_win: bool
+    count: int = 1
+    reset: bool = False
+
+    def record(self, is_win: bool) -> None:
+        """勝敗を1件追加"""
+        if is_win == self.is_win:
+            self.count += 1
+        else:
+            self.is_win = is_win
+            self.count = 1
+            self.reset = True
+
+    def then(self, later: "StreakDelta") -> "StreakDelta":
+        """この差分の後に later を適用した差分を返す（書き込み失敗時の再結合用）"""
+        if later.reset or later.is_win != self.is_win:
+            return StreakDelta(is_win=later.is_win, count=later.count, reset=later.reset or later.is_win != self.is_win)
+        return StreakDelta(is_win=self.is_win, count=self.count + later.count, reset=self.reset)
+
+    def apply_to(self, win_streak: int, lose_streak: int) -> tuple[int, int]:
+        """保存済みの記録にこの差分を適用した (連勝, 連敗) を返す"""
+        current = win_streak if self.is_win else lose_streak
+        value = self.count if self.reset else current + self.count
+        return (value, 0) if self.is_win else (0, value)
+
+    def to_update(self, game_type: str) -> dict[str, Any]:
+        """users コレクションへの更新を作成"""
+        prefix = f"streaks.{game_type}"
+        current = f"{prefix}.win_streak" if self.is_win else f"{prefix}.lose_streak"
+        other = f"{prefix}.lose_streak" if self.is_win else f"{prefix}.win_streak"
+
+        if self.reset:
+            return {"$set": {current: self.count, other: 0}}
+        return {"$inc": {current: self.count}, "$set": {other: 0}}
@@ -1,29 +1,41 @@
 """
 データベース接続とコレクション管理モジュール
 MongoDBとの接続を一元管理し、型安全なデータベース操作を提供します
+
+インポート時には接続しません。コレクションは LazyCollection として定義し、
+最初の操作時（または起動処理で connect() を呼んだとき）に MongoClient を作成します。
 """
 import datetime
+import secrets
+import threading
 from datetime import timedelta
-from typing import Optional, Any
+from typing import Any, Callable, Optional
 
 import pymongo
+from pymongo import ReturnDocument
 from pymongo.collection import Collection
 from pymongo.database import Database
 
 import config
+from database.balance import DebitResult, balance_cache
+from database.bet_history import StreakDelta, bucket_filter, bucket_update, build_bet_entry
 
 # ========================================
 # データベース接続（シングルトン）
 # ========================================
 _client: Optional[pymongo.MongoClient] = None
 _db: Optional[Database] = None
+_client_lock = threading.Lock()
 
 
 def get_client() -> pymongo.MongoClient:
     """MongoDBクライアントのシングルトンインスタンスを取得"""
     global _client
     if _client is None:
-        _client = pymongo.MongoClient(config.MONGO_URI)
+        # DBスレッドから同時に呼ばれてもクライアントは1つだけ作成する
+        with _client_lock:
+            if _client is None:
+                _client = pymongo.MongoClient(config.MONGO_URI)
     return _client
 
 
@@ -35,23 +47,59 @@ def get_database() -> Database:
     return _db
 
 
+def connect() -> None:
+    """MongoDBに接続して疎通を確認（起動処理から呼ぶ。失敗時は例外）"""
+    get_client().admin.command("ping")
+
+
 # ========================================
 # コレクション定義
 # ========================================
-def get_collection(collection_name: str) -> Collection:
-    """指定されたコレクションを取得"""
-    return get_database()[collection_name]
+class LazyCollection:
+    """
+    最初の操作時に実体のコレクションを取得するハンドル
+
+    属性アクセスはすべて pymongo の Collection に委譲します（name は接続せずに参照可能）。
+    """
+    __slots__ = ("name", "_collection")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._collection: Optional[Collection] = None
+
+    def resolve(self) -> Collection:
+        """実体のコレクションを取得"""
+        if self._collection is None:
+            self._collection = get_database()[self.name]
+        return self._collection
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.resolve(), attr)
+
+    def __getitem__(self, name: str) -> Collection:
+        return self.resolve()[name]
+
+    def __repr__(self) -> str:
+        return f"LazyCollection({self.name!r})"
+
+
+def get_collection(collection_name: str) -> LazyCollection:
+    """指定されたコレクションのハンドルを取得（接続は最初の操作時）"""
+    return LazyCollection(collection_name)
 
 
 # メインコレクション
 tokens_collection = get_collection(config.TOKENS_COLLECTION)
 blacklist_collection = get_collection(config.BLACKLIST_COLLECTION)
 financial_transactions_collection = get_collection(config.FINANCIAL_TRANSACTIONS_COLLECTION)
+financial_ledger_collection = get_collection(config.FINANCIAL_LEDGER_COLLECTION)
+daily_rollups_collection = get_collection(config.DAILY_ROLLUPS_COLLECTION)
 casino_transactions_collection = get_collection(config.CASINO_TRANSACTION_COLLECTION)
 users_collection = get_collection(config.USERS_COLLECTION)
 casino_stats_collection = get_collection(config.CASINO_STATS_COLLECTION)
 models_collection = get_collection(config.MODELS_COLLECTION)
 bet_history_collection = get_collection(config.BET_HISTORY_COLLECTION)
+pf_records_collection = get_collection(config.PF_RECORDS_COLLECTION)
 bot_state_collection = get_collection(config.BOT_STATE_COLLECTION)
 
 # 追加コレクション
@@ -93,6 +141,81 @@ def save_pf_params(user_id: int, client_seed: str, server_seed: str, nonce: int)
     )
 
 
+def acquire_pf_seed(user_id: int, nonces: int, new_commitment: Callable[[], Any]) -> dict[str, Any]:
+    """
+    ユーザーのシードペアからゲーム1回分のnonceを予約（PF_SEED_MODE=rotate 用）
+
+    シードペアがなければ、現在とその次のサーバーシードを new_commitment() で作成します。
+
+    Args:
+        user_id: ユーザーID
+        nonces: 予約するnonceの数
+        new_commitment: server_seed・server_seed_hash を持つコミットメントを返す関数
+
+    Returns:
+        dict: 予約前のドキュメント（client_seed・server_seed・server_seed_hash・nonce・next_server_seed_hash）
+    """
+    while True:
+        doc = pf_collection.find_one_and_update(
+            {"user_id": user_id, "server_seed_hash": {"$exists": True}, "next_server_seed_hash": {"$exists": True}},
+            {"$inc": {"nonce": nonces}},
+            return_document=ReturnDocument.BEFORE
+        )
+        if doc:
+            doc.setdefault("nonce", 0)
+            return doc
+
+        current, upcoming = new_commitment(), new_commitment()
+        pf_collection.update_one(
+            {"user_id": user_id},
+            {"$setOnInsert": {"client_seed": secrets.token_hex(8), "nonce": 0}},
+            upsert=True
+        )
+        pf_collection.update_one(
+            {"user_id": user_id, "next_server_seed_hash": {"$exists": False}},
+            {"$set": {
+                "server_seed": current.server_seed,
+                "server_seed_hash": current.server_seed_hash,
+                "next_server_seed": upcoming.server_seed,
+                "next_server_seed_hash": upcoming.server_seed_hash,
+            }}
+        )
+
+
+def get_pf_seed(user_id: int) -> Optional[dict[str, Any]]:
+    """ユーザーのシードペアを取得（サーバーシードは含めない）"""
+    return pf_collection.find_one(
+        {"user_id": user_id},
+        {"_id": 0, "client_seed": 1, "nonce": 1, "server_seed_hash": 1, "next_server_seed_hash": 1}
+    )
+
+
+def rotate_pf_seed(user_id: int, upcoming: Any, client_seed: Optional[str] = None) -> Optional[dict[str, Any]]:
+    """
+    シードペアを次に進める（次のシードを現在に、upcoming を次のシードにする）
+
+    Args:
+        user_id: ユーザーID
+        upcoming: 新しい「次のシード」（server_seed・server_seed_hash を持つ）
+        client_seed: 新しいクライアントシード（省略時は現在のまま）
+
+    Returns:
+        dict: 変更前のドキュメント（公開するシードを含む）。シードペアがなければNone
+    """
+    return pf_collection.find_one_and_update(
+        {"user_id": user_id, "next_server_seed_hash": {"$exists": True}},
+        [{"$set": {
+            "server_seed": "$next_server_seed",
+            "server_seed_hash": "$next_server_seed_hash",
+            "next_server_seed": upcoming.server_seed,
+            "next_server_seed_hash": upcoming.server_seed_hash,
+            "client_seed": {"$literal": client_seed} if client_seed else "$client_seed",
+            "nonce": 0,
+        }}],
+        return_document=ReturnDocument.BEFORE
+    )
+
+
 # ========================================
 # ブラックリスト管理
 # ========================================
@@ -128,47 +251,83 @@ def save_tokens(access_token: str, refresh_token: str, device_uuid: str) -> None
 # ユーザー残高管理
 # ========================================
 def get_user_balance(user_id: int) -> Optional[int]:
-    """ユーザーのPNC残高を取得"""
-    user = users_collection.find_one({"user_id": user_id})
-    return user["balance"] if user else None
+    """ユーザーのPNC残高を取得（キャッシュ優先）"""
+    cached = balance_cache.get(user_id)
+    if cached is not None:
+        return cached
 
+    token = balance_cache.read_token()
+    user = users_collection.find_one({"user_id": user_id}, {"balance": 1})
+    if not user:
+        return None
+    balance_cache.fill(user_id, user["balance"], token)
+    return user["balance"]
 
-def update_user_balance(user_id: int, amount: int) -> None:
-    """ユーザーのPNC残高を更新（増減）"""
-    users_collection.update_one(
-        {"user_id": user_id},
-        {"$inc": {"balance": amount}},
-        upsert=True
-    )
 
-# ========================================
-# ユーザーストリーク管理
-# ========================================
-def update_user_streak(user_id: int, game_type: str, is_win: bool) -> None:
-    """勝敗の連勝・連敗データを更新"""
-    user_data = users_collection.find_one({"user_id": user_id})
+def update_user_balance(user_id: int, amount: int) -> int:
+    """
+    ユーザーのPNC残高を更新（増減）
 
-    if not user_data:
-        users_collection.insert_one({
-            "user_id": user_id,
-            "streaks": {game_type: {"win_streak": 0, "lose_streak": 0}}
-        })
-        user_data = users_collection.find_one({"user_id": user_id})
+    Returns:
+        int: 更新後の残高
+    """
+    token = balance_cache.begin_write(user_id)
+    balance = None
+    try:
+        user = users_collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$inc": {"balance": amount}},
+            projection={"balance": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        balance = user["balance"]
+    finally:
+        balance_cache.end_write(user_id, token, balance)
+    return balance
+
+
+def try_debit(user_id: int, amount: int) -> DebitResult:
+    """
+    残高が足りる場合のみ原子的に引き落とす
 
-    streak_data = user_data.get("streaks", {}).get(game_type, {"win_streak": 0, "lose_streak": 0})
-    win_streak = streak_data.get("win_streak", 0)
-    lose_streak = streak_data.get("lose_streak", 0)
+    残高条件付きの find_one_and_update 1回で確認と引き落としを行うため、
+    同時実行されたコマンドによる二重引き落としが起きません。
 
-    if is_win:
-        win_streak += 1
-        lose_streak = 0
-    else:
-        lose_streak += 1
-        win_streak = 0
+    Args:
+        user_id: ユーザーID
+        amount: 引き落とし額
 
+    Returns:
+        DebitResult: 成功時は引き落とし後の残高、失敗時は現在の残高
+    """
+    token = balance_cache.begin_write(user_id)
+    balance = None
+    try:
+        user = users_collection.find_one_and_update(
+            {"user_id": user_id, "balance": {"$gte": amount}},
+            {"$inc": {"balance": -amount}},
+            projection={"balance": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if user:
+            balance = user["balance"]
+    finally:
+        balance_cache.end_write(user_id, token, balance)
+    if balance is not None:
+        return DebitResult(ok=True, balance=balance)
+
+    # 失敗時はキャッシュを破棄済みのため最新値で判定する
+    return DebitResult(ok=False, balance=get_user_balance(user_id))
+
+# ========================================
+# ユーザーストリーク管理
+# ========================================
+def update_user_streak(user_id: int, game_type: str, is_win: bool) -> None:
+    """勝敗の連勝・連敗データを更新（1回の更新で反映）"""
     users_collection.update_one(
         {"user_id": user_id},
-        {"$set": {f"streaks.{game_type}.win_streak": win_streak, f"streaks.{game_type}.lose_streak": lose_streak}},
+        StreakDelta(is_win=is_win).to_update(game_type),
         upsert=True
     )
 
@@ -188,16 +347,11 @@ def get_user_streaks(user_id: int, game_type: str) -> tuple[int, int]:
 # ベット履歴管理
 # ========================================
 def update_bet_history(user_id: int, game_type: str, amount: int, is_win: bool) -> None:
-    """ユーザーのベット履歴をデータベースに記録"""
-    bet_entry = {
-        "amount": amount,
-        "is_win": bool(is_win),
-        "timestamp": datetime.datetime.now()
-    }
-
+    """ユーザーのベット履歴を日付バケットに記録"""
+    bet_entry = build_bet_entry(amount, is_win)
     bet_history_collection.update_one(
-        {"user_id": user_id},
-        {"$push": {f"bet_history.{game_type}.bets": bet_entry}},
+        bucket_filter(user_id, game_type, bet_entry["timestamp"]),
+        bucket_update([bet_entry]),
         upsert=True
     )
 
@@ -207,14 +361,20 @@ def update_bet_history(user_id: int, game_type: str, amount: int, is_win: bool)
 # ========================================
 def register_user(user_id: int, sender_external_id: str) -> None:
     """新規ユーザーを登録"""
-    users_collection.update_one(
-        {"user_id": user_id},
-        {"$set": {
-            "sender_external_id": sender_external_id,
-            "balance": 0
-        }},
-        upsert=True
-    )
+    token = balance_cache.begin_write(user_id)
+    balance = None
+    try:
+        users_collection.update_one(
+            {"user_id": user_id},
+            {"$set": {
+                "sender_external_id": sender_external_id,
+                "balance": 0
+            }},
+            upsert=True
+        )
+        balance = 0
+    finally:
+        balance_cache.end_write(user_id, token, balance)
 
 # ========================================
 # トランザクション管理
@@ -225,21 +385,15 @@ def get_user_transactions(
     days: Optional[int] = None
 ) -> list[dict[str, Any]]:
     """指定ユーザーの金銭取引履歴を取得（payin、payout、exchangeのみ）"""
-    doc = financial_transactions_collection.find_one({"user_id": user_id})
-
-    if not doc or "transactions" not in doc:
-        return []
-
-    transactions = doc["transactions"]
+    query: dict[str, Any] = {"user_id": user_id}
 
     if game_type:
-        transactions = [t for t in transactions if t.get("type") == game_type]
+        query["type"] = game_type
 
     if days:
-        threshold = datetime.datetime.now() - timedelta(days=days)
-        transactions = [t for t in transactions if t.get("timestamp") and t["timestamp"] >= threshold]
+        query["timestamp"] = {"$gte": datetime.datetime.now(datetime.timezone.utc) - timedelta(days=days)}
 
-    return transactions
+    return list(financial_ledger_collection.find(query, {"_id": 0}).sort("timestamp", pymongo.ASCENDING))
 
 
 # ========================================
@@ -0,0 +1,247 @@
+"""
+インデックス管理モジュール
+コレクションごとに必要なインデックスを宣言し、起動時にまとめて作成します。
+あわせて、コード内の主な検索条件を explain() で確認し、COLLSCAN（全件走査）になるものを報告します。
+
+使い方:
+    python -m database.indexes                 インデックスを作成してから監査
+    python -m database.indexes --audit-only    作成せずに監査のみ
+    python -m database.indexes --create-only   監査せずに作成のみ
+
+インデックスの作成は create_index を使うため、作成済みなら何もしません。
+既存データに重複がありユニークインデックスを作成できない場合は警告を出して続行します。
+"""
+import argparse
+import datetime
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+import pymongo
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+
+from database.bet_history import BET_HISTORY_INDEXES
+from database.db import (
+    active_users_collection,
+    bet_history_collection,
+    blacklist_collection,
+    bot_state_collection,
+    carry_over_points_collection,
+    casino_tables_collection,
+    exchanged_accounts_collection,
+    invite_redeem_collection,
+    invited_users_collection,
+    invites_collection,
+    pf_collection,
+    pf_records_collection,
+    prize_pockets_collection,
+    users_collection,
+)
+from database.ledger import LEDGER_INDEXES, get_ledger_collection
+from database.pf_records import PF_RECORD_INDEXES
+
+IndexSpec = tuple[list[tuple[str, int]], dict[str, Any]]
+
+ASC = pymongo.ASCENDING
+DESC = pymongo.DESCENDING
+
+
+# ========================================
+# インデックス定義
+# ========================================
+def required_indexes() -> list[tuple[Collection, list[IndexSpec]]]:
+    """コレクションごとの必要なインデックス"""
+    return [
+        (users_collection, [
+            ([("user_id", ASC)], {"name": "user_id_unique", "unique": True}),
+        ]),
+        (pf_collection, [
+            ([("user_id", ASC)], {"name": "user_id_unique", "unique": True}),
+        ]),
+        (blacklist_collection, [
+            ([("user_id", ASC)], {"name": "user_id"}),
+        ]),
+        (prize_pockets_collection, [
+            ([("user_id", ASC)], {"name": "user_id_unique", "unique": True}),
+        ]),
+        (carry_over_points_collection, [
+            ([("user_id", ASC)], {"name": "user_id_unique", "unique": True}),
+        ]),
+        (active_users_collection, [
+            ([("user_id", ASC)], {"name": "user_id"}),
+        ]),
+        (invites_collection, [
+            ([("invite_code", ASC), ("guild_id", ASC)], {"name": "invite_code_guild_id"}),
+            ([("inviter_id", ASC), ("batch_active", ASC)], {"name": "inviter_id_batch_active"}),
+            ([("guild_id", ASC), ("used", ASC)], {"name": "guild_id_used"}),
+            ([("user_id", ASC)], {"name": "user_id", "sparse": True}),
+        ]),
+        (invited_users_collection, [
+            ([("inviter_id", ASC), ("timestamp", DESC)], {"name": "inviter_id_timestamp"}),
+            ([("invited_id", ASC)], {"name": "invited_id"}),
+        ]),
+        (invite_redeem_collection, [
+            ([("inviter_id", ASC), ("invited_id", ASC)], {"name": "inviter_id_invited_id"}),
+        ]),
+        (casino_tables_collection, [
+            ([("channel_id", ASC)], {"name": "channel_id"}),
+        ]),
+        (exchanged_accounts_collection, [
+            ([("account_id", ASC)], {"name": "account_id"}),
+        ]),
+        (bot_state_collection, [
+            ([("key", ASC)], {"name": "key", "sparse": True}),
+        ]),
+        (get_ledger_collection(), LEDGER_INDEXES),
+        (bet_history_collection, BET_HISTORY_INDEXES),
+        (pf_records_collection, PF_RECORD_INDEXES),
+    ]
+
+
+def ensure_indexes() -> dict[str, int]:
+    """
+    全コレクションの必要なインデックスを作成（作成済みなら何もしない）
+
+    Returns:
+        dict: {"ok": 作成済み・作成したインデックス数, "failed": 作成できなかった数}
+    """
+    stats = {"ok": 0, "failed": 0}
+    for collection, specs in required_indexes():
+        for keys, options in specs:
+            try:
+                collection.create_index(keys, **options)
+                stats["ok"] += 1
+            except OperationFailure as e:
+                stats["failed"] += 1
+                print(f"[WARN] インデックス {collection.name}.{options.get('name')} を作成できません: {e}")
+    return stats
+
+
+# ========================================
+# 検索条件の監査
+# ========================================
+@dataclass(frozen=True)
+class QueryPattern:
+    """
+    監査する検索条件（値はダミー）
+
+    Attributes:
+        where: 検索しているコード
+    """
+    collection: Collection
+    filter: dict[str, Any]
+    where: str
+    sort: list[tuple[str, int]] = field(default_factory=list)
+
+
+def query_patterns() -> list[QueryPattern]:
+    """コード内の主な検索条件（全件取得・_id 指定の検索は除く）"""
+    user_id = 0
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        QueryPattern(users_collection, {"user_id": user_id}, "database.db.get_user_balance ほか"),
+        QueryPattern(pf_collection, {"user_id": user_id}, "database.db.load_pf_params"),
+        QueryPattern(pf_collection, {
+            "user_id": user_id,
+            "server_seed_hash": {"$exists": True},
+            "next_server_seed_hash": {"$exists": True},
+        }, "database.db.acquire_pf_seed"),
+        QueryPattern(blacklist_collection, {"user_id": user_id}, "database.db.is_blacklisted"),
+        QueryPattern(prize_pockets_collection, {"user_id": user_id}, "database.db.get_prize_pocket"),
+        QueryPattern(carry_over_points_collection, {"user_id": user_id}, "database.db.get_carry_over_points"),
+        QueryPattern(active_users_collection, {"user_id": user_id}, "commands.account"),
+        QueryPattern(invites_collection, {"user_id": user_id}, "database.db.get_user_invite"),
+        QueryPattern(invites_collection, {"invite_code": "", "guild_id": 0}, "utils.invite_panel.initialize_invite_cache"),
+        QueryPattern(invites_collection, {"inviter_id": user_id, "used": False, "batch_active": True},
+                     "utils.invite_panel.create_invite_for_user"),
+        QueryPattern(invites_collection, {"inviter_id": user_id, "used": True, "redeemed": {"$ne": True}},
+                     "utils.invite_panel.InvitePanelView.redeem_invites"),
+        QueryPattern(invites_collection, {"guild_id": 0, "used": False, "exists": True, "invite_code": {"$nin": []}},
+                     "utils.invite_panel.check_invite_usage_diff"),
+        QueryPattern(invited_users_collection, {"inviter_id": user_id}, "database.db.get_invited_users",
+                     sort=[("timestamp", DESC)]),
+        QueryPattern(invited_users_collection, {"invited_id": user_id}, "database.db.has_already_been_invited"),
+        QueryPattern(invite_redeem_collection, {"inviter_id": user_id}, "database.db.get_unredeemed_users"),
+        QueryPattern(casino_tables_collection, {"channel_id": 0}, "database.db.delete_casino_table"),
+        QueryPattern(bot_state_collection, {"key": "invite_panel"}, "utils.invite_panel.setup_invite_panel"),
+        QueryPattern(get_ledger_collection(), {"user_id": user_id, "type": "payin"}, "database.db.get_user_transactions",
+                     sort=[("timestamp", ASC)]),
+        QueryPattern(bet_history_collection, {"user_id": user_id, "game_type": "", "day": ""},
+                     "database.result_writer.GameResultWriter._write"),
+        QueryPattern(pf_records_collection, {"timestamp": {"$gte": now}, "game": ""}, "database.pf_records.iter_pf_records",
+                     sort=[("timestamp", ASC)]),
+    ]
+
+
+def _plan_stages(plan: Any) -> Iterator[str]:
+    """実行計画に含まれるステージ名を列挙"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+def explain_stages(pattern: QueryPattern) -> list[str]:
+    """検索条件の採用された実行計画のステージ名"""
+    cursor = pattern.collection.find(pattern.filter)
+    if pattern.sort:
+        cursor = cursor.sort(pattern.sort)
+    explained = cursor.explain()
+    return list(_plan_stages(explained.get("queryPlanner", {}).get("winningPlan", {})))
+
+
+def audit_query_plans(patterns: Optional[list[QueryPattern]] = None) -> list[tuple[QueryPattern, list[str]]]:
+    """
+    検索条件の実行計画を確認
+
+    Args:
+        patterns: 監査する検索条件（省略時は query_patterns()）
+
+    Returns:
+        list: COLLSCAN になる (検索条件, ステージ名) の一覧
+    """
+    collscans = []
+    for pattern in patterns or query_patterns():
+        try:
+            stages = explain_stages(pattern)
+        except OperationFailure as e:
+            print(f"[WARN] {pattern.collection.name} の explain に失敗: {e}")
+            continue
+        if "COLLSCAN" in stages:
+            collscans.append((pattern, stages))
+    return collscans
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """コマンドラインエントリーポイント"""
+    parser = argparse.ArgumentParser(description="インデックス作成・実行計画の監査ツール")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--audit-only", action="store_true", help="インデックスを作成せずに監査のみ行う")
+    mode.add_argument("--create-only", action="store_true", help="監査せずにインデックスの作成のみ行う")
+    args = parser.parse_args(argv)
+
+    if not args.audit_only:
+        stats = ensure_indexes()
+        print(f"[INDEXES] ok={stats['ok']} failed={stats['failed']}")
+        if args.create_only:
+            return 0 if not stats["failed"] else 1
+
+    patterns = query_patterns()
+    collscans = audit_query_plans(patterns)
+    for pattern, stages in collscans:
+        print(
+            f"[COLLSCAN] {pattern.collection.name} filter={pattern.filter} sort={pattern.sort} "
+            f"({pattern.where}) stages={'>'.join(stages)}"
+        )
+    status = "OK" if not collscans else "NG"
+    print(f"[{status}] checked={len(patterns)} collscan={len(collscans)}")
+    return 0 if not collscans else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+金銭取引レジャーモジュール
+1取引1ドキュメントの financial_ledger コレクションへの記録と検索を提供します
+
+ドキュメント形式:
+    {
+        "user_id": int,
+        "type": "payin" | "payout" | "exchange",
+        "amount": int,
+        "net_amount": int,
+        "timestamp": datetime（UTC）,
+        "day": "YYYY-MM-DD"（JST日付、日次集計用）
+    }
+"""
+import datetime
+from decimal import Decimal
+from typing import Any, Iterable, Optional, Union
+
+import pymongo
+from pymongo.collection import Collection
+from pymongo.cursor import Cursor
+
+from config import JST
+from database.db import financial_ledger_collection
+
+# ========================================
+# 定数
+# ========================================
+FINANCIAL_TRANSACTION_TYPES: tuple[str, ...] = ("payin", "payout", "exchange")
+
+# 日次集計・ユーザー別検索用の複合インデックス
+LEDGER_INDEXES: list[tuple[list[tuple[str, int]], dict[str, Any]]] = [
+    ([("timestamp", pymongo.ASCENDING), ("type", pymongo.ASCENDING)], {"name": "timestamp_type"}),
+    ([("user_id", pymongo.ASCENDING), ("timestamp", pymongo.ASCENDING)], {"name": "user_id_timestamp"}),
+    ([("day", pymongo.ASCENDING), ("type", pymongo.ASCENDING)], {"name": "day_type"}),
+    # 移行済みレコードの重複防止（移行ツールの再実行を冪等にする）
+    ([("legacy_id", pymongo.ASCENDING)], {
+        "name": "legacy_id_unique",
+        "unique": True,
+        "partialFilterExpression": {"legacy_id": {"$exists": True}}
+    }),
+]
+
+
+def get_ledger_collection() -> Collection:
+    """レジャーコレクションを取得"""
+    return financial_ledger_collection
+
+
+def ensure_ledger_indexes() -> None:
+    """レジャーコレクションのインデックスを作成（作成済みなら何もしない）"""
+    collection = get_ledger_collection()
+    for keys, options in LEDGER_INDEXES:
+        collection.create_index(keys, **options)
+
+
+# ========================================
+# 正規化
+# ========================================
+def normalize_timestamp(ts: Any) -> Optional[datetime.datetime]:
+    """
+    旧形式を含むタイムスタンプをJSTのdatetimeに変換
+
+    Args:
+        ts: datetime、ISO文字列、または {"$date": {"$numberLong": ...}} 形式
+
+    Returns:
+        JSTのdatetime。変換できない場合はNone
+    """
+    if isinstance(ts, str):
+        try:
+            ts = datetime.datetime.fromisoformat(ts.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    elif isinstance(ts, dict) and "$date" in ts:
+        try:
+            return datetime.datetime.fromtimestamp(int(ts["$date"]["$numberLong"]) / 1000, tz=JST)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    if not isinstance(ts, datetime.datetime):
+        return None
+
+    # naive は従来どおりサーバーのローカル時刻として扱う
+    return ts.astimezone(JST)
+
+
+def normalize_amount(amount: Any) -> Optional[Union[int, float]]:
+    """
+    旧形式を含む金額を数値に変換
+
+    Args:
+        amount: 数値、Decimal、または {"$numberInt": ...} 形式
+
+    Returns:
+        数値。変換できない場合はNone
+    """
+    if isinstance(amount, bool):
+        return None
+    if isinstance(amount, (int, float)):
+        return amount
+    if isinstance(amount, Decimal):
+        return int(amount)
+    if isinstance(amount, dict):
+        for key in ("$numberInt", "$numberLong", "$numberDouble"):
+            if key in amount:
+                try:
+                    value = float(amount[key])
+                except (TypeError, ValueError):
+                    return None
+                return int(value) if value.is_integer() else value
+    return None
+
+
+def day_key(ts: datetime.datetime) -> str:
+    """タイムスタンプからJST日付キー（YYYY-MM-DD）を生成"""
+    return ts.astimezone(JST).strftime("%Y-%m-%d")
+
+
+# ========================================
+# 記録
+# ========================================
+def build_ledger_entry(
+    user_id: int,
+    transaction_type: str,
+    amount: Any,
+    net_amount: Any = None,
+    timestamp: Optional[datetime.datetime] = None
+) -> dict[str, Any]:
+    """
+    レジャードキュメントを作成
+
+    Args:
+        user_id: ユーザーID
+        transaction_type: トランザクションタイプ
+        amount: 取引額
+        net_amount: 純額。Noneの場合はamountと同じ
+        timestamp: 取引時刻。Noneの場合は現在時刻
+
+    Returns:
+        dict: 挿入用ドキュメント
+    """
+    if timestamp is None:
+        timestamp = datetime.datetime.now(datetime.timezone.utc)
+
+    amount = normalize_amount(amount) or 0
+    net_amount = amount if net_amount is None else (normalize_amount(net_amount) or 0)
+
+    return {
+        "user_id": user_id,
+        "type": transaction_type,
+        "amount": amount,
+        "net_amount": net_amount,
+        "timestamp": timestamp,
+        "day": day_key(timestamp)
+    }
+
+
+def insert_transaction(
+    user_id: int,
+    transaction_type: str,
+    amount: Any,
+    net_amount: Any = None
+) -> dict[str, Any]:
+    """
+    金銭取引を1ドキュメントとして記録
+
+    Returns:
+        dict: 挿入したドキュメント（_id付き）
+    """
+    entry = build_ledger_entry(user_id, transaction_type, amount, net_amount)
+    get_ledger_collection().insert_one(entry)
+    return entry
+
+
+# ========================================
+# 検索
+# ========================================
+def find_user_transactions(
+    user_id: int,
+    transaction_type: Optional[str] = None,
+    since: Optional[datetime.datetime] = None
+) -> list[dict[str, Any]]:
+    """
+    ユーザーの取引をタイムスタンプ順に取得
+
+    Args:
+        user_id: ユーザーID
+        transaction_type: 絞り込むトランザクションタイプ
+        since: この時刻以降の取引のみ取得
+
+    Returns:
+        list[dict]: 取引ドキュメントのリスト
+    """
+    query: dict[str, Any] = {"user_id": user_id}
+    if transaction_type:
+        query["type"] = transaction_type
+    if since is not None:
+        query["timestamp"] = {"$gte": since}
+
+    return list(get_ledger_collection().find(query, {"_id": 0}).sort("timestamp", pymongo.ASCENDING))
+
+
+def find_transactions_by_day(
+    start_day: str,
+    end_day: str,
+    types: Iterable[str] = ("payin", "payout"),
+    projection: Optional[dict[str, int]] = None
+) -> Cursor:
+    """
+    JST日付範囲（両端含む）の取引を取得
+
+    Args:
+        start_day: 開始日（YYYY-MM-DD）
+        end_day: 終了日（YYYY-MM-DD）
+        types: 対象トランザクションタイプ
+        projection: 取得フィールド
+
+    Returns:
+        Cursor: 取引ドキュメントのカーソル
+    """
+    query = {
+        "day": {"$gte": start_day, "$lte": end_day},
+        "type": {"$in": list(types)}
+    }
+    return get_ledger_collection().find(query, projection or {"user_id": 1, "type": 1, "amount": 1})
@@ -0,0 +1,136 @@
+"""
+レジャー移行ツール
+financial_transactions の埋め込み transactions 配列を financial_ledger（1取引1ドキュメント）へ移行します
+
+使い方:
+    python -m database.migrate_ledger [--dry-run] [--batch-size 1000]
+
+各取引には legacy_id（元ドキュメントID:配列インデックス）を付与して upsert するため、
+途中で中断しても再実行で続きから安全に移行できます。
+"""
+import argparse
+import sys
+from typing import Any, Optional
+
+from pymongo import UpdateOne
+
+from database.db import financial_transactions_collection
+from database.ledger import (
+    FINANCIAL_TRANSACTION_TYPES,
+    build_ledger_entry,
+    ensure_ledger_indexes,
+    get_ledger_collection,
+    normalize_amount,
+    normalize_timestamp,
+)
+
+
+def convert_legacy_transaction(
+    source_id: Any,
+    index: int,
+    user_id: int,
+    txn: dict[str, Any]
+) -> Optional[dict[str, Any]]:
+    """
+    埋め込み形式の取引1件をレジャードキュメントに変換
+
+    Args:
+        source_id: 元ドキュメントの_id
+        index: transactions配列内の位置
+        user_id: ユーザーID
+        txn: 埋め込み取引
+
+    Returns:
+        dict: レジャードキュメント。変換できない場合はNone
+    """
+    transaction_type = txn.get("type")
+    if transaction_type not in FINANCIAL_TRANSACTION_TYPES:
+        return None
+
+    timestamp = normalize_timestamp(txn.get("timestamp"))
+    amount = normalize_amount(txn.get("amount", 0))
+    if timestamp is None or amount is None:
+        return None
+
+    entry = build_ledger_entry(
+        user_id=user_id,
+        transaction_type=transaction_type,
+        amount=amount,
+        net_amount=txn.get("net_amount"),
+        timestamp=timestamp
+    )
+    entry["legacy_id"] = f"{source_id}:{index}"
+    return entry
+
+
+def migrate(batch_size: int = 1000, dry_run: bool = False) -> dict[str, int]:
+    """
+    埋め込み配列からレジャーへ移行
+
+    Args:
+        batch_size: 1回のbulk_writeで送る件数
+        dry_run: Trueの場合は書き込まずに件数のみ集計
+
+    Returns:
+        dict: 集計結果 {"users", "converted", "skipped", "inserted"}
+    """
+    if not dry_run:
+        ensure_ledger_indexes()
+
+    ledger = get_ledger_collection()
+    stats = {"users": 0, "converted": 0, "skipped": 0, "inserted": 0}
+    operations: list[UpdateOne] = []
+
+    def flush() -> None:
+        if not operations:
+            return
+        if not dry_run:
+            result = ledger.bulk_write(operations, ordered=False)
+            stats["inserted"] += result.upserted_count
+        operations.clear()
+
+    cursor = financial_transactions_collection.find({}, {"user_id": 1, "transactions": 1})
+    for doc in cursor:
+        user_id = doc.get("user_id")
+        transactions = doc.get("transactions") or []
+        if user_id is None or not transactions:
+            continue
+
+        stats["users"] += 1
+        for index, txn in enumerate(transactions):
+            entry = convert_legacy_transaction(doc["_id"], index, user_id, txn)
+            if entry is None:
+                stats["skipped"] += 1
+                continue
+
+            stats["converted"] += 1
+            operations.append(UpdateOne(
+                {"legacy_id": entry["legacy_id"]},
+                {"$setOnInsert": entry},
+                upsert=True
+            ))
+            if len(operations) >= batch_size:
+                flush()
+
+    flush()
+    return stats
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """コマンドラインエントリーポイント"""
+    parser = argparse.ArgumentParser(description="financial_transactions → financial_ledger 移行ツール")
+    parser.add_argument("--dry-run", action="store_true", help="書き込まずに件数のみ表示")
+    parser.add_argument("--batch-size", type=int, default=1000, help="bulk_writeのバッチサイズ")
+    args = parser.parse_args(argv)
+
+    stats = migrate(batch_size=args.batch_size, dry_run=args.dry_run)
+    mode = "DRY RUN" if args.dry_run else "MIGRATED"
+    print(
+        f"[{mode}] users={stats['users']:,} converted={stats['converted']:,} "
+        f"skipped={stats['skipped']:,} inserted={stats['inserted']:,}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
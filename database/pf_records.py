@@ -0,0 +1,123 @@
+"""
+Provably Fair 記録モジュール
+終了したゲームのシードと結果を1ゲーム1ドキュメントで pf_records コレクションに残し、後から一括検証できるようにします
+
+ドキュメント形式:
+    {
+        "record_id": str（記録ごとの一意なID、書き込みの再試行で重複させないため）,
+        "game": "blackjack" | "mines" | "rps",
+        "user_id": int,
+        "server_seed": str,
+        "server_seed_hash": str,
+        "client_seed": str,
+        "nonce": int,
+        "params": {...}（blackjack: count / mines: grid_size・mine_count / rps: nonces）,
+        "outcome": [...]（blackjack: 配ったカード順 / mines: 地雷位置 [行, 列] / rps: 相手の手）,
+        "timestamp": datetime（UTC）
+    }
+
+書き込みは GameResultWriter.record_pf() 経由でまとめて行います。
+"""
+import datetime
+import hashlib
+import json
+import uuid
+from typing import Any, Iterator, Optional
+
+import pymongo
+
+from database.db import pf_records_collection
+
+# 期間指定の検証・ユーザー別検索用のインデックス
+PF_RECORD_INDEXES: list[tuple[list[tuple[str, int]], dict[str, Any]]] = [
+    ([("timestamp", pymongo.ASCENDING), ("game", pymongo.ASCENDING)], {"name": "timestamp_game"}),
+    ([("user_id", pymongo.ASCENDING), ("timestamp", pymongo.ASCENDING)], {"name": "user_id_timestamp"}),
+    # 書き込みの再試行で同じ記録を重複して追加しない（record_id のない旧記録は対象外）
+    ([("record_id", pymongo.ASCENDING)], {
+        "name": "record_id_unique",
+        "unique": True,
+        "partialFilterExpression": {"record_id": {"$exists": True}}
+    }),
+]
+
+
+def ensure_pf_record_indexes() -> None:
+    """PF記録コレクションのインデックスを作成（作成済みなら何もしない）"""
+    for keys, options in PF_RECORD_INDEXES:
+        pf_records_collection.create_index(keys, **options)
+
+
+def build_pf_record(
+    game: str,
+    user_id: int,
+    server_seed: str,
+    client_seed: str,
+    nonce: int,
+    outcome: list,
+    params: Optional[dict[str, Any]] = None,
+    server_seed_hash: Optional[str] = None
+) -> dict[str, Any]:
+    """
+    PF記録ドキュメントを作成
+
+    Args:
+        game: ゲームタイプ
+        user_id: ユーザーID
+        outcome: ゲームで実際に使った結果
+        params: 結果の再計算に必要なゲームごとのパラメータ
+        server_seed_hash: 事前に提示したハッシュ（省略時は server_seed から計算）
+    """
+    return {
+        "record_id": uuid.uuid4().hex,
+        "game": game,
+        "user_id": user_id,
+        "server_seed": server_seed,
+        "server_seed_hash": server_seed_hash or hashlib.sha256(server_seed.encode()).hexdigest(),
+        "client_seed": client_seed,
+        "nonce": int(nonce),
+        "params": params or {},
+        "outcome": outcome,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc),
+    }
+
+
+# ========================================
+# 読み出し
+# ========================================
+def iter_pf_records(
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    game: Optional[str] = None,
+    batch_size: int = 5000
+) -> Iterator[dict[str, Any]]:
+    """
+    PF記録をMongoから順に読み出す
+
+    Args:
+        since: この日時以降（含む）
+        until: この日時より前
+        game: ゲームタイプで絞り込み
+    """
+    query: dict[str, Any] = {}
+    if since or until:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if until:
+            query["timestamp"]["$lt"] = until
+    if game:
+        query["game"] = game
+    yield from pf_records_collection.find(query).sort("timestamp", pymongo.ASCENDING).batch_size(batch_size)
+
+
+def iter_jsonl_records(path: str, game: Optional[str] = None) -> Iterator[dict[str, Any]]:
+    """JSONLエクスポート（mongoexport など）からPF記録を読み出す"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if game and record.get("game") != game:
+                continue
+            yield record
@@ -0,0 +1,251 @@
+"""
+収益レポート集計モジュール
+financial_ledger をMongoDBの集計パイプラインで集計し、日次・ユーザー別の payin/payout を返します
+"""
+import datetime
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Iterable, Iterator, Optional
+
+from config import JST
+from database.ledger import get_ledger_collection
+
+# ========================================
+# 定数
+# ========================================
+DAY_FORMAT = "%Y-%m-%d"
+PROFIT_TYPES: tuple[str, ...] = ("payin", "payout")
+
+
+# ========================================
+# データ型
+# ========================================
+@dataclass(frozen=True)
+class DailyTotals:
+    """1日分の payin/payout 合計"""
+    day: str
+    payin: int = 0
+    payout: int = 0
+    count: int = 0
+
+    @property
+    def profit(self) -> int:
+        """カジノの純利益（payin - payout）"""
+        return self.payin - self.payout
+
+
+@dataclass(frozen=True)
+class UserTotals:
+    """ユーザー別の payin/payout 合計"""
+    user_id: int
+    payin: int = 0
+    payout: int = 0
+
+
+# ========================================
+# 日付ヘルパー
+# ========================================
+def parse_day(day: str) -> datetime.date:
+    """
+    日付キーを検証してdateに変換
+
+    Raises:
+        ValueError: 日付形式が不正な場合
+    """
+    try:
+        return datetime.datetime.strptime(day, DAY_FORMAT).date()
+    except ValueError:
+        raise ValueError("日付の形式が正しくありません！`YYYY-MM-DD` の形式で指定してください。")
+
+
+def day_range(start_day: str, end_day: str) -> list[str]:
+    """開始日から終了日まで（両端含む）の日付キーのリストを作成"""
+    start = parse_day(start_day)
+    end = parse_day(end_day)
+    return [(start + timedelta(days=i)).strftime(DAY_FORMAT) for i in range((end - start).days + 1)]
+
+
+def last_n_days(days: int, end: Optional[datetime.datetime] = None) -> tuple[str, str]:
+    """
+    終了日を含む直近 days 日間の (開始日, 終了日) を取得
+
+    Args:
+        days: 日数
+        end: 終了日時。Noneの場合は現在（JST）
+    """
+    end = end or datetime.datetime.now(JST)
+    start = end - timedelta(days=days - 1)
+    return start.strftime(DAY_FORMAT), end.strftime(DAY_FORMAT)
+
+
+def _sum_if_type(transaction_type: str) -> dict[str, Any]:
+    """指定タイプのみ amount を合計する $sum 式"""
+    return {"$sum": {"$cond": [{"$eq": ["$type", transaction_type]}, "$amount", 0]}}
+
+
+def _build_match(
+    start_day: Optional[str],
+    end_day: Optional[str],
+    exclude_user_ids: Optional[Iterable[int]],
+    extra_match: Optional[dict[str, Any]]
+) -> dict[str, Any]:
+    """集計用の $match 条件を作成"""
+    match: dict[str, Any] = {"type": {"$in": list(PROFIT_TYPES)}}
+    if start_day or end_day:
+        day_cond: dict[str, str] = {}
+        if start_day:
+            day_cond["$gte"] = start_day
+        if end_day:
+            day_cond["$lte"] = end_day
+        match["day"] = day_cond
+    if exclude_user_ids:
+        match["user_id"] = {"$nin": list(exclude_user_ids)}
+    if extra_match:
+        match.update(extra_match)
+    return match
+
+
+# ========================================
+# 集計
+# ========================================
+def _aggregate_by_day(match: dict[str, Any]) -> dict[str, DailyTotals]:
+    """$match 条件に一致する取引を日付ごとに集計"""
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$day",
+            "payin": _sum_if_type("payin"),
+            "payout": _sum_if_type("payout"),
+            "count": {"$sum": 1}
+        }}
+    ]
+    return {
+        doc["_id"]: DailyTotals(day=doc["_id"], payin=doc["payin"], payout=doc["payout"], count=doc["count"])
+        for doc in get_ledger_collection().aggregate(pipeline)
+    }
+
+
+def get_daily_totals(
+    start_day: str,
+    end_day: str,
+    exclude_user_ids: Optional[Iterable[int]] = None,
+    extra_match: Optional[dict[str, Any]] = None
+) -> list[DailyTotals]:
+    """
+    日付範囲の日次 payin/payout 合計を1回の集計で取得
+
+    Args:
+        start_day: 開始日（YYYY-MM-DD）
+        end_day: 終了日（YYYY-MM-DD、含む）
+        exclude_user_ids: 集計から除外するユーザーID
+        extra_match: 追加の $match 条件
+
+    Returns:
+        list[DailyTotals]: 日付順の系列（取引のない日は0で埋める）
+    """
+    days = day_range(start_day, end_day)
+    by_day = _aggregate_by_day(_build_match(start_day, end_day, exclude_user_ids, extra_match))
+    return [by_day.get(day, DailyTotals(day=day)) for day in days]
+
+
+def get_totals_for_days(days: Iterable[str]) -> list[DailyTotals]:
+    """
+    指定した日付（連続していなくてよい）の日次合計を1回の集計で取得
+
+    Args:
+        days: 日付キーのリスト
+
+    Returns:
+        list[DailyTotals]: 指定順の系列（取引のない日は0で埋める）
+    """
+    days = list(days)
+    if not days:
+        return []
+    by_day = _aggregate_by_day(_build_match(None, None, None, {"day": {"$in": days}}))
+    return [by_day.get(day, DailyTotals(day=day)) for day in days]
+
+
+def get_user_totals(
+    start_day: str,
+    end_day: str,
+    exclude_user_ids: Optional[Iterable[int]] = None
+) -> list[UserTotals]:
+    """
+    日付範囲のユーザー別 payin/payout 合計を取得
+
+    Args:
+        start_day: 開始日（YYYY-MM-DD）
+        end_day: 終了日（YYYY-MM-DD、含む）
+        exclude_user_ids: 集計から除外するユーザーID
+
+    Returns:
+        list[UserTotals]: ユーザー別合計
+    """
+    pipeline = [
+        {"$match": _build_match(start_day, end_day, exclude_user_ids, None)},
+        {"$group": {
+            "_id": "$user_id",
+            "payin": _sum_if_type("payin"),
+            "payout": _sum_if_type("payout")
+        }}
+    ]
+    return [
+        UserTotals(user_id=doc["_id"], payin=doc["payin"], payout=doc["payout"])
+        for doc in get_ledger_collection().aggregate(pipeline)
+    ]
+
+
+def iter_profit_entries(start_day: str, end_day: str) -> Iterator[dict[str, Any]]:
+    """
+    日付範囲の payin/payout 取引を1件ずつ取得（集計に必要なフィールドのみ）
+
+    取引の_idで重複を判定する呼び出し元（月間ランキングの読み込みなど）向けです。
+
+    Args:
+        start_day: 開始日（YYYY-MM-DD）
+        end_day: 終了日（YYYY-MM-DD、含む）
+
+    Returns:
+        Iterator[dict]: {"_id", "user_id", "type", "amount"} のドキュメント
+    """
+    return get_ledger_collection().find(
+        _build_match(start_day, end_day, None, None),
+        {"_id": 1, "user_id": 1, "type": 1, "amount": 1}
+    )
+
+
+def get_lifetime_totals(exclude_user_ids: Optional[Iterable[int]] = None) -> dict[str, int]:
+    """
+    全期間の payin/payout 合計を取得
+
+    Returns:
+        dict: {"payin", "payout", "profit", "payin_count", "users"}
+    """
+    pipeline = [
+        {"$match": _build_match(None, None, exclude_user_ids, None)},
+        {"$group": {
+            "_id": "$user_id",
+            "payin": _sum_if_type("payin"),
+            "payout": _sum_if_type("payout"),
+            "payin_count": {"$sum": {"$cond": [{"$eq": ["$type", "payin"]}, 1, 0]}}
+        }},
+        {"$group": {
+            "_id": None,
+            "payin": {"$sum": "$payin"},
+            "payout": {"$sum": "$payout"},
+            "payin_count": {"$sum": "$payin_count"},
+            "users": {"$sum": 1}
+        }}
+    ]
+    result = list(get_ledger_collection().aggregate(pipeline))
+    if not result:
+        return {"payin": 0, "payout": 0, "profit": 0, "payin_count": 0, "users": 0}
+
+    doc = result[0]
+    return {
+        "payin": doc["payin"],
+        "payout": doc["payout"],
+        "profit": doc["payin"] - doc["payout"],
+        "payin_count": doc["payin_count"],
+        "users": doc["users"]
+    }
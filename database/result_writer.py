@@ -0,0 +1,286 @@
+"""
+ゲーム結果の書き込みキューモジュール
+ベット履歴と連勝・連敗の更新をメモリにためて、一定間隔または一定件数ごとに bulk_write でまとめて書き込みます
+
+    - ベット履歴: ユーザー × ゲーム × 日付のバケットごとに1操作へまとめる
+    - ストリーク: ユーザー × ゲームごとに差分を合成して1操作へまとめる
+    - PF記録: 終了したゲームのシードと結果を insert_many でまとめて追加
+
+書き込みはベット履歴 → ストリーク → PF記録の順に行い、失敗した場合は失敗した操作とそれ以降の段階だけを
+次回に再試行します（成功済みの段階を再び書き込んで二重に加算しない）。
+PF記録は record_id のユニークインデックスで重複を防ぎ、再試行時の重複キーエラーは無視します。
+
+未書き込みの結果は stop() で必ずフラッシュします。
+"""
+import asyncio
+from collections import defaultdict
+from typing import Any, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import config
+from database.bet_history import (
+    BET_HISTORY_INDEXES,
+    GAME_DRAW,
+    GAME_WIN,
+    StreakDelta,
+    bucket_filter,
+    bucket_update,
+    build_bet_entry,
+)
+from database.db import bet_history_collection, pf_records_collection, users_collection
+
+# MongoDB の重複キーエラー
+DUPLICATE_KEY_ERROR = 11000
+
+
+class GameResultWriter:
+    """ゲーム結果をまとめて書き込むバックグラウンドライター"""
+
+    def __init__(self, flush_interval_ms: int, max_batch: int):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self._bets: list[tuple[int, str, dict[str, Any]]] = []
+        self._streaks: dict[tuple[int, str], StreakDelta] = {}
+        self._pf_records: list[dict[str, Any]] = []
+        self._pending_count = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+
+    # ========================================
+    # 記録
+    # ========================================
+    def record(self, user_id: int, game_type: str, amount: int, result: str) -> None:
+        """
+        ゲーム結果を1件記録（書き込みはバックグラウンドで行う）
+
+        Args:
+            user_id: ユーザーID
+            game_type: ゲームタイプ
+            amount: 賭け金
+            result: 勝敗（GAME_WIN / GAME_LOSE / GAME_DRAW、引き分けはストリークを変えない）
+        """
+        is_win = result == GAME_WIN
+        self.record_bet(user_id, game_type, amount, is_win, result)
+        if result != GAME_DRAW:
+            self.record_streak(user_id, game_type, is_win)
+
+    def record_bet(self, user_id: int, game_type: str, amount: int, is_win: bool, result: Optional[str] = None) -> None:
+        """ベット履歴を1件記録"""
+        self._bets.append((user_id, game_type, build_bet_entry(amount, is_win, result=result)))
+        self._on_recorded()
+
+    def record_streak(self, user_id: int, game_type: str, is_win: bool) -> None:
+        """勝敗を1件記録（同じユーザー・ゲームの差分に合成）"""
+        key = (user_id, game_type)
+        delta = self._streaks.get(key)
+        if delta is None:
+            self._streaks[key] = StreakDelta(is_win=is_win)
+        else:
+            delta.record(is_win)
+        self._on_recorded()
+
+    def record_pf(self, record: dict[str, Any]) -> None:
+        """PF記録を1件記録（database.pf_records.build_pf_record で作成したもの）"""
+        self._pf_records.append(record)
+        self._on_recorded()
+
+    def pending_streak(self, user_id: int, game_type: str) -> Optional[StreakDelta]:
+        """未書き込みのストリーク差分を取得"""
+        return self._streaks.get((user_id, game_type))
+
+    def _on_recorded(self) -> None:
+        self._pending_count += 1
+        if self._pending_count >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    # ========================================
+    # フラッシュ
+    # ========================================
+    def _take_pending(self) -> tuple[
+        list[tuple[int, str, dict[str, Any]]],
+        dict[tuple[int, str], StreakDelta],
+        list[dict[str, Any]]
+    ]:
+        bets, streaks, pf_records = self._bets, self._streaks, self._pf_records
+        self._bets, self._streaks, self._pf_records = [], {}, []
+        self._pending_count = 0
+        return bets, streaks, pf_records
+
+    def _restore_pending(
+        self,
+        bets: list[tuple[int, str, dict[str, Any]]],
+        streaks: dict[tuple[int, str], StreakDelta],
+        pf_records: list[dict[str, Any]]
+    ) -> None:
+        """書き込みに失敗した分を、その後に記録された分より前に戻す"""
+        self._bets = bets + self._bets
+        for key, delta in streaks.items():
+            later = self._streaks.get(key)
+            self._streaks[key] = delta.then(later) if later else delta
+        self._pf_records = pf_records + self._pf_records
+        self._pending_count = len(self._bets) + len(self._streaks) + len(self._pf_records)
+
+    @staticmethod
+    def _failed_indexes(error: BulkWriteError, ignore_codes: tuple[int, ...] = ()) -> list[int]:
+        """bulk_write / insert_many（ordered=False）で失敗した操作の位置"""
+        details = error.details or {}
+        if details.get("writeConcernErrors"):
+            # 書き込み済みか分からないため再試行しない（再試行すると二重に加算されうる）
+            print(f"[WARN] GameResultWriter write concern error: {details['writeConcernErrors']}")
+        return sorted({
+            err["index"] for err in details.get("writeErrors", [])
+            if err.get("code") not in ignore_codes
+        })
+
+    @classmethod
+    def _write_bets(cls, bets: list[tuple[int, str, dict[str, Any]]]) -> list[tuple[int, str, dict[str, Any]]]:
+        """ベット履歴を書き込み、失敗したベットを返す"""
+        buckets: dict[tuple[Any, ...], list[tuple[int, str, dict[str, Any]]]] = defaultdict(list)
+        for bet in bets:
+            user_id, game_type, entry = bet
+            key = tuple(bucket_filter(user_id, game_type, entry["timestamp"]).items())
+            buckets[key].append(bet)
+
+        keys = list(buckets)
+        try:
+            bet_history_collection.bulk_write([
+                UpdateOne(dict(key), bucket_update(entry for _, _, entry in buckets[key]), upsert=True)
+                for key in keys
+            ], ordered=False)
+        except BulkWriteError as e:
+            return [bet for index in cls._failed_indexes(e) for bet in buckets[keys[index]]]
+        return []
+
+    @classmethod
+    def _write_streaks(cls, streaks: dict[tuple[int, str], StreakDelta]) -> dict[tuple[int, str], StreakDelta]:
+        """ストリークを書き込み、失敗した差分を返す"""
+        keys = list(streaks)
+        try:
+            users_collection.bulk_write([
+                UpdateOne({"user_id": user_id}, streaks[(user_id, game_type)].to_update(game_type), upsert=True)
+                for user_id, game_type in keys
+            ], ordered=False)
+        except BulkWriteError as e:
+            return {keys[index]: streaks[keys[index]] for index in cls._failed_indexes(e)}
+        return {}
+
+    @classmethod
+    def _write_pf_records(cls, pf_records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """PF記録を追加し、失敗した記録を返す（再試行で既に追加済みの記録は無視）"""
+        try:
+            pf_records_collection.insert_many(pf_records, ordered=False)
+        except BulkWriteError as e:
+            return [pf_records[index] for index in cls._failed_indexes(e, ignore_codes=(DUPLICATE_KEY_ERROR,))]
+        return []
+
+    def _write_pending(
+        self,
+        bets: list[tuple[int, str, dict[str, Any]]],
+        streaks: dict[tuple[int, str], StreakDelta],
+        pf_records: list[dict[str, Any]]
+    ) -> tuple[
+        list[tuple[int, str, dict[str, Any]]],
+        dict[tuple[int, str], StreakDelta],
+        list[dict[str, Any]]
+    ]:
+        """
+        ベット履歴 → ストリーク → PF記録の順に書き込む（DBスレッドで実行）
+
+        Returns:
+            tuple: 再試行する (ベット履歴, ストリーク, PF記録)。
+                   各段階が成功したら空にし、失敗したら失敗した分とそれ以降の段階だけを残す
+        """
+        stage = "bets"
+        try:
+            if bets:
+                bets = self._write_bets(bets)
+                if bets:
+                    raise RuntimeError("some bet_history updates failed")
+            stage = "streaks"
+            if streaks:
+                streaks = self._write_streaks(streaks)
+                if streaks:
+                    raise RuntimeError("some streak updates failed")
+            stage = "pf_records"
+            if pf_records:
+                pf_records = self._write_pf_records(pf_records)
+                if pf_records:
+                    raise RuntimeError("some pf_records inserts failed")
+        except Exception as e:
+            print(
+                f"[ERROR] GameResultWriter flush failed at {stage} "
+                f"({len(bets)} bets, {len(streaks)} streaks, {len(pf_records)} pf records left): {e}"
+            )
+        return bets, streaks, pf_records
+
+    async def flush(self) -> None:
+        """たまっている結果を書き込む（ベット履歴 → ストリーク → PF記録の順）"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            bets, streaks, pf_records = self._take_pending()
+            if not bets and not streaks and not pf_records:
+                return
+
+            # flush() がキャンセルされても、取り出した分の書き込みを最後まで待って失敗分を戻してから
+            # キャンセルを伝える（取り出した分を失わず、戻す前に次の flush() が後の分を書き込まない）
+            write = asyncio.ensure_future(asyncio.to_thread(self._write_pending, bets, streaks, pf_records))
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                await asyncio.wait([write])
+                raise
+            finally:
+                if write.done() and not write.cancelled():
+                    if write.exception() is None:
+                        self._restore_pending(*write.result())
+                    else:
+                        # 想定外の例外では書き込めた段階が分からないため、取り出した分をすべて戻す
+                        print(f"[ERROR] GameResultWriter flush failed: {write.exception()}")
+                        self._restore_pending(bets, streaks, pf_records)
+
+    # ========================================
+    # ライフサイクル
+    # ========================================
+    def start(self) -> None:
+        """バックグラウンドのフラッシュ処理を開始（イベントループ内で呼ぶ）"""
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def stop(self) -> None:
+        """バックグラウンド処理を停止し、残りを書き込む（実行中のフラッシュはキャンセルせずに待つ）"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await self._task
+            except Exception as e:
+                print(f"[ERROR] GameResultWriter task failed: {e}")
+            self._task = None
+        await self.flush()
+
+
+def ensure_bet_history_indexes() -> None:
+    """ベット履歴コレクションのインデックスを作成（作成済みなら何もしない）"""
+    for keys, options in BET_HISTORY_INDEXES:
+        bet_history_collection.create_index(keys, **options)
+
+
+game_result_writer = GameResultWriter(config.RESULT_WRITER_FLUSH_MS, config.RESULT_WRITER_MAX_BATCH)
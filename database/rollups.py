@@ -0,0 +1,276 @@
+"""
+日次集計（daily_rollups）モジュール
+financial_ledger の日次 payin/payout 合計を1日1ドキュメントで保持し、レポートとグラフから参照します
+
+ドキュメント形式:
+    {
+        "_id": "YYYY-MM-DD"（JST日付）,
+        "payin": int,
+        "payout": int,
+        "count": int,
+        "updated_at": datetime（UTC）
+    }
+
+更新経路:
+    記録時: log_financial_transaction から apply_transaction で即時に $inc
+    追いつき: catch_up がウォーターマーク（処理済みレジャー_id）より新しい取引の日付を再計算して $set
+
+記録時の $inc が失敗・重複しても、追いつき処理がその日を生レジャーから再計算して上書きするため最終的に一致します。
+
+_id（ObjectId）はクライアント側で生成されるため、DBスレッドと非同期クライアントが同時に書き込むと
+小さい_idの取引が後からコミットされることがあります。また再計算の $set が同時に届いた $inc を上書きすることもあります。
+そのためウォーターマークは ROLLUP_RESCAN_SECONDS 前の時点までしか進めず、直近の取引を含む日は次回も再計算します。
+
+使い方:
+    python -m database.rollups catch-up
+    python -m database.rollups rebuild --start 2025-01-01 --end 2025-01-31
+    python -m database.rollups check [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+import argparse
+import datetime
+import sys
+from typing import Any, Iterable, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+
+from config import ROLLUP_RESCAN_SECONDS
+from database.db import bot_state_collection, daily_rollups_collection
+from database.ledger import get_ledger_collection
+from database.reports import (
+    PROFIT_TYPES,
+    DailyTotals,
+    day_range,
+    get_daily_totals,
+    get_totals_for_days,
+    last_n_days,
+)
+
+# ========================================
+# 定数
+# ========================================
+WATERMARK_STATE_ID = "daily_rollups_watermark"
+CATCH_UP_BATCH_DAYS = 100
+
+
+def get_rollups_collection() -> Collection:
+    """日次集計コレクションを取得"""
+    return daily_rollups_collection
+
+
+def _rollup_update(totals: DailyTotals) -> UpdateOne:
+    """日次合計で集計ドキュメントを上書きする操作を作成"""
+    return UpdateOne(
+        {"_id": totals.day},
+        {"$set": {
+            "payin": totals.payin,
+            "payout": totals.payout,
+            "count": totals.count,
+            "updated_at": datetime.datetime.now(datetime.timezone.utc)
+        }},
+        upsert=True
+    )
+
+
+def _write_totals(series: Iterable[DailyTotals]) -> int:
+    """日次合計を集計コレクションへ書き込み、書き込んだ日数を返す"""
+    operations = [_rollup_update(totals) for totals in series]
+    if operations:
+        get_rollups_collection().bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+# ========================================
+# 記録時の更新
+# ========================================
+def apply_transaction(entry: dict[str, Any]) -> None:
+    """
+    記録したレジャードキュメントを日次集計に即時反映
+
+    Args:
+        entry: insert_transaction が返したドキュメント
+    """
+    if entry.get("type") not in PROFIT_TYPES:
+        return
+
+    amount = entry.get("amount", 0)
+    get_rollups_collection().update_one(
+        {"_id": entry["day"]},
+        {
+            "$inc": {entry["type"]: amount, "count": 1},
+            "$set": {"updated_at": datetime.datetime.now(datetime.timezone.utc)}
+        },
+        upsert=True
+    )
+
+
+# ========================================
+# ウォーターマーク
+# ========================================
+def get_watermark() -> Optional[ObjectId]:
+    """処理済みのレジャー_id（ウォーターマーク）を取得"""
+    doc = bot_state_collection.find_one({"_id": WATERMARK_STATE_ID})
+    return doc.get("last_id") if doc else None
+
+
+def set_watermark(last_id: ObjectId) -> None:
+    """ウォーターマークを更新"""
+    bot_state_collection.update_one(
+        {"_id": WATERMARK_STATE_ID},
+        {"$set": {"last_id": last_id, "updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+        upsert=True
+    )
+
+
+# ========================================
+# 追いつき・再構築
+# ========================================
+def catch_up() -> dict[str, Any]:
+    """
+    ウォーターマークより新しい取引を含む日を生レジャーから再計算
+
+    処理開始時点の最新_idまでを対象とし、書き込み後にウォーターマークを進めます。
+    ウォーターマークは ROLLUP_RESCAN_SECONDS 前の時点までしか進めないため、直近の取引は次回も再計算します。
+    途中で失敗してもウォーターマークは進まないため、次回に同じ範囲を再処理します。
+
+    Returns:
+        dict: {"days": 再計算した日数, "watermark": 新しいウォーターマーク}
+    """
+    ledger = get_ledger_collection()
+    latest = ledger.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    if latest is None:
+        return {"days": 0, "watermark": None}
+
+    watermark = get_watermark()
+    max_id = latest["_id"]
+    if watermark is not None and watermark >= max_id:
+        return {"days": 0, "watermark": watermark}
+
+    id_cond: dict[str, Any] = {"$lte": max_id}
+    if watermark is not None:
+        id_cond["$gt"] = watermark
+
+    touched_days = sorted(
+        doc["_id"] for doc in ledger.aggregate([
+            {"$match": {"_id": id_cond, "type": {"$in": list(PROFIT_TYPES)}}},
+            {"$group": {"_id": "$day"}}
+        ])
+    )
+
+    written = 0
+    for i in range(0, len(touched_days), CATCH_UP_BATCH_DAYS):
+        written += _write_totals(get_totals_for_days(touched_days[i:i + CATCH_UP_BATCH_DAYS]))
+
+    # 遅れてコミットされる取引・上書きされた $inc を次回拾えるよう、直近の範囲は処理済みにしない
+    rescan_from = ObjectId.from_datetime(
+        datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=ROLLUP_RESCAN_SECONDS)
+    )
+    new_watermark = min(max_id, rescan_from)
+    if watermark is None or new_watermark > watermark:
+        set_watermark(new_watermark)
+    else:
+        new_watermark = watermark
+    return {"days": written, "watermark": new_watermark}
+
+
+def rebuild(start_day: str, end_day: str) -> int:
+    """
+    日付範囲の日次集計を生レジャーから再計算して上書き
+
+    Args:
+        start_day: 開始日（YYYY-MM-DD）
+        end_day: 終了日（YYYY-MM-DD、含む）
+
+    Returns:
+        int: 書き込んだ日数
+    """
+    # 先に追いつかせ、再構築後に古い差分で上書きされないようにする
+    catch_up()
+    return _write_totals(get_daily_totals(start_day, end_day))
+
+
+# ========================================
+# 参照
+# ========================================
+def get_rollup_series(start_day: str, end_day: str) -> list[DailyTotals]:
+    """
+    日付範囲の日次集計を取得
+
+    Args:
+        start_day: 開始日（YYYY-MM-DD）
+        end_day: 終了日（YYYY-MM-DD、含む）
+
+    Returns:
+        list[DailyTotals]: 日付順の系列（集計のない日は0で埋める）
+    """
+    days = day_range(start_day, end_day)
+    by_day = {
+        doc["_id"]: DailyTotals(
+            day=doc["_id"],
+            payin=doc.get("payin", 0),
+            payout=doc.get("payout", 0),
+            count=doc.get("count", 0)
+        )
+        for doc in get_rollups_collection().find({"_id": {"$gte": start_day, "$lte": end_day}})
+    }
+    return [by_day.get(day, DailyTotals(day=day)) for day in days]
+
+
+# ========================================
+# 整合性チェック
+# ========================================
+def check_consistency(start_day: str, end_day: str) -> list[tuple[DailyTotals, DailyTotals]]:
+    """
+    日次集計と生レジャーからの再計算結果を比較
+
+    Args:
+        start_day: 開始日（YYYY-MM-DD）
+        end_day: 終了日（YYYY-MM-DD、含む）
+
+    Returns:
+        list: 不一致の (集計値, 再計算値) のリスト
+    """
+    rollups = get_rollup_series(start_day, end_day)
+    expected = get_daily_totals(start_day, end_day)
+    return [(actual, fresh) for actual, fresh in zip(rollups, expected) if actual != fresh]
+
+
+# ========================================
+# コマンドライン
+# ========================================
+def main(argv: Optional[list[str]] = None) -> int:
+    """コマンドラインエントリーポイント"""
+    default_start, default_end = last_n_days(30)
+
+    parser = argparse.ArgumentParser(description="日次集計（daily_rollups）管理ツール")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("catch-up", help="ウォーターマーク以降の取引を反映")
+    for name, help_text in (("rebuild", "日付範囲を生レジャーから再計算"), ("check", "集計と再計算結果を比較")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--start", default=default_start, help="開始日（YYYY-MM-DD、デフォルト: 30日前）")
+        sub.add_argument("--end", default=default_end, help="終了日（YYYY-MM-DD、デフォルト: 今日）")
+    args = parser.parse_args(argv)
+
+    if args.command == "catch-up":
+        result = catch_up()
+        print(f"[CATCH-UP] days={result['days']:,} watermark={result['watermark']}")
+        return 0
+
+    if args.command == "rebuild":
+        written = rebuild(args.start, args.end)
+        print(f"[REBUILD] {args.start}〜{args.end} days={written:,}")
+        return 0
+
+    mismatches = check_consistency(args.start, args.end)
+    for actual, expected in mismatches:
+        print(
+            f"[MISMATCH] {actual.day} rollup(payin={actual.payin:,}, payout={actual.payout:,}, count={actual.count:,}) "
+            f"ledger(payin={expected.payin:,}, payout={expected.payout:,}, count={expected.count:,})"
+        )
+    print(f"[CHECK] {args.start}〜{args.end} mismatches={len(mismatches)}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
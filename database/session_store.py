@@ -0,0 +1,296 @@
+"""
+ゲームセッションストアモジュール
+進行中ゲームの状態を保持する dict 互換のストアと、再起動後に復元するためのスナップショット保存先を提供します
+
+バックエンドは config.SESSION_BACKEND で切り替えます:
+    memory: メモリのみ（再起動で失われる）
+    mongo: メモリに保持しつつ、変更ごとに game_sessions コレクションへスナップショットを保存
+
+スナップショットの書き込みは専用スレッド1本で順番に行うため、イベントループをブロックせず、
+同じセッションの書き込み順序も保たれます。
+"""
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Generic, Iterator, Optional, TypeVar
+
+import pymongo
+from pymongo.collection import Collection
+
+import config
+from database.db import get_collection
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+# ========================================
+# スナップショット保存先
+# ========================================
+class SnapshotBackend:
+    """スナップショット保存先（メモリのみの場合は何もしない）"""
+
+    def save(self, store: str, key: Any, data: Any, deadline: datetime.datetime) -> None:
+        """スナップショットを保存（deadline: 放置とみなす時刻）"""
+
+    def delete(self, store: str, key: Any) -> None:
+        """スナップショットを削除"""
+
+    def load_all(self, store: str) -> list[tuple[Any, Any, datetime.datetime]]:
+        """保持期間内のスナップショットを (key, data, deadline) のリストで取得"""
+        return []
+
+    def close(self) -> None:
+        """未完了の書き込みを待って終了"""
+
+
+class MongoSnapshotBackend(SnapshotBackend):
+    """
+    MongoDBへのスナップショット保存先
+
+    ドキュメント形式:
+        {
+            "_id": "<store>:<key>", "store": str, "key": Any, "data": Any,
+            "deadline": datetime（UTC、放置とみなす時刻）,
+            "expires_at": datetime（UTC、deadline + retention）
+        }
+
+    deadline を過ぎたセッションも retention の間は残し、再起動後に払い戻しなどの精算ができるようにします。
+    expires_at のTTLインデックスにより、それ以降はMongoDB側で自動削除されます。
+    """
+
+    def __init__(self, collection: Collection, retention: float):
+        self.collection = collection
+        self.retention = datetime.timedelta(seconds=retention)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-snapshot")
+
+    def ensure_indexes(self) -> None:
+        """インデックスを作成（作成済みなら何もしない）"""
+        self.collection.create_index([("store", pymongo.ASCENDING)], name="store")
+        self.collection.create_index([("expires_at", pymongo.ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0)
+
+    def _submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        future = self._writer.submit(func, *args, **kwargs)
+        future.add_done_callback(_report_snapshot_error)
+
+    def save(self, store: str, key: Any, data: Any, deadline: datetime.datetime) -> None:
+        self._submit(
+            self.collection.replace_one,
+            {"_id": f"{store}:{key}"},
+            {"store": store, "key": key, "data": data, "deadline": deadline, "expires_at": deadline + self.retention},
+            upsert=True
+        )
+
+    def delete(self, store: str, key: Any) -> None:
+        self._submit(self.collection.delete_one, {"_id": f"{store}:{key}"})
+
+    def load_all(self, store: str) -> list[tuple[Any, Any, datetime.datetime]]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cursor = self.collection.find(
+            {"store": store, "expires_at": {"$gt": now}},
+            {"key": 1, "data": 1, "deadline": 1}
+        )
+        return [(doc["key"], doc["data"], doc["deadline"]) for doc in cursor]
+
+    def close(self) -> None:
+        self._writer.shutdown(wait=True)
+
+
+def _report_snapshot_error(future) -> None:
+    error = future.exception()
+    if error is not None:
+        print(f"[ERROR] session snapshot write failed: {error}")
+
+
+# ========================================
+# セッションストア
+# ========================================
+class SessionStore(Generic[K, V]):
+    """
+    進行中ゲームのセッションストア（dict 互換）
+
+    値はメモリ上のオブジェクトをそのまま保持するため、クリックごとの読み込みは発生しません。
+    値を変更した場合は save(key) でスナップショットを更新します。
+
+    最終更新から ttl 秒を過ぎたセッションは参照できなくなりますが、賭け金の精算のため
+    evict_if_expired() / evict_expired() で取り出されるまでストアに残ります。
+
+    Args:
+        name: ストア名（スナップショットのキー接頭辞）
+        ttl: 最終更新からの放置タイムアウト（秒）
+        encode: 値 → スナップショット（BSON化可能な dict）
+        decode: スナップショット → 値
+        backend: スナップショット保存先
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        encode: Optional[Callable[[V], Any]] = None,
+        decode: Optional[Callable[[Any], V]] = None,
+        backend: Optional[SnapshotBackend] = None
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.encode = encode or (lambda value: value)
+        self.decode = decode or (lambda data: data)
+        self.backend = backend or SnapshotBackend()
+        self._values: dict[K, V] = {}
+        self._expires: dict[K, float] = {}
+
+    # ---------- dict 互換API ----------
+    def __getitem__(self, key: K) -> V:
+        if not self._alive(key):
+            raise KeyError(key)
+        return self._values[key]
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._values[key] = value
+        self.save(key)
+
+    def __delitem__(self, key: K) -> None:
+        if key not in self._values:
+            raise KeyError(key)
+        self.pop(key)
+
+    def __contains__(self, key: object) -> bool:
+        return self._alive(key)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(list(self._values))
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        return self._values[key] if self._alive(key) else default
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        self._expires.pop(key, None)
+        if key not in self._values:
+            return default
+        value = self._values.pop(key)
+        self.backend.delete(self.name, key)
+        return value
+
+    def items(self) -> list[tuple[K, V]]:
+        return list(self._values.items())
+
+    def values(self) -> list[V]:
+        return list(self._values.values())
+
+    # ---------- 有効期限・スナップショット ----------
+    def _alive(self, key: Any) -> bool:
+        expires_at = self._expires.get(key)
+        return expires_at is not None and expires_at >= time.monotonic()
+
+    def save(self, key: K) -> None:
+        """放置タイムアウトを延長し、現在の値をスナップショットに保存"""
+        if key not in self._values:
+            return
+        self._expires[key] = time.monotonic() + self.ttl
+        deadline = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.ttl)
+        self.backend.save(self.name, key, self.encode(self._values[key]), deadline)
+
+    def idle_seconds(self, key: K) -> Optional[float]:
+        """最終更新からの経過秒数（存在しない場合はNone）"""
+        expires_at = self._expires.get(key)
+        if expires_at is None:
+            return None
+        return time.monotonic() - (expires_at - self.ttl)
+
+    def expired_keys(self) -> list[K]:
+        """有効期限切れのセッションのキー（削除はしない）"""
+        now = time.monotonic()
+        return [key for key, expires_at in self._expires.items() if expires_at < now]
+
+    def evict_if_expired(self, key: K) -> Optional[V]:
+        """
+        セッションがまだ有効期限切れなら削除して返す
+
+        expired_keys() の取得後に進行中の操作が save() で延長した場合や、
+        ゲームが終了して削除済みの場合はNoneを返します。
+        """
+        if key not in self._values or self._alive(key):
+            return None
+        return self.pop(key)
+
+    def evict_expired(self) -> list[tuple[K, V]]:
+        """有効期限切れのセッションを削除し、削除した (key, value) を返す"""
+        return [(key, self.pop(key)) for key in self.expired_keys()]
+
+    def restore(self) -> list[tuple[K, V]]:
+        """
+        スナップショットからセッションを復元
+
+        Returns:
+            list: 復元した (key, value) のリスト
+        """
+        restored = []
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for key, data, deadline in self.backend.load_all(self.name):
+            try:
+                value = self.decode(data)
+            except Exception as e:
+                print(f"[WARN] {self.name} セッション {key} の復元に失敗: {e}")
+                self.backend.delete(self.name, key)
+                continue
+            if deadline.tzinfo is None:
+                deadline = deadline.replace(tzinfo=datetime.timezone.utc)
+            # 停止中に放置タイムアウトを過ぎたセッションは、そのまま期限切れとして精算対象にする
+            self._values[key] = value
+            self._expires[key] = time.monotonic() + (deadline - now).total_seconds()
+            restored.append((key, value))
+        return restored
+
+
+# ========================================
+# 共有バックエンド
+# ========================================
+_backend: Optional[SnapshotBackend] = None
+
+
+def get_snapshot_backend() -> SnapshotBackend:
+    """設定に応じたスナップショット保存先を取得"""
+    global _backend
+    if _backend is None:
+        if config.SESSION_BACKEND == "mongo":
+            _backend = MongoSnapshotBackend(
+                get_collection(config.GAME_SESSIONS_COLLECTION),
+                retention=config.SESSION_SNAPSHOT_RETENTION_SECONDS
+            )
+        else:
+            _backend = SnapshotBackend()
+    return _backend
+
+
+def create_session_store(
+    name: str,
+    encode: Optional[Callable[[Any], Any]] = None,
+    decode: Optional[Callable[[Any], Any]] = None,
+    ttl: Optional[float] = None
+) -> SessionStore:
+    """設定済みのバックエンドでセッションストアを作成（ttl 省略時はゲームごとの放置タイムアウト）"""
+    if ttl is None:
+        ttl = config.SESSION_IDLE_TIMEOUTS.get(name, config.SESSION_IDLE_TIMEOUT_DEFAULT)
+    return SessionStore(
+        name,
+        ttl,
+        encode=encode,
+        decode=decode,
+        backend=get_snapshot_backend()
+    )
+
+
+def ensure_session_indexes() -> None:
+    """スナップショットコレクションのインデックスを作成"""
+    backend = get_snapshot_backend()
+    if isinstance(backend, MongoSnapshotBackend):
+        backend.ensure_indexes()
+
+
+def close_session_backend() -> None:
+    """未完了のスナップショット書き込みを待って終了"""
+    if _backend is not None:
+        _backend.close()
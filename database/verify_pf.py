@@ -0,0 +1,154 @@
+"""
+Provably Fair 一括検証ツール
+pf_records（またはそのJSONLエクスポート）を読み出し、各ゲームと同じ導出式で結果を再計算して不一致を報告します
+
+使い方:
+    python -m database.verify_pf --month 2025-06 [--game mines] [--workers 8]
+    python -m database.verify_pf --since 2025-06-01 --until 2025-06-15
+    python -m database.verify_pf --jsonl pf_records.jsonl [--output mismatches.jsonl]
+
+検証内容:
+    - server_seed の SHA-256 が事前に提示したハッシュと一致するか
+    - blackjack: カード順 / mines: 地雷位置 / rps: 相手の手 が記録と一致するか
+
+再計算は utils.pf_engine（ゲーム本体と同じコード）で行い、レコードを chunk-size 件ずつ
+プロセスプールに渡してCPUコア数分並列に検証します。
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, Iterator, Optional
+
+from config import JST
+from utils.pf_engine import GAMES, verify_chunk
+
+
+def parse_date(value: str) -> datetime.datetime:
+    """YYYY-MM-DD をJSTの日付の始まりに変換"""
+    return JST.localize(datetime.datetime.strptime(value, "%Y-%m-%d"))
+
+
+def month_range(value: str) -> tuple[datetime.datetime, datetime.datetime]:
+    """YYYY-MM をJSTの [月初, 翌月初) に変換"""
+    start = datetime.datetime.strptime(value, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return JST.localize(start), JST.localize(end)
+
+
+def load_records(args: argparse.Namespace) -> Iterator[dict[str, Any]]:
+    """引数に応じてMongoまたはJSONLからPF記録を読み出す"""
+    if args.jsonl:
+        from database.pf_records import iter_jsonl_records
+        return iter_jsonl_records(args.jsonl, game=args.game)
+
+    from database.pf_records import iter_pf_records
+    since, until = (month_range(args.month) if args.month else (None, None))
+    since = parse_date(args.since) if args.since else since
+    until = parse_date(args.until) if args.until else until
+    return iter_pf_records(since=since, until=until, game=args.game)
+
+
+def _chunks(records: Iterator[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _describe(record: dict[str, Any], mismatch: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "_id": str(record.get("_id", "")),
+        "game": record.get("game"),
+        "user_id": record.get("user_id"),
+        "nonce": record.get("nonce"),
+        "timestamp": str(record.get("timestamp", "")),
+        **mismatch,
+    }
+
+
+def verify(
+    records: Iterator[dict[str, Any]],
+    workers: Optional[int] = None,
+    chunk_size: int = 2000
+) -> tuple[dict[str, int], list[dict[str, Any]]]:
+    """
+    PF記録を並列に検証
+
+    読み出しと検証を重ねるため、実行中のチャンクはワーカー数の2倍までに抑えます。
+
+    Args:
+        records: PF記録
+        workers: プロセス数（省略時はCPUコア数）
+        chunk_size: 1回にワーカーへ渡す件数
+
+    Returns:
+        tuple: ({"checked", "mismatched"}, 不一致の一覧)
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = {"checked": 0, "mismatched": 0}
+    mismatches: list[dict[str, Any]] = []
+
+    def collect(done: set[Future]) -> None:
+        for future in done:
+            checked, found = future.result()
+            stats["checked"] += checked
+            stats["mismatched"] += len(found)
+            mismatches.extend(_describe(record, mismatch) for record, mismatch in found)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: set[Future] = set()
+        for chunk in _chunks(iter(records), chunk_size):
+            pending.add(executor.submit(verify_chunk, chunk))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(wait(pending)[0])
+
+    return stats, mismatches
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """コマンドラインエントリーポイント"""
+    parser = argparse.ArgumentParser(description="Provably Fair 一括検証ツール")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--jsonl", help="PF記録のJSONLエクスポート（省略時はMongoから読み出す）")
+    source.add_argument("--month", help="対象月（YYYY-MM、JST）")
+    parser.add_argument("--since", help="開始日（YYYY-MM-DD、JST、含む）")
+    parser.add_argument("--until", help="終了日（YYYY-MM-DD、JST、含まない）")
+    parser.add_argument("--game", choices=GAMES, help="ゲームで絞り込み")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（既定: CPUコア数）")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="1回にワーカーへ渡す件数")
+    parser.add_argument("--output", help="不一致をJSONLで書き出すファイル")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stats, mismatches = verify(load_records(args), workers=args.workers, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - started
+
+    for mismatch in mismatches[:20]:
+        print(f"[MISMATCH] {json.dumps(mismatch, ensure_ascii=False, default=str)}")
+    if len(mismatches) > 20:
+        print(f"... 他 {len(mismatches) - 20:,} 件")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for mismatch in mismatches:
+                f.write(json.dumps(mismatch, ensure_ascii=False, default=str) + "\n")
+
+    rate = stats["checked"] / elapsed if elapsed > 0 else 0
+    status = "OK" if not stats["mismatched"] else "NG"
+    print(
+        f"[{status}] checked={stats['checked']:,} mismatched={stats['mismatched']:,} "
+        f"elapsed={elapsed:.1f}s ({rate:,.0f} records/s)"
+    )
+    return 0 if not stats["mismatched"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
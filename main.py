@@ -2,9 +2,16 @@
 カジノボットメインモジュール
 Discord Bot のエントリーポイントと定期タスクを管理します
 """
+import time
+
+# 起動時間の計測開始（モジュールのインポートにかかる時間を含める）
+IMPORT_STARTED = time.perf_counter()
+
 import asyncio
 import datetime
-import os
+import functools
+import hashlib
+import json
 import random
 from datetime import timedelta
 from typing import Optional
@@ -12,12 +19,14 @@ from typing import Optional
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
-import matplotlib.pyplot as plt
-from matplotlib import font_manager as fm
 import pytz
 
 from bot import bot
-from database.db import payin_settings_collection 
+from database import async_db
+from database.db import connect as connect_database, payin_settings_collection
+from database.indexes import ensure_indexes
+from database.result_writer import game_result_writer
+from database.session_store import close_session_backend, ensure_session_indexes
 from commands import register_all_text_commands
 from commands.table_management import setup_table_commands
 from config import GUILD_ID, JST
@@ -25,9 +34,23 @@ import config
 from paypay_session import paypay_session
 from tasks.usage_ranking import send_monthly_usage_ranking, send_or_update_ranking
 from utils.account_panel import setup_account_panel
+from utils.bot_state import get_command_tree_hash, save_command_tree_hash
 from utils.invite_panel import check_invite_usage_diff, initialize_invite_cache, setup_invite_panel
+from database.reports import last_n_days
+from database.rollups import catch_up, get_rollup_series
+from tasks.daily_rollups import rollup_catch_up_task
+from tasks.session_sweeper import session_sweeper_task
 from utils.pnc import get_daily_profit, get_total_pnc, get_total_revenue
 from ui.info_panel import send_info_panel
+from ui.game.assets import preload_game_assets
+from ui.game.sessions import restore_game_sessions
+from utils.metrics import metrics
+from utils.avatar import avatar_service
+from utils.charts import chart_service
+from utils.render import render_service
+from utils.seed_pool import seed_pool
+from utils.log_dispatcher import log_dispatcher
+from utils.startup import StartupOrchestrator, StartupStep, StartupTimer
 
 # ========================================
 # 定期タスク
@@ -65,9 +88,19 @@ async def send_daily_report(target_date: Optional[str] = None) -> None:
         now = datetime.datetime.now(JST)
         target_date = (now - timedelta(days=1)).strftime("%Y-%m-%d")
 
-    daily_profit = get_daily_profit(target_date)
-    total_pnc = get_total_pnc()
-    monthly_revenue = get_total_revenue()
+    # 日次集計を最新化し、直近30日分の集計ドキュメントを日次利益とグラフの両方で使う
+    try:
+        await async_db.run_in_db_thread(catch_up)
+    except Exception as e:
+        print(f"[WARN] daily_rollups catch-up error: {e}")
+    series = await async_db.run_in_db_thread(get_rollup_series, *last_n_days(30))
+    series_by_day = {totals.day: totals for totals in series}
+    if target_date in series_by_day:
+        daily_profit = series_by_day[target_date].profit
+    else:
+        daily_profit = await async_db.run_in_db_thread(get_daily_profit, target_date)
+    total_pnc = await async_db.run_in_db_thread(get_total_pnc)
+    monthly_revenue = await async_db.run_in_db_thread(get_total_revenue)
 
     profit_rate = (daily_profit / total_pnc * 100) if total_pnc > 0 else 0.0
 
@@ -90,8 +123,11 @@ async def send_daily_report(target_date: Optional[str] = None) -> None:
 
         await channel.send(embed=embed)
 
-        graph_path = create_monthly_profit_graph()
-        file = discord.File(graph_path, filename="monthly_profit.png")
+        graph = await chart_service.render_profit_chart(
+            [totals.day for totals in series],
+            [totals.profit for totals in series]
+        )
+        file = discord.File(graph, filename="monthly_profit.png")
         graph_embed = discord.Embed(
             title="直近30日間のカジノ利益推移",
             color=discord.Color.blurple()
@@ -99,51 +135,6 @@ async def send_daily_report(target_date: Optional[str] = None) -> None:
         graph_embed.set_image(url="attachment://monthly_profit.png")
         await channel.send(embed=graph_embed, file=file)
 
-def create_monthly_profit_graph() -> str:
-    """
-    過去30日間のカジノ利益推移グラフを作成
-    
-    Returns:
-        str: 生成されたグラフ画像のパス
-    """
-    REPORTS_DIR = "reports"
-    os.makedirs(REPORTS_DIR, exist_ok=True)
-
-    font_path = "assets/font/NotoSansJP-VariableFont_wght.ttf"
-    jp_font = fm.FontProperties(fname=font_path)
-
-    today = datetime.datetime.now(JST)
-    dates = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(29, -1, -1)]
-    profits = [get_daily_profit(date) for date in dates]
-
-    plt.figure(figsize=(12, 6))
-    plt.plot(dates, profits, marker='o', linestyle='-', color='blue')
-
-    plt.title("📊 過去30日間のカジノ収益推移", fontproperties=jp_font)
-    plt.xlabel("日付", fontproperties=jp_font)
-    plt.ylabel("利益（円）", fontproperties=jp_font)
-    plt.xticks(rotation=45, fontproperties=jp_font)
-    plt.yticks(fontproperties=jp_font)
-    plt.grid(True)
-
-    # データラベルを追加
-    for i, profit in enumerate(profits):
-        plt.annotate(
-            f"{profit:,}",
-            (dates[i], profits[i]),
-            textcoords="offset points",
-            xytext=(0, 8),
-            ha='center',
-            fontsize=8,
-            fontproperties=jp_font
-        )
-
-    plt.tight_layout()
-    image_path = os.path.join(REPORTS_DIR, "monthly_profit.png")
-    plt.savefig(image_path, bbox_inches="tight")
-    plt.close()
-    
-    return image_path
 
 # ========================================
 # 生存確認タスク
@@ -187,22 +178,57 @@ async def toggle_no_fee(interaction: discord.Interaction, mode: bool) -> None:
     status = "有効化✅" if mode else "無効化❌"
     await interaction.response.send_message(f"換金率100%キャンペーンを{status}しました。", ephemeral=True)
 
+
+@bot.tree.command(name="メトリクス", description="ボット内部のメトリクスを表示します（管理者専用）")
+@app_commands.describe(prefix="表示するメトリクス名の接頭辞（例: game_sessions）")
+async def show_metrics(interaction: discord.Interaction, prefix: str = "") -> None:
+    """登録済みメトリクスをテキストで表示"""
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("権限がありません。", ephemeral=True)
+        return
+
+    text = metrics.render(prefix) or "メトリクスがありません。"
+    if len(text) > 1900:
+        text = text[:1900] + "\n..."
+    await interaction.response.send_message(f"```\n{text}\n```", ephemeral=True)
+
 # ========================================
 # イベントハンドラー
 # ========================================
-@bot.event
-async def on_ready() -> None:
-    """ボット起動時の初期化処理"""
-    print("[DEBUG] on_ready 実行開始")
-    
-    # テーブル管理コマンドをセットアップ
-    await setup_table_commands(bot)
-    
-    # スラッシュコマンドを同期
+def command_tree_hash() -> str:
+    """スラッシュコマンド定義のハッシュ（変更がなければ tree.sync() を省略する）"""
+    payload = []
+    for command in bot.tree.get_commands():
+        try:
+            payload.append(command.to_dict(bot.tree))
+        except TypeError:
+            # discord.py 2.4 より前は to_dict() に引数がない
+            payload.append(command.to_dict())
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+async def sync_command_tree() -> None:
+    """スラッシュコマンドを同期（前回同期した定義から変わっていなければ省略）"""
+    tree_hash = command_tree_hash()
+    application_id = bot.application_id or 0
+    if await asyncio.to_thread(get_command_tree_hash, application_id) == tree_hash:
+        print("[INFO] スラッシュコマンドに変更がないため同期を省略しました")
+        return
     await bot.tree.sync()
-    print(f"🟢 Logged in as {bot.user}")
+    await asyncio.to_thread(save_command_tree_hash, application_id, tree_hash)
+    print("✅ スラッシュコマンドを同期しました")
 
-    # 招待キャッシュの初期化
+
+async def restore_sessions() -> None:
+    """再起動前に進行中だったゲームを復元"""
+    restored = restore_game_sessions(bot)
+    if restored:
+        print(f"✅ Restored game sessions: {restored}")
+
+
+async def init_invite_cache() -> None:
+    """招待キャッシュの初期化（再接続中に使われた招待を反映するため毎回行う）"""
     for guild in bot.guilds:
         if guild.id == GUILD_ID:
             try:
@@ -211,27 +237,22 @@ async def on_ready() -> None:
             except Exception as e:
                 print(f"❌ Failed to initialize invites for {guild.name}: {e}")
 
-    # アカウントパネルのセットアップ
-    await setup_account_panel()
-    # await setup_invite_panel(bot)  # 必要に応じてコメント解除
-    
-    # 情報パネルのセットアップ
-    await send_info_panel(bot)
 
-    # 定期タスクの開始
-    if not daily_report_task.is_running():
-        daily_report_task.start()
+async def start_periodic_tasks() -> None:
+    """定期タスクの開始（実行中のものはそのまま）"""
+    for task in (
+        daily_report_task,
+        invite_monitor_loop,
+        send_monthly_usage_ranking,
+        rollup_catch_up_task,
+        session_sweeper_task,
+    ):
+        if not task.is_running():
+            task.start()
 
-    if not invite_monitor_loop.is_running():
-        invite_monitor_loop.start()
 
-    if not send_monthly_usage_ranking.is_running():
-        send_monthly_usage_ranking.start()
-
-    # 初回ランキング送信
-    await send_or_update_ranking()
-    
-    # 初回レポート送信
+async def send_startup_report() -> None:
+    """初回レポート送信（失敗した場合は管理チャンネルに通知）"""
     try:
         await send_daily_report()
     except Exception as e:
@@ -248,22 +269,113 @@ async def on_ready() -> None:
                 await error_channel.send(embed=error_embed)
 
 
+def build_on_ready_orchestrator() -> StartupOrchestrator:
+    """
+    on_ready の処理
+    依存関係のない処理は並行して行い、ランキング・レポートの送信は完了を待たずにバックグラウンドで行います。
+    再接続でも on_ready が呼ばれるため、パネル送信やコマンド登録など1回でよい処理は成功済みなら省略します。
+    """
+    orchestrator = StartupOrchestrator("on_ready")
+    orchestrator.add(StartupStep("restore_sessions", restore_sessions))
+    orchestrator.add(StartupStep("table_commands", functools.partial(setup_table_commands, bot)))
+    orchestrator.add(StartupStep("tree_sync", sync_command_tree, after=("table_commands",)))
+    orchestrator.add(StartupStep("invite_cache", init_invite_cache, once=False))
+    orchestrator.add(StartupStep("account_panel", setup_account_panel))
+    # await setup_invite_panel(bot)  # 必要に応じてステップに追加
+    orchestrator.add(StartupStep("info_panel", functools.partial(send_info_panel, bot)))
+    orchestrator.add(StartupStep("periodic_tasks", start_periodic_tasks, once=False))
+    # 初回ランキング・レポート送信（集計が重いため起動を待たせない）
+    orchestrator.add(StartupStep("ranking", send_or_update_ranking, background=True))
+    orchestrator.add(StartupStep("daily_report", send_startup_report, background=True))
+    return orchestrator
+
+
+on_ready_orchestrator = build_on_ready_orchestrator()
+
+
+@bot.event
+async def on_ready() -> None:
+    """ボット起動時・再接続時の初期化処理"""
+    print(f"🟢 Logged in as {bot.user}")
+    timer = await on_ready_orchestrator.run()
+    print(timer.report())
+
+
 # ========================================
 # メインエントリーポイント
 # ========================================
+async def bootstrap(timer: StartupTimer) -> None:
+    """
+    ボット起動前の初期化
+    DBの準備・PayPayログインとアセット読み込みを並行して行い、バックグラウンド処理を開始します
+
+    Args:
+        timer: 各ステップの所要時間の記録先
+    """
+    async def prepare_database() -> None:
+        with timer.step("mongo"):
+            await asyncio.to_thread(connect_database)
+
+        # 全コレクションのインデックスを作成（作成済みなら何もしない）
+        with timer.step("indexes"):
+            try:
+                await asyncio.to_thread(ensure_indexes)
+                await asyncio.to_thread(ensure_session_indexes)
+            except Exception as e:
+                print(f"[WARN] インデックス作成に失敗: {e}")
+
+        # 本番モードではトークンをDBから読み込むため、接続後にログインする
+        with timer.step("paypay"):
+            await asyncio.to_thread(paypay_session.start)
+
+    async def load_assets() -> None:
+        # ゲーム画像のアセットを読み込み
+        with timer.step("assets"):
+            await asyncio.to_thread(preload_game_assets)
+
+    await asyncio.gather(prepare_database(), load_assets())
+
+    # ゲーム結果の書き込みキュー・サーバーシードの事前生成・ログチャンネルへの送信キューを開始
+    with timer.step("background"):
+        game_result_writer.start()
+        seed_pool.start()
+        log_dispatcher.start()
+
+    # テキストコマンドを登録
+    with timer.step("commands"):
+        await register_all_text_commands(bot)
+
+
 async def main() -> None:
     """ボットのメイン処理"""
+    timer = StartupTimer("bootstrap", started=IMPORT_STARTED)
+    timer.record("import", time.perf_counter() - IMPORT_STARTED)
+
     # 生存確認タスクをバックグラウンドで実行
     asyncio.create_task(keep_alive())
-    
-    # テキストコマンドを登録
-    await register_all_text_commands(bot)
+
+    await bootstrap(timer)
+    print(timer.report())
     
     # ボットを起動
     if not config.TOKEN:
         raise ValueError("DISCORD_BOT_TOKEN が設定されていません")
     
-    await bot.start(config.TOKEN)
+    try:
+        await bot.start(config.TOKEN)
+    finally:
+        # 未送信のログ（景品交換・入金など）を送り切ってからボットの接続を閉じる
+        await log_dispatcher.stop(drain_timeout=config.LOG_DISPATCH_DRAIN_SECONDS)
+        if not bot.is_closed():
+            await bot.close()
+        # 未書き込みのゲーム結果を反映してから接続を閉じる
+        await game_result_writer.stop()
+        await seed_pool.stop()
+        close_session_backend()
+        await avatar_service.close()
+        render_service.shutdown()
+        chart_service.shutdown()
+        await async_db.close()
 
 
 if __name__ == "__main__":
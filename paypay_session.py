@@ -1,6 +1,8 @@
 """
 PayPayセッション管理モジュール
 本番環境とテスト環境を自動的に切り替えます
+
+インポート時にはログインしません。起動処理で paypay_session.start() を呼んでから使用します。
 """
 from typing import Any, Optional
 import random
@@ -84,7 +86,22 @@ class PayPaySession:
     def __init__(self):
         self.is_test_mode = IS_TEST_MODE
         self.paypay = None
-        
+        self.tokens = {}
+
+    @property
+    def started(self) -> bool:
+        return self.paypay is not None
+
+    def start(self) -> None:
+        """
+        PayPayセッションを開始（同期、起動処理から1回だけ呼ぶ）
+
+        本番モードではトークンを読み込んでログインします。
+        すべての方法で失敗した場合は input() で手動ログインを求めるため、スレッドで実行してください。
+        """
+        if self.started:
+            return
+
         if IS_TEST_MODE:
             print("=" * 60)
             print("🧪 テストモードで起動しています")
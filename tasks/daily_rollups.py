@@ -0,0 +1,23 @@
+"""
+日次集計追いつきタスク
+financial_ledger の新しい取引を daily_rollups に定期的に反映します
+"""
+from discord.ext import tasks
+
+from config import ROLLUP_CATCHUP_MINUTES
+from database import async_db
+from database.rollups import catch_up
+
+
+# ========================================
+# 定期タスク
+# ========================================
+@tasks.loop(minutes=ROLLUP_CATCHUP_MINUTES)
+async def rollup_catch_up_task() -> None:
+    """日次集計の追いつき処理（ROLLUP_CATCHUP_MINUTES 分ごと）"""
+    try:
+        result = await async_db.run_in_db_thread(catch_up)
+        if result["days"]:
+            print(f"✅ daily_rollups updated: {result['days']} days")
+    except Exception as e:
+        print(f"[ERROR] daily_rollups catch-up error: {e}")
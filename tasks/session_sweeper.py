@@ -0,0 +1,22 @@
+"""
+ゲームセッション掃除タスク
+放置されたゲームセッションを精算し、終了したゲームのボタンを登録解除します
+"""
+from discord.ext import tasks
+
+from config import SESSION_SWEEP_INTERVAL_SECONDS
+from utils.session_registry import session_registry
+
+
+# ========================================
+# 定期タスク
+# ========================================
+@tasks.loop(seconds=SESSION_SWEEP_INTERVAL_SECONDS)
+async def session_sweeper_task() -> None:
+    """放置セッションの掃除（SESSION_SWEEP_INTERVAL_SECONDS 秒ごと）"""
+    try:
+        result = await session_registry.sweep()
+        if result["expired"]:
+            print(f"✅ Settled idle game sessions: {result['expired']} (views released: {result['views']})")
+    except Exception as e:
+        print(f"[ERROR] session sweeper error: {e}")
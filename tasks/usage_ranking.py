@@ -4,7 +4,7 @@
 """
 import os
 import json
-from collections import defaultdict
+from collections import OrderedDict
 from datetime import time, datetime
 from typing import Optional
 
@@ -12,22 +12,27 @@ import discord
 from discord.ext import tasks
 import pytz
 
-from database.db import financial_transactions_collection
 from bot import bot
 from utils.bot_state import save_last_message_id_to_db, get_last_message_id_from_db
 from utils.emojis import PNC_EMOJI_STR
-from config import RANKING_CHANNEL_ID, EXCLUDED_USER_IDS, ADMIN_USER_ID
+from utils.leaderboard import monthly_leaderboard
+from config import RANKING_CHANNEL_ID, EXCLUDED_USER_IDS, ADMIN_USER_ID, GUILD_ID
 
 # ========================================
 # 定数
 # ========================================
 JST = pytz.timezone("Asia/Tokyo")
 STORAGE_PATH = "last_monthly_ranking.json"
+RANKING_SIZE = 10
+NAME_CACHE_SIZE = 256
 
 # 除外ユーザーID（レガシー - configから取得）
 EXCLUDED_USER_ID = EXCLUDED_USER_IDS[0] if EXCLUDED_USER_IDS else None
 TARGET_USER_ID = ADMIN_USER_ID
 
+# fetch_user で取得した表示名（キャッシュにないユーザーのみ）
+_fetched_names: OrderedDict[int, str] = OrderedDict()
+
 
 # ========================================
 # ヘルパー関数
@@ -58,63 +63,50 @@ async def send_monthly_usage_ranking() -> None:
 # ========================================
 # ランキング送信処理
 # ========================================
+async def resolve_display_name(user_id: int) -> str:
+    """
+    ユーザーの表示名を取得
+
+    サーバーメンバー・ユーザーのキャッシュを優先し、どちらにもない場合のみ fetch_user で取得します
+    （取得した名前は NAME_CACHE_SIZE 件まで保持）。
+    """
+    guild = bot.get_guild(GUILD_ID)
+    user = (guild.get_member(user_id) if guild else None) or bot.get_user(user_id)
+    if user is not None:
+        return user.display_name
+
+    name = _fetched_names.get(user_id)
+    if name is not None:
+        _fetched_names.move_to_end(user_id)
+        return name
+
+    try:
+        user = await bot.fetch_user(user_id)
+        name = user.display_name
+    except Exception as e:
+        print(f"[WARN] ユーザー取得失敗: {e}")
+        return f"Unknown({user_id})"
+
+    _fetched_names[user_id] = name
+    while len(_fetched_names) > NAME_CACHE_SIZE:
+        _fetched_names.popitem(last=False)
+    return name
+
+
 async def send_or_update_ranking() -> None:
     """月間利用ランキングを送信または更新"""
     try:
         now = datetime.now(JST)
         start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end = now
-
-        # 除外ユーザーIDをconfigから取得
-        excluded_user_id = EXCLUDED_USER_ID
-        target_user_id = TARGET_USER_ID
-        target_payin_total = 0
-
-        total_payin = 0  # 全体Payin合計
-        total_payout = 0  # 全体Payout合計
-
-        cursor = financial_transactions_collection.find({
-            "transactions.timestamp": {"$gte": start, "$lt": end}
-        })
 
-        user_profits = defaultdict(int)
+        # 当月の集計は取引の記録時に更新済み（起動後の初回のみレジャーから読み込む）
+        await monthly_leaderboard.ensure_month(start.strftime("%Y-%m"))
 
-        for doc in cursor:
-            user_id = doc["user_id"]
+        if TARGET_USER_ID:
+            target_payin_total, _ = monthly_leaderboard.totals(TARGET_USER_ID)
+            print(f"[DEBUG] 対象ユーザーのPayin: {target_payin_total}")
 
-            for txn in doc.get("transactions", []):
-                ts = txn.get("timestamp")
-                if ts is None:
-                    continue
-
-                if isinstance(ts, str):
-                    ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-
-                try:
-                    ts_jst = ts.astimezone(JST)
-                except Exception as e:
-                    print(f"[WARN] timestamp変換エラー: {e}")
-                    continue
-
-                if start <= ts_jst < end:
-                    tx_type = txn.get("type")
-                    amount = txn.get("amount", 0)
-
-                    if user_id == target_user_id and tx_type == "payin":
-                        target_payin_total += amount
-                        print(f"[DEBUG] 対象ユーザーのPayin: {amount}")
-
-                    if user_id == excluded_user_id:
-                        continue
-
-                    if tx_type == "payin":
-                        user_profits[user_id] += amount
-                        total_payin += amount
-                    elif tx_type == "payout":
-                        user_profits[user_id] -= amount * 10
-                        total_payout += amount
-
-        ranking = sorted(user_profits.items(), key=lambda x: x[1], reverse=True)[:10]
+        ranking = monthly_leaderboard.top(RANKING_SIZE)
         if not ranking:
             print("[LOG] 月間ランキングデータなし")
             return
@@ -127,13 +119,7 @@ async def send_or_update_ranking() -> None:
         )
 
         for i, (uid, profit) in enumerate(ranking, start=1):
-            try:
-                user = await bot.fetch_user(uid)
-                name = user.display_name
-            except Exception as e:
-                print(f"[WARN] ユーザー取得失敗: {e}")
-                name = f"Unknown({uid})"
-
+            name = await resolve_display_name(uid)
             embed.add_field(
                 name=f"{i}位：{name}",
                 value=f"<@{uid}>：{PNC_EMOJI_STR}`{profit * 10:,}`",
@@ -0,0 +1,290 @@
+"""
+ゲーム画像アセットキャッシュモジュール
+ゲーム画像の描画に使う画像・フォントを一度だけ読み込み、描画ごとのファイル読み込み・変換・リサイズをなくします
+
+キャッシュした画像は複数の描画で共有するため、貼り付け元としてのみ使い、直接変更しないでください。
+描画先が必要な場合は new_*() が返すコピーを使います。
+"""
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_PATH = "assets/font/NotoSansJP-VariableFont_wght.ttf"
+
+
+# ========================================
+# 共通ヘルパー
+# ========================================
+@lru_cache(maxsize=None)
+def get_font(size: int, path: str = FONT_PATH) -> ImageFont.FreeTypeFont:
+    """フォントを取得（サイズごとに一度だけ読み込み）"""
+    return ImageFont.truetype(path, size)
+
+
+@lru_cache(maxsize=None)
+def circle_mask(size: tuple[int, int]) -> Image.Image:
+    """円形の切り抜きマスクを取得"""
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size[0], size[1]), fill=255)
+    return mask
+
+
+def crop_circle(im: Image.Image) -> Image.Image:
+    """画像を円形に切り抜き（外側は透明）"""
+    result = Image.new("RGBA", im.size)
+    result.paste(im, (0, 0), circle_mask(im.size))
+    return result
+
+
+def load_rgba(path: str, size: Optional[tuple[int, int]] = None) -> Image.Image:
+    """画像をRGBAで読み込み、必要ならリサイズ"""
+    with Image.open(path) as im:
+        image = im.convert("RGBA")
+    return image.resize(size) if size else image
+
+
+# ========================================
+# ブラックジャック
+# ========================================
+class BlackjackAssets:
+    """
+    ブラックジャックのテーブル画像用アセット
+
+    テーブル・カード（140x200）・カード裏面・影・円形のディーラーアイコン・フォントを保持します。
+    load() で全件を読み込み、未読み込みのものは初回アクセス時に読み込みます。
+    """
+
+    CARD_SIZE = (140, 200)
+    ICON_SIZE = (120, 120)
+    SHADOW_COLOR = (0, 0, 0, 100)
+    SCORE_FONT_SIZE = 40
+    ICON_FONT_SIZE = 36
+
+    def __init__(self, table_path: str, card_dir: str, dealer_dir: str):
+        self.table_path = table_path
+        self.card_dir = card_dir
+        self.dealer_dir = dealer_dir
+        self._table: Optional[Image.Image] = None
+        self._cards: dict[str, Image.Image] = {}
+        self._dealer_icons: dict[str, Image.Image] = {}
+        self._dealer_files: Optional[list[str]] = None
+        self._shadow: Optional[Image.Image] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """全アセットを読み込み（起動時に呼ぶ）"""
+        self.new_table()
+        self.shadow
+        for filename in os.listdir(self.card_dir):
+            if filename.endswith(".png"):
+                self.card(os.path.splitext(filename)[0])
+        for filename in self.dealer_files:
+            self.dealer_icon(filename)
+        self.score_font
+        self.icon_font
+
+    # ---------- テーブル ----------
+    def new_table(self) -> Image.Image:
+        """描画用のテーブル画像（コピー）を取得"""
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    self._table = load_rgba(self.table_path)
+        return self._table.copy()
+
+    # ---------- カード ----------
+    def card(self, code: str) -> Image.Image:
+        """リサイズ済みのカード画像を取得（"back" で裏面）"""
+        image = self._cards.get(code)
+        if image is None:
+            image = load_rgba(os.path.join(self.card_dir, f"{code}.png"), self.CARD_SIZE)
+            with self._lock:
+                image = self._cards.setdefault(code, image)
+        return image
+
+    @property
+    def card_back(self) -> Image.Image:
+        return self.card("back")
+
+    @property
+    def shadow(self) -> Image.Image:
+        """カードの影"""
+        if self._shadow is None:
+            self._shadow = Image.new("RGBA", self.CARD_SIZE, self.SHADOW_COLOR)
+        return self._shadow
+
+    # ---------- ディーラー ----------
+    @property
+    def dealer_files(self) -> list[str]:
+        """ディーラー画像のファイル名一覧"""
+        if self._dealer_files is None:
+            self._dealer_files = sorted(f for f in os.listdir(self.dealer_dir) if f.endswith(".png"))
+        return self._dealer_files
+
+    def dealer_icon(self, filename: str) -> Image.Image:
+        """円形に切り抜いたディーラーアイコンを取得"""
+        image = self._dealer_icons.get(filename)
+        if image is None:
+            image = crop_circle(load_rgba(os.path.join(self.dealer_dir, filename), self.ICON_SIZE))
+            with self._lock:
+                image = self._dealer_icons.setdefault(filename, image)
+        return image
+
+    # ---------- フォント ----------
+    @property
+    def score_font(self) -> ImageFont.FreeTypeFont:
+        return get_font(self.SCORE_FONT_SIZE)
+
+    @property
+    def icon_font(self) -> ImageFont.FreeTypeFont:
+        return get_font(self.ICON_FONT_SIZE)
+
+
+# ========================================
+# ヒットアンドブロー
+# ========================================
+class HitAndBlowAssets:
+    """
+    ヒットアンドブローの盤面用アセット
+
+    盤面の下地・数字スプライト（0〜9、50x70）・フォントを保持します。
+    """
+
+    DIGIT_SIZE = (50, 70)
+    FONT_SIZE = 16
+
+    def __init__(self, base_path: str, digit_dir: str):
+        self.base_path = base_path
+        self.digit_dir = digit_dir
+        self._base: Optional[Image.Image] = None
+        self._digits: Optional[dict[str, Image.Image]] = None
+        self._font: Optional[ImageFont.ImageFont] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """全アセットを読み込み（起動時に呼ぶ）"""
+        self.new_board()
+        self.digits
+        self.font
+
+    def new_board(self) -> Image.Image:
+        """描画用の盤面画像（コピー）を取得"""
+        if self._base is None:
+            with self._lock:
+                if self._base is None:
+                    self._base = load_rgba(self.base_path)
+        return self._base.copy()
+
+    @property
+    def digits(self) -> dict[str, Image.Image]:
+        """数字 → リサイズ済みスプライト"""
+        if self._digits is None:
+            self._digits = {
+                str(d): load_rgba(os.path.join(self.digit_dir, f"{d}.png"), self.DIGIT_SIZE)
+                for d in range(10)
+            }
+        return self._digits
+
+    def digit(self, d: str) -> Image.Image:
+        return self.digits[d]
+
+    @property
+    def font(self) -> ImageFont.ImageFont:
+        """盤面の文字用フォント（読み込めない場合は既定フォント）"""
+        if self._font is None:
+            try:
+                self._font = get_font(self.FONT_SIZE)
+            except OSError:
+                self._font = ImageFont.load_default()
+        return self._font
+
+
+# ========================================
+# じゃんけん
+# ========================================
+class RPSAssets:
+    """
+    じゃんけんの進行画像用アセット
+
+    背景・カード裏面（幅120）・手の画像6枚（幅106）・履歴用サムネイル6枚（40x40）・フォントを保持します。
+    手の画像は (手, 1: プレイヤー / 2: 相手) で取得します。
+    """
+
+    HANDS = ("rock", "paper", "scissors")
+    SIDES = (1, 2)
+    CANVAS_SIZE = (1280, 500)
+    BACKGROUND_COLOR = (20, 20, 30, 255)
+    CARD_WIDTH = 120
+    HAND_WIDTH = int(CARD_WIDTH * 0.89)
+    THUMB_SIZE = (40, 40)
+    FONT_SIZE = 20
+
+    def __init__(self, asset_dir: str):
+        self.asset_dir = asset_dir
+        self._background: Optional[Image.Image] = None
+        self._card_back: Optional[Image.Image] = None
+        self._hands: Optional[dict[tuple[str, int], Image.Image]] = None
+        self._thumbs: Optional[dict[tuple[str, int], Image.Image]] = None
+
+    def load(self) -> None:
+        """全アセットを読み込み（起動時に呼ぶ）"""
+        self.new_background()
+        self.card_back
+        self.hand("rock", 1)
+        self.thumb("rock", 1)
+        self.font
+
+    @staticmethod
+    def _resize_to_width(image: Image.Image, width: int) -> Image.Image:
+        return image.resize((width, int(image.height * width / image.width)))
+
+    def new_background(self) -> Image.Image:
+        """描画用の背景（コピー）を取得"""
+        if self._background is None:
+            self._background = Image.new("RGBA", self.CANVAS_SIZE, self.BACKGROUND_COLOR)
+        return self._background.copy()
+
+    @property
+    def card_back(self) -> Image.Image:
+        if self._card_back is None:
+            self._card_back = self._resize_to_width(load_rgba(os.path.join(self.asset_dir, "slot_back.png")), self.CARD_WIDTH)
+        return self._card_back
+
+    def hand(self, hand: str, side: int) -> Image.Image:
+        """中央に表示する手の画像"""
+        if self._hands is None:
+            self._hands = {
+                (h, s): self._resize_to_width(load_rgba(os.path.join(self.asset_dir, f"{h}.{s}.png")), self.HAND_WIDTH)
+                for h in self.HANDS for s in self.SIDES
+            }
+        return self._hands[(hand, side)]
+
+    def thumb(self, hand: str, side: int) -> Image.Image:
+        """履歴に表示する手のサムネイル"""
+        if self._thumbs is None:
+            self._thumbs = {
+                (h, s): load_rgba(os.path.join(self.asset_dir, f"{h}.{s}.thumb.png"), self.THUMB_SIZE)
+                for h in self.HANDS for s in self.SIDES
+            }
+        return self._thumbs[(hand, side)]
+
+    @property
+    def font(self) -> ImageFont.FreeTypeFont:
+        return get_font(self.FONT_SIZE)
+
+
+blackjack_assets = BlackjackAssets("assets/bj/table.png", "assets/bj/cards", "assets/bj/dealer")
+hitandblow_assets = HitAndBlowAssets("assets/hab/base.png", "assets/hab/digits")
+rps_assets = RPSAssets("assets/rps")
+
+
+def preload_game_assets() -> None:
+    """全ゲームのアセットを読み込み（失敗しても初回描画時に再試行される）"""
+    for name, assets in (("blackjack", blackjack_assets), ("hitandblow", hitandblow_assets), ("rps", rps_assets)):
+        try:
+            assets.load()
+        except Exception as e:
+            print(f"[WARN] {name} アセットの読み込みに失敗: {e}")
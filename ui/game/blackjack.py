@@ -1,25 +1,49 @@
 import discord
 import random
 import os
-import hmac
-import hashlib
-import aiohttp
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
+import threading
+from PIL import Image, ImageDraw
 
-from database.db import update_user_balance
+from database import async_db
+from database.bet_history import GAME_DRAW
+from database.pf_records import build_pf_record
+from database.result_writer import game_result_writer
+from database.session_store import create_session_store
 
+from ui.game.assets import blackjack_assets
 from ui.pf import ProvablyFairParams
+from utils.pf_engine import card_index
 from utils.emojis import PNC_EMOJI_STR, WIN_EMOJI
 from utils.embed import create_embed
-from utils.logs import send_casino_log
+from utils.logs import log_transaction, send_casino_log
 from utils.color import BLACKJACK_COLOR
+from utils.avatar import avatar_service
+from utils.render import image_filename, render_service
+from utils.rate_limit import guard_interaction
+from utils.session_registry import GameSessionSpec, session_registry
+
+# テーブル画像のレイアウト
+CARD_START_X = 320
+CARD_SPACING = 150
+SHADOW_OFFSET = (6, 6)
+DEALER_CARD_Y = 120
+PLAYER_CARD_Y = 400
+ICON_X = 130
+DEALER_ICON_Y = 150
+PLAYER_ICON_Y = 420
+TEXT_COLOR = (255, 255, 255)
+SHADOW_COLOR = (0, 0, 0)
+
+IMAGE_FILENAME = image_filename("blackjack")
+
+
+def paste_card(table, card_img, index, y):
+    """index 枚目の位置に影付きでカードを貼る"""
+    x = CARD_START_X + index * CARD_SPACING
+    shadow = blackjack_assets.shadow
+    table.paste(shadow, (x + SHADOW_OFFSET[0], y + SHADOW_OFFSET[1]), shadow)
+    table.paste(card_img, (x, y), card_img)
 
-CARD_PATH = "assets/bj/cards/"
-TABLE_IMAGE_PATH = f"assets/bj/table.png"
-FONT_PATH = "assets/font/NotoSansJP-VariableFont_wght.ttf"
-
-blackjack_games = {}
 
 def calculate_hand(hand):
     total = 0
@@ -38,10 +62,7 @@ def calculate_hand(hand):
     return total
 
 def get_card_index(server_seed, client_seed, nonce, cursor):
-    message = f"{client_seed}:{nonce}:{cursor}".encode()
-    digest = hmac.new(server_seed.encode(), message, hashlib.sha256).digest()
-    number = int.from_bytes(digest, 'big') / 2**256
-    return int(number * 52)
+    return card_index(server_seed, client_seed, nonce, cursor)
 
 def get_card():
     suits = ["S", "H", "D", "C"]
@@ -52,13 +73,15 @@ def get_card():
 
 class BlackjackView(discord.ui.View):
     def __init__(self, user_id):
-        super().__init__(timeout=60)
+        super().__init__(timeout=None)
         self.user_id = user_id
+        session_registry.track_view("blackjack", user_id, self)
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         return interaction.user.id == self.user_id
 
-    @discord.ui.button(label="ヒット", style=discord.ButtonStyle.primary)
+    @discord.ui.button(label="ヒット", style=discord.ButtonStyle.primary, custom_id="blackjack:hit")
+    @guard_interaction
     async def hit_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         user_id = self.user_id
         game = blackjack_games.get(user_id)
@@ -72,59 +95,57 @@ class BlackjackView(discord.ui.View):
             game.dealer_play()
             result = game.get_result()
             del blackjack_games[user_id]
+            game_result_writer.record_pf(game.pf_record(user_id))
 
-            # ✅ ユーザーアイコン取得
-            async with aiohttp.ClientSession() as session:
-                async with session.get(interaction.user.display_avatar.url) as resp:
-                    avatar_bytes = BytesIO(await resp.read())
+            user_icon = await avatar_service.get_avatar(interaction.user, blackjack_assets.ICON_SIZE[0])
 
             if result == "負け":
+                log_transaction(user_id, "blackjack", game.bet, 0)
                 outcome_text = f"### {PNC_EMOJI_STR}`{game.bet:,}` **LOSE**"
                 color = discord.Color.from_str("#ff3d74") 
             else:
+                log_transaction(user_id, "blackjack", game.bet, game.bet * 2)
                 outcome_text = f"### {PNC_EMOJI_STR}`{game.bet:,}` **WIN**"
                 color = discord.Color.from_str("#26ffd4") 
-                update_user_balance(user_id, game.bet * 2)
+                await async_db.update_user_balance(user_id, game.bet * 2)
                 await send_casino_log(
                     interaction, winorlose="WIN", emoji=WIN_EMOJI, price=game.bet * 2,
                     description="",
                     color=discord.Color.from_str("#26ffd4"),
                 )
-            img = game.render_image(
+            buf = await render_service.render_encoded(
+                "blackjack",
+                game.render_image,
                 reveal_dealer=True,
                 user_displayname=interaction.user.display_name,
-                user_avatar_data=avatar_bytes
+                user_icon=user_icon
             )
-            buf = BytesIO()
-            img.save(buf, format='PNG')
-            buf.seek(0)
-            file = discord.File(buf, filename="blackjack.png")
+            file = discord.File(buf, filename=IMAGE_FILENAME)
             embed = create_embed("バースト", outcome_text, color=color)
-            embed.set_image(url="attachment://blackjack.png")
+            embed.set_image(url=f"attachment://{IMAGE_FILENAME}")
             embed.add_field(name="🔐 Provably Fair", value=game.get_pf_embed_field(), inline=False)
             embed.set_footer(text="検証方法：HMAC-SHA256(client:nonce:cursor)でカード順を再計算可能")
             embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1219916908485283880/1386317663231414272/ChatGPT_Image_2025622_21_11_08.png?ex=6859446f&is=6857f2ef&hm=19507da3f6ae2ea49377b1112e687a6690cd37bb229cc4ebcd5a1fef2c5965e6&")
             await interaction.response.edit_message(embed=embed, attachments=[file], view=None)
             return
 
-        # ✅ 通常ヒット時もアイコンを反映
-        async with aiohttp.ClientSession() as session:
-            async with session.get(interaction.user.display_avatar.url) as resp:
-                avatar_bytes = BytesIO(await resp.read())
+        blackjack_games.save(user_id)
+
+        user_icon = await avatar_service.get_avatar(interaction.user, blackjack_assets.ICON_SIZE[0])
 
-        img = game.render_image(
+        buf = await render_service.render_encoded(
+            "blackjack",
+            game.render_image,
             user_displayname=interaction.user.display_name,
-            user_avatar_data=avatar_bytes
+            user_icon=user_icon
         )
-        buf = BytesIO()
-        img.save(buf, format='PNG')
-        buf.seek(0)
-        file = discord.File(buf, filename="blackjack.png")
+        file = discord.File(buf, filename=IMAGE_FILENAME)
         embed = create_embed("ヒット", f"{interaction.user.mention} の現在の手札です。", BLACKJACK_COLOR)
-        embed.set_image(url="attachment://blackjack.png")
+        embed.set_image(url=f"attachment://{IMAGE_FILENAME}")
         await interaction.response.edit_message(embed=embed, attachments=[file], view=self)
     
-    @discord.ui.button(label="スタンド", style=discord.ButtonStyle.secondary)
+    @discord.ui.button(label="スタンド", style=discord.ButtonStyle.secondary, custom_id="blackjack:stand")
+    @guard_interaction
     async def stand_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         user_id = self.user_id
         game = blackjack_games.get(user_id)
@@ -135,6 +156,7 @@ class BlackjackView(discord.ui.View):
         game.dealer_play()
         result = game.get_result()
         del blackjack_games[user_id]
+        game_result_writer.record_pf(game.pf_record(user_id))
 
         if result == "勝ち":
             if game.is_blackjack(game.player_hand):
@@ -143,7 +165,8 @@ class BlackjackView(discord.ui.View):
             else:
                 reward = game.bet * 2
                 result_text = f"### {PNC_EMOJI_STR}`{game.bet:,}` **WIN**"
-            update_user_balance(user_id, reward)
+            await async_db.update_user_balance(user_id, reward)
+            log_transaction(user_id, "blackjack", game.bet, reward)
             color = discord.Color.from_str("#26ffd4")
 
             await send_casino_log(
@@ -152,51 +175,87 @@ class BlackjackView(discord.ui.View):
                 color=discord.Color.from_str("#26ffd4"),
             )
         elif result == "引き分け":
-            update_user_balance(user_id, game.bet)
+            await async_db.update_user_balance(user_id, game.bet)
+            log_transaction(user_id, "blackjack", game.bet, game.bet, result=GAME_DRAW)
             result_text = f"### {PNC_EMOJI_STR}`{game.bet:,}` **DRAW**"
             color = discord.Color.from_str("#aaaaaa")  # ← これを追加
         else:
+            log_transaction(user_id, "blackjack", game.bet, 0)
             result_text = f"### {PNC_EMOJI_STR}`{game.bet:,}` **LOSE**"
             color = discord.Color.from_str("#ff3d74") 
 
-        # ✅ ユーザーのアバター画像を取得
-        async with aiohttp.ClientSession() as session:
-            async with session.get(interaction.user.display_avatar.url) as resp:
-                avatar_bytes = BytesIO(await resp.read())
+        user_icon = await avatar_service.get_avatar(interaction.user, blackjack_assets.ICON_SIZE[0])
 
         # ✅ アバター情報付きで画像をレンダリング
-        img = game.render_image(
+        buf = await render_service.render_encoded(
+            "blackjack",
+            game.render_image,
             reveal_dealer=True,
             user_displayname=interaction.user.display_name,
-            user_avatar_data=avatar_bytes
+            user_icon=user_icon
         )
-        buf = BytesIO()
-        img.save(buf, format='PNG')
-        buf.seek(0)
-        file = discord.File(buf, filename="blackjack.png")
+        file = discord.File(buf, filename=IMAGE_FILENAME)
         embed = create_embed("結果", result_text, color=color)
-        embed.set_image(url="attachment://blackjack.png")
+        embed.set_image(url=f"attachment://{IMAGE_FILENAME}")
         embed.add_field(name="🔐 Provably Fair", value=game.get_pf_embed_field(), inline=False)
         embed.set_footer(text="検証方法：HMAC-SHA256(client:nonce:cursor)でカード順を再計算可能")
         embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1219916908485283880/1386317663231414272/ChatGPT_Image_2025622_21_11_08.png?ex=6859446f&is=6857f2ef&hm=19507da3f6ae2ea49377b1112e687a6690cd37bb229cc4ebcd5a1fef2c5965e6&")
         await interaction.response.edit_message(embed=embed, attachments=[file], view=None)
 
 class BlackjackGame:
-    def __init__(self, bet, client_seed=None, server_seed=None, nonce=0):
+    def __init__(self, bet, client_seed=None, server_seed=None, nonce=0, server_seed_hash=None, reveal_seed=True):
         self.bet = bet
         self.player_hand = []
         self.dealer_hand = []
         self.finished = False
         self.cursor = 0
-        self.pf = ProvablyFairParams(client_seed, server_seed, nonce)
-        dealer_files = [f for f in os.listdir("assets/bj/dealer") if f.endswith(".png")]
-        dealer_file = random.choice(dealer_files)
+        self.dealt = []
+        self.pf = ProvablyFairParams(client_seed, server_seed, nonce, server_seed_hash, reveal_seed)
+        dealer_file = random.choice(blackjack_assets.dealer_files)
         self.dealer_file = dealer_file
         self.dealer_name = os.path.splitext(dealer_file)[0]
+        self.message_id = None
+        self._reset_layer()
+
+    def to_snapshot(self) -> dict:
+        """セッション保存用のスナップショットを作成"""
+        return {
+            "bet": self.bet,
+            "player_hand": [list(card) for card in self.player_hand],
+            "dealer_hand": [list(card) for card in self.dealer_hand],
+            "finished": self.finished,
+            "cursor": self.cursor,
+            "dealt": self.dealt,
+            "client_seed": self.pf.client_seed,
+            "server_seed": self.pf.server_seed,
+            "nonce": self.pf.nonce,
+            "reveal_seed": self.pf.reveal,
+            "dealer_file": self.dealer_file,
+            "message_id": self.message_id,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "BlackjackGame":
+        """スナップショットからゲームを復元"""
+        game = cls.__new__(cls)
+        game.bet = data["bet"]
+        game.player_hand = [tuple(card) for card in data["player_hand"]]
+        game.dealer_hand = [tuple(card) for card in data["dealer_hand"]]
+        game.finished = data["finished"]
+        game.cursor = data["cursor"]
+        game.pf = ProvablyFairParams(data["client_seed"], data["server_seed"], data["nonce"], reveal=data.get("reveal_seed", True))
+        # dealt を持たない旧スナップショットはカーソルまでのカード列から補う
+        game.dealt = data.get("dealt") or [game.pf.get_card(i)[0] for i in range(game.cursor)]
+        game.dealer_file = data["dealer_file"]
+        game.dealer_name = os.path.splitext(data["dealer_file"])[0]
+        game.message_id = data["message_id"]
+        game._reset_layer()
+        return game
 
     def draw_card(self):
         card = self.pf.get_card(self.cursor)
         self.cursor += 1
+        self.dealt.append(card[0])
         return card
 
     def deal_initial(self):
@@ -238,81 +297,85 @@ class BlackjackGame:
 
     def get_pf_embed_field(self):
         return self.pf.get_pf_embed_field()
-    
-    def render_image(self, reveal_dealer=False, user_displayname="", user_avatar_data: BytesIO = None):
-        table = Image.open(TABLE_IMAGE_PATH).convert("RGBA")
-        draw = ImageDraw.Draw(table)
-        font = ImageFont.truetype(FONT_PATH, 40)
-
-        card_width, card_height = 140, 200
-        spacing = 150
-        x_offset = -40
-
-        def paste_cards(cards, y):
-            start_x = 320
-
-            for i, (code, _) in enumerate(cards):
-                card_img = Image.open(f"{CARD_PATH}{code}.png").convert("RGBA").resize((card_width, card_height))
-                shadow = Image.new("RGBA", card_img.size, (0, 0, 0, 100))
-                shadow_offset = (6, 6)
-                x = start_x + i * spacing
-                table.paste(shadow, (x + shadow_offset[0], y + shadow_offset[1]), shadow)
-                table.paste(card_img, (x, y), card_img)
-            return calculate_hand(cards)
 
-
-        player_total = paste_cards(self.player_hand, y=400)
+    def pf_record(self, user_id):
+        """検証用のPF記録を作成（配ったカードを配った順に記録）"""
+        return build_pf_record(
+            "blackjack", user_id, self.pf.server_seed, self.pf.client_seed, self.pf.nonce,
+            outcome=list(self.dealt),
+            params={"count": len(self.dealt)},
+            server_seed_hash=self.pf.server_seed_hash
+        )
+    
+    # ---------- 描画 ----------
+    def _reset_layer(self):
+        """描画レイヤーを破棄（スナップショットには含めない）"""
+        self._layer = None
+        self._layer_player_cards = 0
+        self._layer_user_icon = None
+        self._layer_lock = threading.Lock()
+
+    def _build_layer(self, user_icon):
+        """テーブル・アイコン・名前・ディーラーの表向きカードを描いたレイヤーを作成"""
+        assets = blackjack_assets
+        layer = assets.new_table()
+        draw = ImageDraw.Draw(layer)
+
+        dealer_icon = assets.dealer_icon(self.dealer_file)
+        layer.paste(dealer_icon, (ICON_X, DEALER_ICON_Y), dealer_icon)
+        draw.text((ICON_X, DEALER_ICON_Y + 130), self.dealer_name, font=assets.icon_font, fill=TEXT_COLOR)
+
+        layer.paste(user_icon, (ICON_X, PLAYER_ICON_Y), user_icon)
+        draw.text((ICON_X + 3, PLAYER_ICON_Y + 130), "あなた" or "You", font=assets.icon_font, fill=TEXT_COLOR)
+
+        paste_card(layer, assets.card(self.dealer_hand[0][0]), 0, DEALER_CARD_Y)
+
+        self._layer = layer
+        self._layer_player_cards = 0
+        self._layer_user_icon = user_icon
+
+    def render_image(self, reveal_dealer=False, user_displayname="", user_icon: Image.Image = None):
+        """
+        テーブル画像を描画
+
+        ゲームごとにレイヤー（テーブル・アイコン・ディーラーの表向きカード・プレイヤーのカード）を保持し、
+        前回の描画以降に引いたカードだけを貼り足します。伏せカード・公開したディーラーのカード・点数は毎回コピーに描きます。
+        """
+        assets = blackjack_assets
+        if user_icon is None:
+            user_icon = avatar_service.placeholder(assets.ICON_SIZE[0])
+
+        with self._layer_lock:
+            if (
+                self._layer is None
+                or self._layer_user_icon is not user_icon
+                or self._layer_player_cards > len(self.player_hand)
+            ):
+                self._build_layer(user_icon)
+            for i in range(self._layer_player_cards, len(self.player_hand)):
+                paste_card(self._layer, assets.card(self.player_hand[i][0]), i, PLAYER_CARD_Y)
+            self._layer_player_cards = len(self.player_hand)
+            table = self._layer.copy()
 
         if reveal_dealer:
-            dealer_total = paste_cards(self.dealer_hand, y=120)
+            for i in range(1, len(self.dealer_hand)):
+                paste_card(table, assets.card(self.dealer_hand[i][0]), i, DEALER_CARD_Y)
+            dealer_total = calculate_hand(self.dealer_hand)
         else:
+            paste_card(table, assets.card_back, 1, DEALER_CARD_Y)
             dealer_total = calculate_hand([self.dealer_hand[0]])
-            first_card = Image.open(f"{CARD_PATH}{self.dealer_hand[0][0]}.png").convert("RGBA").resize((card_width, card_height))
-            back_card = Image.open(f"{CARD_PATH}back.png").convert("RGBA").resize((card_width, card_height))
-            
-            start_x = 320  
-            shadow = Image.new("RGBA", first_card.size, (0, 0, 0, 100))
-            table.paste(shadow, (start_x + 6, 120 + 6), shadow)
-            table.paste(first_card, (start_x, 120), first_card)
-            table.paste(shadow, (start_x + spacing + 6, 120 + 6), shadow)
-            table.paste(back_card, (start_x + spacing, 120), back_card)
-
-        text_color = (255, 255, 255)
-        shadow_color = (0, 0, 0)
-        px, py = table.width - 250, 420
-        dx, dy = table.width - 250, 140
-
-        def draw_score(draw, x, y, label, value):
-            text = f"{label}: {value}"
-            draw.text((x + 2, y + 2), text, font=font, fill=shadow_color)
-            draw.text((x, y), text, font=font, fill=text_color)
-
-        draw_score(draw, dx, dy, "Dealer", dealer_total)
-        draw_score(draw, px, py, "You", player_total)
+        player_total = calculate_hand(self.player_hand)
 
-        icon_font = ImageFont.truetype(FONT_PATH, 36)
-        dealer_icon = Image.open(f"assets/bj/dealer/{self.dealer_file}").convert("RGBA").resize((120, 120))
-        dealer_name = self.dealer_name
-
-        user_icon = Image.open(user_avatar_data).convert("RGBA").resize((120, 120))
-
-        def crop_circle(im):
-            mask = Image.new("L", im.size, 0)
-            draw = ImageDraw.Draw(mask)
-            draw.ellipse((0, 0, im.size[0], im.size[1]), fill=255)
-            result = Image.new("RGBA", im.size)
-            result.paste(im, (0, 0), mask)
-            return result
-
-        icon_x = 130
-        dealer_icon_y = 150
-        player_icon_y = 420
+        draw = ImageDraw.Draw(table)
+        font = assets.score_font
 
-        table.paste(crop_circle(dealer_icon), (icon_x, dealer_icon_y), crop_circle(dealer_icon))
-        draw.text((icon_x, dealer_icon_y + 130), dealer_name, font=icon_font, fill=text_color)
+        def draw_score(x, y, label, value):
+            text = f"{label}: {value}"
+            draw.text((x + 2, y + 2), text, font=font, fill=SHADOW_COLOR)
+            draw.text((x, y), text, font=font, fill=TEXT_COLOR)
 
-        table.paste(crop_circle(user_icon), (icon_x, player_icon_y), crop_circle(user_icon))
-        draw.text((icon_x + 3, player_icon_y + 130), "あなた" or "You", font=icon_font, fill=text_color)
+        draw_score(table.width - 250, 140, "Dealer", dealer_total)
+        draw_score(table.width - 250, 420, "You", player_total)
 
         return table
     
@@ -322,4 +385,32 @@ class BlackjackGame:
             f"ServerSeedHash: `{self.pf.server_seed_hash}`\n"
             f"ClientSeed: `{self.pf.client_seed}`\n"
             f"Nonce: `{self.pf.nonce}`"
-        )
\ No newline at end of file
+        )
+
+
+# 進行中のゲーム（user_id → BlackjackGame）
+blackjack_games = create_session_store("blackjack", encode=BlackjackGame.to_snapshot, decode=BlackjackGame.from_snapshot)
+
+
+def restore_blackjack_views(bot) -> int:
+    """
+    復元したゲームのボタンをメッセージIDに紐付けて再登録
+
+    Returns:
+        int: 再登録したゲーム数
+    """
+    count = 0
+    for user_id, game in blackjack_games.items():
+        if game.message_id:
+            bot.add_view(BlackjackView(user_id), message_id=game.message_id)
+            count += 1
+    return count
+
+
+session_registry.register(GameSessionSpec(
+    name="blackjack",
+    store=blackjack_games,
+    bet_of=lambda game: game.bet,
+    restore_views=restore_blackjack_views,
+    pf_record_of=lambda user_id, game: game.pf_record(user_id),
+))
@@ -3,27 +3,38 @@ from discord import File
 import random
 import asyncio
 
-from database.db import update_user_balance
+from database import async_db
+from database.session_store import create_session_store
 from utils.emojis import DICE_EMOJI, PNC_EMOJI_STR, WIN_EMOJI   
 from utils.embed import create_embed
-from utils.logs import send_casino_log
+from utils.logs import log_transaction, send_casino_log
 from utils.color import BASE_COLOR_CODE
+from utils.session_registry import GameSessionSpec, session_registry
+from utils.rate_limit import guard_interaction
 from config import DICE_FOLDER, CURRENCY_NAME
 
-ongoing_games = {}
+# 進行中のゲーム（user_id → {"bet", "point", "message_id"}）
+ongoing_games = create_session_store("dice")
+
 class ContinueButton(discord.ui.View):
     def __init__(self, user_id, bet_amount, point):
         super().__init__(timeout=None)
         self.user_id = user_id
         self.bet_amount = bet_amount
         self.point = point
+        session_registry.track_view("dice", user_id, self)
 
-    @discord.ui.button(emoji=DICE_EMOJI, style=discord.ButtonStyle.success)
+    @discord.ui.button(emoji=DICE_EMOJI, style=discord.ButtonStyle.success, custom_id="dice:continue")
+    @guard_interaction
     async def continue_game(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.user_id:
             await interaction.response.send_message("あなたのゲームではありません。", ephemeral=True)
             return
 
+        if self.user_id not in ongoing_games:
+            await interaction.response.send_message("このゲームはすでに終了しています。", ephemeral=True)
+            return
+
         def roll():
             return random.randint(1, 6), random.randint(1, 6)
 
@@ -55,7 +66,8 @@ class ContinueButton(discord.ui.View):
 
         if total == self.point:
             winnings = self.bet_amount * 2
-            update_user_balance(self.user_id, winnings)
+            await async_db.update_user_balance(self.user_id, winnings)
+            log_transaction(self.user_id, "dice", self.bet_amount, winnings)
             result_text = f"\n\n### {PNC_EMOJI_STR}`{winnings}` **WIN**"
 
             await send_casino_log(
@@ -70,6 +82,7 @@ class ContinueButton(discord.ui.View):
             ongoing_games.pop(self.user_id, None)
 
         elif total == 7:
+            log_transaction(self.user_id, "dice", self.bet_amount, 0)
             embed_color = discord.Color.red()
             result_text = f"\n\n7が出て敗北しました。\n### {PNC_EMOJI_STR}`{self.bet_amount}` **LOSE**"
             ongoing_games.pop(self.user_id, None)
@@ -77,6 +90,7 @@ class ContinueButton(discord.ui.View):
         else:
             result_text = "\n\n### まだ勝負はついていません。\nもう一度ボタンを押して続けてください。"
             next_view = ContinueButton(self.user_id, self.bet_amount, self.point)
+            ongoing_games.save(self.user_id)
 
         final_embed = create_embed(f"{CURRENCY_NAME}ダイス 継続結果", description + result_text, embed_color)
         final_embed.set_author(
@@ -84,4 +98,27 @@ class ContinueButton(discord.ui.View):
             icon_url=interaction.user.display_avatar.url
         )
         final_embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1219916908485283880/1389815902278647818/ChatGPT_Image_202572_12_51_52.png")
-        await interaction.edit_original_response(embed=final_embed, attachments=result_files, view=next_view)
\ No newline at end of file
+        await interaction.edit_original_response(embed=final_embed, attachments=result_files, view=next_view)
+
+
+def restore_dice_views(bot) -> int:
+    """
+    復元したゲームの継続ボタンをメッセージIDに紐付けて再登録
+
+    Returns:
+        int: 再登録したゲーム数
+    """
+    count = 0
+    for user_id, state in ongoing_games.items():
+        if state.get("message_id"):
+            bot.add_view(ContinueButton(user_id, state["bet"], state["point"]), message_id=state["message_id"])
+            count += 1
+    return count
+
+
+session_registry.register(GameSessionSpec(
+    name="dice",
+    store=ongoing_games,
+    bet_of=lambda state: state["bet"],
+    restore_views=restore_dice_views,
+))
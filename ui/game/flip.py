@@ -1,9 +1,11 @@
 import discord
 import random
 
-from database.db import update_user_balance
+from database import async_db
 from utils.emojis import PNC_EMOJI_STR, WIN_EMOJI
-from utils.logs import send_casino_log
+from utils.logs import log_transaction, send_casino_log
+from utils.embed_factory import EmbedFactory
+from utils.rate_limit import guard_interaction
 from config import FRONT_IMG, BACK_IMG, THUMBNAIL_URL, CURRENCY_NAME
 
 class CoinFlipView(discord.ui.View):
@@ -11,6 +13,7 @@ class CoinFlipView(discord.ui.View):
         super().__init__(timeout=None)
         self.user = user
         self.bet = bet
+        self.resolved = False
         self.add_item(CoinFlipButton("表", user, bet))
         self.add_item(CoinFlipButton("裏", user, bet))
 
@@ -21,6 +24,7 @@ class CoinFlipButton(discord.ui.Button):
         self.user = user
         self.bet = bet
 
+    @guard_interaction
     async def callback(self, interaction: discord.Interaction):
         if interaction.user.id != self.user.id:
             embed = discord.Embed(
@@ -30,6 +34,17 @@ class CoinFlipButton(discord.ui.Button):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
+        if self.view.resolved:
+            return
+
+        # 残高確認と引き落としを1回の原子的な更新で行う
+        debit = await async_db.try_debit(self.user.id, self.bet)
+        if not debit.ok:
+            embed = EmbedFactory.insufficient_balance(balance=debit.balance or 0)
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        self.view.resolved = True
+
         win = random.random() < 0.5
         outcome = self.label if win else ("表" if self.label == "裏" else "裏")
         win = (outcome == self.label)
@@ -48,7 +63,7 @@ class CoinFlipButton(discord.ui.Button):
         embed.set_image(url=FRONT_IMG if outcome == "表" else BACK_IMG)
 
         if win:
-            update_user_balance(self.user.id, self.bet)
+            await async_db.update_user_balance(self.user.id, self.bet * 2)
             try:
                 await send_casino_log(
                     interaction,
@@ -60,8 +75,8 @@ class CoinFlipButton(discord.ui.Button):
                 )
             except Exception as e:
                 print(f"[ERROR] send_casino_log failed: {e}")
-        else:
-            update_user_balance(self.user.id, -self.bet)
+
+        log_transaction(self.user.id, "flip", self.bet, self.bet * 2 if win else 0)
 
         self.view.clear_items()
         await interaction.response.edit_message(embed=embed, view=self.view)
\ No newline at end of file
@@ -1,16 +1,20 @@
 import discord
 from discord.ui import View, Button
 import re
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import os
 import random
+import threading
 
 
 from database.db import get_user_balance
 from utils.embed import create_embed
+from utils.rate_limit import guard_interaction
 from utils.embed_factory import EmbedFactory
 from utils.emojis import PNC_EMOJI_STR
 from utils.color import BASE_COLOR_CODE
+from ui.game.assets import hitandblow_assets
+from utils.render import render_service
 from config import HITANDBLOW_CATEGORY_ID
 
 class HitAndBlowAcceptButton(discord.ui.View):
@@ -22,6 +26,7 @@ class HitAndBlowAcceptButton(discord.ui.View):
         self.accepted = False
 
     @discord.ui.button(label="承諾する", style=discord.ButtonStyle.success)
+    @guard_interaction
     async def accept_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.opponent.id:
             await interaction.response.send_message("このボタンはあなた用ではありません。", ephemeral=True)
@@ -209,71 +214,92 @@ class GameSession:
         return hit, blow
     
 DIGIT_POSITIONS = [(55, 145), (145, 145), (235, 145)]  # 適宜微調整
+AVATAR_SIZE = 60
+
+# 盤面のレイアウト
+BOARD_DIGIT_POSITIONS = [(36, 95), (107, 95), (176, 95)]
+USER_ICON_POS = (10, 19)
+OPPONENT_ICON_POS = (455, 19)
+USER_NAME_POS = (80, 35)
+OPPONENT_NAME_POS = (350, 35)
+GUESS_FONT_POS_SELF = [(70, 195 + 25 * i) for i in range(6)]
+GUESS_FONT_POS_OPP = [(310, 195 + 25 * i) for i in range(6)]
+
+
+class HitAndBlowBoard:
+    """
+    プレイヤーごとの盤面キャンバス（対戦中は使い回す）
+
+    下地・自分の数字・アイコン・名前は作成時に一度だけ描き、
+    推理が増えたときはその行だけを描き足します。
+    """
+
+    def __init__(self, digits: str, user_icon: Image.Image, user_name: str, opponent_icon: Image.Image, opponent_name: str):
+        assets = hitandblow_assets
+        self.canvas = assets.new_board()
+        self.my_rows = 0
+        self.opponent_rows = 0
+        self._lock = threading.Lock()
+
+        draw = ImageDraw.Draw(self.canvas)
+        for i, d in enumerate(digits):
+            digit_img = assets.digit(d)
+            self.canvas.paste(digit_img, BOARD_DIGIT_POSITIONS[i], digit_img)
+
+        self.canvas.paste(user_icon, USER_ICON_POS, user_icon)
+        self.canvas.paste(opponent_icon, OPPONENT_ICON_POS, opponent_icon)
+
+        draw.text(USER_NAME_POS, user_name, fill="white", font=assets.font)
+        draw.text(OPPONENT_NAME_POS, opponent_name, fill="white", font=assets.font)
+
+    def add_guess(self, guess: str, mine: bool = True) -> None:
+        """推理を1行描き足す（各列6行まで）"""
+        with self._lock:
+            if mine:
+                row, positions = self.my_rows, GUESS_FONT_POS_SELF
+                self.my_rows += 1
+            else:
+                row, positions = self.opponent_rows, GUESS_FONT_POS_OPP
+                self.opponent_rows += 1
+            if row < len(positions):
+                ImageDraw.Draw(self.canvas).text(positions[row], guess, fill="white", font=hitandblow_assets.font)
+
+    def sync(self, my_guesses: list[str], opponent_guesses: list[str]) -> None:
+        """まだ描いていない推理だけを描き足す"""
+        for guess in my_guesses[self.my_rows:]:
+            self.add_guess(guess, mine=True)
+        for guess in opponent_guesses[self.opponent_rows:]:
+            self.add_guess(guess, mine=False)
+
+    def render(self) -> Image.Image:
+        """送信用に現在の盤面のコピーを返す"""
+        with self._lock:
+            return self.canvas.copy()
+
 
 def generate_board_image(
     digits: str,
     user_id: int,
-    user_icon_path: str,
+    user_icon: Image.Image,
     user_name: str,
-    opponent_icon_path: str,
+    opponent_icon: Image.Image,
     opponent_name: str,
     my_guesses: list[str] = [],
     opponent_guesses: list[str] = []
 ) -> str:
-    from PIL import Image, ImageDraw, ImageFont
-    base_path = "assets/hab/base.png"
-    num_path = "assets/hab/digits/"
+    """盤面を作成してファイルに保存し、そのパスを返す（対戦中は HitAndBlowBoard を使い回す）"""
     output_path = f"./tmp/board_{user_id}.png"
     os.makedirs("./tmp", exist_ok=True)
 
-    ICON_SIZE = (60, 60)
-    DIGIT_POSITIONS = [(36, 95), (107, 95), (176, 95)]
-    USER_ICON_POS = (10, 19)
-    OPPONENT_ICON_POS = (455, 19)
-    USER_NAME_POS = (80, 35)
-    OPPONENT_NAME_POS = (350, 35)
-    GUESS_FONT_POS_SELF = [(70, 195 + 25 * i) for i in range(6)]
-    GUESS_FONT_POS_OPP = [(310, 195 + 25 * i) for i in range(6)]
-
-    base_img = Image.open(base_path).convert("RGBA")
-    draw = ImageDraw.Draw(base_img)
-    try:
-        font = ImageFont.truetype("assets/font/NotoSansJP-VariableFont_wght.ttf", 16)
-    except:
-        font = ImageFont.load_default()
-
-    # 中央数字
-    for i, d in enumerate(digits):
-        digit_img = Image.open(os.path.join(num_path, f"{d}.png")).convert("RGBA").resize((50, 70))
-        base_img.paste(digit_img, DIGIT_POSITIONS[i], digit_img)
-
-    # 丸アイコン
-    def paste_circle_icon(img_path, pos):
-        icon = Image.open(img_path).convert("RGBA").resize(ICON_SIZE)
-        mask = Image.new("L", ICON_SIZE, 0)
-        ImageDraw.Draw(mask).ellipse((0, 0) + ICON_SIZE, fill=255)
-        base_img.paste(icon, pos, mask)
-
-    paste_circle_icon(user_icon_path, USER_ICON_POS)
-    paste_circle_icon(opponent_icon_path, OPPONENT_ICON_POS)
-
-    # 名前
-    draw.text(USER_NAME_POS, user_name, fill="white", font=font)
-    draw.text(OPPONENT_NAME_POS, opponent_name, fill="white", font=font)
-
-    # 推理履歴
-    for i, guess in enumerate(my_guesses[:6]):
-        draw.text(GUESS_FONT_POS_SELF[i], guess, fill="white", font=font)
-    for i, guess in enumerate(opponent_guesses[:6]):
-        draw.text(GUESS_FONT_POS_OPP[i], guess, fill="white", font=font)
-
-    base_img.save(output_path)
+    board = HitAndBlowBoard(digits, user_icon, user_name, opponent_icon, opponent_name)
+    board.sync(my_guesses, opponent_guesses)
+    board.canvas.save(output_path)
     return output_path
 
 async def send_initial_board(channel: discord.TextChannel, user: discord.User, digits: str):
     from discord import File
 
-    image_path = generate_board_image(digits, user.id)
+    image_path = await render_service.run("hitandblow", generate_board_image, digits, user.id)
     file = File(image_path, filename="board.png")
 
     embed = discord.Embed(
@@ -284,15 +310,3 @@ async def send_initial_board(channel: discord.TextChannel, user: discord.User, d
     embed.set_image(url="attachment://board.png")
 
     await channel.send(embed=embed, file=file)
-
-import aiohttp
-
-async def download_avatar(avatar_url: str, user_id: int) -> str:
-    os.makedirs("./tmp", exist_ok=True)
-    path = f"./tmp/avatar_{user_id}.png"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(avatar_url) as resp:
-            if resp.status == 200:
-                with open(path, "wb") as f:
-                    f.write(await resp.read())
-    return path
\ No newline at end of file
@@ -1,14 +1,22 @@
 import asyncio
-import hashlib
 import secrets
+from types import SimpleNamespace
+
 import discord
 
-from database.db import get_user_balance, update_user_balance, save_pf_params
+from database import async_db
+from database.pf_records import build_pf_record
+from database.result_writer import game_result_writer
+from database.session_store import create_session_store
 from utils.stake_mines import get_stake_multiplier
 from utils.logs import send_casino_log, log_transaction
 from utils.emojis import MINE_EMOJI, DIAMOND_EMOJI, MINE_EMOJI_TEXT, DIAMOND_EMOJI_TEXT, PNC_EMOJI_STR, WIN_EMOJI
-from utils.sys import generate_server_seed, hash_server_seed, get_hmac_sha256
+from utils.seed_pool import SeedCommitment, seed_pool
+from ui.pf import HIDDEN_SEED_TEXT
+from utils.pf_engine import derive_mine_positions, game_hmac_hex
 from utils.color import BASE_COLOR_CODE
+from utils.session_registry import GameSessionSpec, session_registry
+from utils.rate_limit import guard_interaction
 from config import CURRENCY_NAME
 
 GRID_SIZE = 5
@@ -86,7 +94,7 @@ async def end_mines_game(interaction, game, result, payout, edit_cashout: bool =
     # 🔐 PF情報
     embed.add_field(name="🔐Provably Fair", value=(
         f"Hash: `{game.server_seed_hash}`\n"
-        f"Seed: `{game.server_seed}`\n"
+        f"Seed: `{game.server_seed if game.reveal_seed else HIDDEN_SEED_TEXT}`\n"
         f"Client: `{game.client_seed}`\n"
         f"Nonce: `{game.nonce}`"
     ), inline=False)
@@ -97,10 +105,13 @@ async def end_mines_game(interaction, game, result, payout, edit_cashout: bool =
 
     embed.set_footer(text="検証方法：SHA‑256(Hash確認)、HMAC＋ derive_mine_positions()で爆弾再現可")
 
-    try:
-        save_pf_params(game.user_id, game.client_seed, game.server_seed, game.nonce + 1)
-    except Exception as e:
-        print(f"[ERROR] failed to save PF params: {e}")
+    # rotate では開始時にnonceを進めているため保存不要
+    if game.reveal_seed:
+        try:
+            await async_db.save_pf_params(game.user_id, game.client_seed, game.server_seed, game.nonce + 1)
+        except Exception as e:
+            print(f"[ERROR] failed to save PF params: {e}")
+    game_result_writer.record_pf(game.pf_record())
 
 
     if reveal_all:
@@ -150,7 +161,7 @@ async def end_mines_game(interaction, game, result, payout, edit_cashout: bool =
             print(f"[ERROR] Failed to disable buttons after cashout: {e}")
 
 
-    if edit_cashout and result == "ハズレを引いた！" and hasattr(game, "cashout_message_id"):
+    if edit_cashout and result == "ハズレを引いた！" and game.cashout_message_id:
         cashout_embed = discord.Embed(description="ゲームが終了しました。", color=BASE_COLOR_CODE) 
         cashout_view = discord.ui.View()
         cashout_view.add_item(CashoutButton(game.user_id, game, disabled=True))
@@ -163,22 +174,22 @@ async def end_mines_game(interaction, game, result, payout, edit_cashout: bool =
         except Exception as e:
             print(f"[ERROR] Failed to edit cashout message: {e}")
 
-def derive_mine_positions(hmac_hex: str, grid_size: int, mine_count: int):
-    positions = list(range(grid_size * grid_size))
-    selected = []
-    i = 0
-    pool = hmac_hex
-    while len(selected) < mine_count:
-        if i * 4 + 4 > len(pool):
-            pool += hashlib.sha256(pool.encode()).hexdigest()
-        seg = pool[i*4:(i+1)*4]
-        idx = int(seg, 16) % len(positions)
-        selected.append(positions.pop(idx))
-        i += 1
-    return {(pos // grid_size, pos % grid_size) for pos in selected}
-
 class MinesGame:
-    def __init__(self, user: discord.User, bet: int, mine_count: int, client_seed: str = None, nonce: int = 0):
+    SNAPSHOT_FIELDS = (
+        "user_id", "bet", "mine_count", "client_seed", "nonce", "server_seed", "server_seed_hash", "hmac",
+        "finished", "consecutive_wins", "payout_multiplier", "current_reward", "cashout_message_id", "message_id",
+    )
+
+    def __init__(
+        self,
+        user: discord.User,
+        bet: int,
+        mine_count: int,
+        client_seed: str = None,
+        nonce: int = 0,
+        seed: SeedCommitment = None,
+        reveal_seed: bool = True
+    ):
         self.user = user
         self.user_id = user.id
         self.bet = bet
@@ -186,9 +197,11 @@ class MinesGame:
         self.client_seed = client_seed or secrets.token_hex(8)
         self.nonce = nonce
 
-        self.server_seed = generate_server_seed()
-        self.server_seed_hash = hash_server_seed(self.server_seed)
-        self.hmac = get_hmac_sha256(self.server_seed, self.client_seed, self.nonce)
+        seed = seed or seed_pool.pop()
+        self.server_seed = seed.server_seed
+        self.server_seed_hash = seed.server_seed_hash
+        self.reveal_seed = reveal_seed
+        self.hmac = game_hmac_hex(self.server_seed, self.client_seed, self.nonce)
         self.mines = derive_mine_positions(self.hmac, GRID_SIZE, mine_count)
 
         self.revealed = set()
@@ -236,11 +249,50 @@ class MinesGame:
             "mine_positions": sorted(self.mines)
         }
 
+    def pf_record(self) -> dict:
+        """検証用のPF記録を作成"""
+        return build_pf_record(
+            "mines", self.user_id, self.server_seed, self.client_seed, self.nonce,
+            outcome=[list(pos) for pos in sorted(self.mines)],
+            params={"grid_size": GRID_SIZE, "mine_count": self.mine_count},
+            server_seed_hash=self.server_seed_hash
+        )
+
+    def to_snapshot(self) -> dict:
+        """セッション保存用のスナップショットを作成"""
+        data = {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS}
+        data["revealed"] = [list(pos) for pos in sorted(self.revealed)]
+        data["reveal_seed"] = self.reveal_seed
+        data["user_name"] = self.user.name
+        data["user_avatar_url"] = self.user.display_avatar.url
+        return data
+
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "MinesGame":
+        """スナップショットからゲームを復元（地雷位置はHMACから再計算）"""
+        game = cls.__new__(cls)
+        for field in cls.SNAPSHOT_FIELDS:
+            setattr(game, field, data[field])
+        game.user = SimpleNamespace(
+            id=data["user_id"],
+            name=data["user_name"],
+            display_avatar=SimpleNamespace(url=data["user_avatar_url"])
+        )
+        game.mines = derive_mine_positions(game.hmac, GRID_SIZE, game.mine_count)
+        game.revealed = {tuple(pos) for pos in data["revealed"]}
+        game.reveal_seed = data.get("reveal_seed", True)
+        return game
+
+
+# 進行中のゲーム（user_id → MinesGame）
+games = create_session_store("mines", encode=MinesGame.to_snapshot, decode=MinesGame.from_snapshot)
+
 class MinesView(discord.ui.View):
     def __init__(self, user_id, game):
         super().__init__(timeout=None) 
         self.user_id = user_id
         self.game = game
+        session_registry.track_view("mines", user_id, self)
 
         for row in range(GRID_SIZE):
             for col in range(GRID_SIZE):
@@ -248,13 +300,14 @@ class MinesView(discord.ui.View):
 
 class MinesButton(discord.ui.Button):
     def __init__(self, user_id, game, x, y):
-        super().__init__(style=discord.ButtonStyle.secondary, label="‎", row=x)
+        super().__init__(style=discord.ButtonStyle.secondary, label="‎", row=x, custom_id=f"mines:{x}:{y}")
         self.user_id = user_id
         self.game = game
         self.x = x
         self.y = y
         
 
+    @guard_interaction
     async def callback(self, interaction: discord.Interaction):
         if interaction.user.id != self.user_id:
             await interaction.response.send_message("❌ **このゲームの参加者ではありません！**", ephemeral=True)
@@ -270,8 +323,10 @@ class MinesButton(discord.ui.Button):
             payout = 0
             
             log_transaction(self.user_id, "mines", self.game.bet, payout)
+            games.pop(self.user_id, None)
             await end_mines_game(interaction, self.game, "ハズレを引いた！", payout)
         elif result == "win":
+            games.save(self.user_id)
             await update_mines_board(interaction, self.game)
         else:
             await interaction.response.send_message("❌ **無効な操作です！**", ephemeral=True)
@@ -282,6 +337,7 @@ class CashoutButton(discord.ui.Button):
         self.user_id = user_id
         self.game = game
 
+    @guard_interaction
     async def callback(self, interaction: discord.Interaction):
         if interaction.user.id != self.user_id:
             await interaction.response.send_message("**この出金ボタンはあなたのものではありません！**", ephemeral=True)
@@ -292,14 +348,14 @@ class CashoutButton(discord.ui.Button):
             return
 
         payout = self.game.cashout()
-        update_user_balance(self.user_id, payout)
+        games.pop(self.user_id, None)
+        new_balance = await async_db.update_user_balance(self.user_id, payout)
         log_transaction(self.user_id, "mines", self.game.bet, payout)
         await send_casino_log(
             interaction, winorlose="WIN", emoji=WIN_EMOJI, price=payout,
             description="",
             color=discord.Color.from_str("#26ffd4"),
         )
-        new_balance = get_user_balance(self.user_id)
 
         # ✅ 非同期でまとめて実行
         async def send_ephemeral():
@@ -327,4 +383,45 @@ class CashoutButton(discord.ui.Button):
             send_ephemeral(),
             edit_game_embed(),
             disable_cashout_button()
-        )
\ No newline at end of file
+        )
+
+
+def create_cashout_view(user_id, game, disabled=False) -> discord.ui.View:
+    """出金ボタンのViewを作成（セッションレジストリに紐付け）"""
+    view = discord.ui.View(timeout=None)
+    view.add_item(CashoutButton(user_id, game, disabled=disabled))
+    session_registry.track_view("mines", user_id, view)
+    return view
+
+
+def restore_mines_views(bot) -> int:
+    """
+    復元したゲームのボタンをメッセージIDに紐付けて再登録
+
+    Returns:
+        int: 再登録したゲーム数
+    """
+    count = 0
+    for user_id, game in games.items():
+        if game.message_id:
+            bot.add_view(MinesView(user_id, game), message_id=game.message_id)
+        if game.cashout_message_id:
+            bot.add_view(create_cashout_view(user_id, game), message_id=game.cashout_message_id)
+        count += 1
+    return count
+
+
+def _finish_expired_game(game: MinesGame) -> None:
+    game.finished = True
+
+
+session_registry.register(GameSessionSpec(
+    name="mines",
+    store=games,
+    bet_of=lambda game: game.bet,
+    cashout_of=lambda game: game.current_reward if game.consecutive_wins else game.bet,
+    restore_views=restore_mines_views,
+    on_expire=_finish_expired_game,
+    pf_record_of=lambda user_id, game: game.pf_record(),
+    revealed_of=lambda game: bool(game.revealed),
+))
@@ -0,0 +1,29 @@
+"""
+ゲームセッション復元モジュール
+再起動前に進行中だったゲームをスナップショットから復元し、ボタンを再び操作できるようにします
+
+各ゲームモジュールは import 時にセッションレジストリへ登録されるため、ここで全ゲームを読み込みます。
+"""
+import commands.rps  # noqa: F401
+import ui.game.blackjack  # noqa: F401
+import ui.game.dice  # noqa: F401
+import ui.game.mines  # noqa: F401
+from utils.session_registry import session_registry
+
+_restored = False
+
+
+def restore_game_sessions(bot) -> dict[str, int]:
+    """
+    全ゲームのセッションを復元し、ボタンをメッセージに再登録（2回目以降は何もしない）
+
+    放置タイムアウトを過ぎていたセッションは、次回の掃除で精算されます。
+
+    Returns:
+        dict: ゲーム名 → 再登録したゲーム数
+    """
+    global _restored
+    if _restored:
+        return {}
+    _restored = True
+    return session_registry.restore(bot)
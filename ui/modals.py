@@ -20,7 +20,7 @@ from config import (
 )
 from utils.embed import create_embed
 from utils.pnc import jpy_to_pnc, pnc_to_jpy
-from utils.logs import send_paypay_log, log_transaction
+from utils.logs import send_paypay_log, log_financial_transaction
 from utils.emojis import PNC_EMOJI_STR
 from utils.embed_factory import EmbedFactory
 
@@ -206,7 +206,7 @@ class PayinModal(discord.ui.Modal, title="入金"):
         try:
             paypay_session.paypay.link_receive(paypay_link)
             update_user_balance(user_id, int(net_pnc))
-            log_transaction(user_id=user_id, type="payin", amount=int(jpy_amount), payout=int(net_pnc))
+            await log_financial_transaction(user_id, "payin", int(jpy_amount), int(net_pnc))
 
             embed = discord.Embed(title="入金完了", color=discord.Color.green())
             embed.add_field(name="入金額", value=f"`¥{int(jpy_amount):,}` → {PNC_EMOJI_STR} `{int(total_pnc):,}`", inline=True)
@@ -1,30 +1,34 @@
-import hmac
 import hashlib
 import secrets
 
+from utils.pf_engine import CardStream, card_index
+
+HIDDEN_SEED_TEXT = "シード変更時に公開"
+
+
 class ProvablyFairParams:
-    def __init__(self, client_seed=None, server_seed=None, nonce=0):
+    def __init__(self, client_seed=None, server_seed=None, nonce=0, server_seed_hash=None, reveal=True):
         self.client_seed = client_seed or secrets.token_hex(8)
         self.server_seed = server_seed or secrets.token_hex(32)
-        self.server_seed_hash = hashlib.sha256(self.server_seed.encode()).hexdigest()
+        self.server_seed_hash = server_seed_hash if server_seed and server_seed_hash else hashlib.sha256(self.server_seed.encode()).hexdigest()
         self.nonce = nonce
+        # ユーザーごとのシードを使い回す場合（PF_SEED_MODE=rotate）はゲーム終了時にシードを公開しない
+        self.reveal = reveal
+        self._stream = None
 
     def get_card_index(self, cursor: int) -> int:
-        msg = f"{self.client_seed}:{self.nonce}:{cursor}".encode()
-        digest = hmac.new(self.server_seed.encode(), msg, hashlib.sha256).digest()
-        number = int.from_bytes(digest, 'big') / 2**256
-        return int(number * 52)
+        return card_index(self.server_seed, self.client_seed, self.nonce, cursor)
 
     def get_card(self, cursor: int):
-        suits = ["S", "H", "D", "C"]
-        ranks = ["A"] + [str(n) for n in range(2, 11)] + ["J", "Q", "K"]
-        idx = self.get_card_index(cursor)
-        return ranks[idx % 13] + suits[idx // 13], ranks[idx % 13]
+        # ゲーム1回分のカード列は初回にまとめて導出（以降は参照のみ）
+        if self._stream is None or self._stream.nonce != self.nonce:
+            self._stream = CardStream(self.server_seed, self.client_seed, self.nonce)
+        return self._stream.card(cursor)
 
     def get_pf_embed_field(self):
         return (
             f"Hash: `{self.server_seed_hash}`\n"
-            f"Seed: `{self.server_seed}`\n"
+            f"Seed: `{self.server_seed if self.reveal else HIDDEN_SEED_TEXT}`\n"
             f"Client: `{self.client_seed}`\n"
             f"Nonce: `{self.nonce}`"
         )
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+アバター画像サービス
+ユーザーのアバターを共有のHTTPセッションで取得し、円形に切り抜いた画像をキャッシュします
+
+    - HTTP: 長寿命の aiohttp.ClientSession を1つだけ使い、接続を使い回す
+    - キャッシュ: (user_id, アバターハッシュ, サイズ) ごとに切り抜き済み画像をLRU + TTLで保持
+                  （アバターを変更するとハッシュが変わるため自動的に取り直す）
+    - 失敗時: タイムアウト・取得失敗時はプレースホルダーを返す（キャッシュしない）
+
+キャッシュした画像は複数の描画で共有するため、貼り付け元としてのみ使ってください。
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Optional
+
+import aiohttp
+from PIL import Image
+
+import config
+from ui.game.assets import crop_circle
+from utils.metrics import metrics
+from utils.render import render_service
+
+PLACEHOLDER_COLOR = (90, 90, 100, 255)
+
+# ========================================
+# メトリクス
+# ========================================
+AVATAR_CACHE_HITS = metrics.counter("avatar_cache_hits_total", "キャッシュから返したアバター数")
+AVATAR_CACHE_MISSES = metrics.counter("avatar_cache_misses_total", "取得が必要だったアバター数")
+AVATAR_FETCH_FAILURES = metrics.counter("avatar_fetch_failures_total", "取得に失敗しプレースホルダーを返した数")
+AVATAR_FETCH_SECONDS = metrics.histogram("avatar_fetch_seconds", "アバターの取得・デコード時間（秒）")
+AVATAR_CACHE_ENTRIES = metrics.gauge("avatar_cache_entries", "キャッシュ中のアバター数")
+
+AvatarKey = tuple[int, str, int]
+
+
+def _decode_avatar(data: bytes, size: int) -> Image.Image:
+    with Image.open(BytesIO(data)) as im:
+        image = im.convert("RGBA").resize((size, size))
+    return crop_circle(image)
+
+
+def _placeholder(size: int) -> Image.Image:
+    return crop_circle(Image.new("RGBA", (size, size), PLACEHOLDER_COLOR))
+
+
+class AvatarService:
+    """アバター画像の取得とキャッシュ"""
+
+    def __init__(self, max_size: int, ttl: float, timeout: float, fetch_size: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timeout = timeout
+        self.fetch_size = fetch_size
+        self._entries: OrderedDict[AvatarKey, tuple[Image.Image, float]] = OrderedDict()
+        self._inflight: dict[AvatarKey, asyncio.Future] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._placeholders: dict[int, Image.Image] = {}
+
+    # ========================================
+    # HTTPセッション
+    # ========================================
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """HTTPセッションを閉じる"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ========================================
+    # キャッシュ
+    # ========================================
+    def _get_cached(self, key: AvatarKey) -> Optional[Image.Image]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        image, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return image
+
+    def _set_cached(self, key: AvatarKey, image: Image.Image) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (image, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        AVATAR_CACHE_ENTRIES.set(len(self._entries))
+
+    def placeholder(self, size: int) -> Image.Image:
+        """取得失敗時のプレースホルダー画像"""
+        image = self._placeholders.get(size)
+        if image is None:
+            image = self._placeholders[size] = _placeholder(size)
+        return image
+
+    # ========================================
+    # 取得
+    # ========================================
+    async def _fetch(self, asset: Any, size: int) -> Image.Image:
+        started = time.perf_counter()
+        url = asset.with_size(self.fetch_size).url if hasattr(asset, "with_size") else asset.url
+        async with self._get_session().get(url) as resp:
+            resp.raise_for_status()
+            data = await resp.read()
+        image = await render_service.run("avatar", _decode_avatar, data, size)
+        AVATAR_FETCH_SECONDS.observe(time.perf_counter() - started)
+        return image
+
+    async def get_avatar(self, user: Any, size: int) -> Image.Image:
+        """
+        円形に切り抜いたアバター画像を取得
+
+        Args:
+            user: display_avatar を持つユーザー（discord.User / Member など）
+            size: 一辺のピクセル数
+
+        Returns:
+            Image.Image: size x size のRGBA画像（取得失敗時はプレースホルダー）
+        """
+        asset = user.display_avatar
+        key = (user.id, getattr(asset, "key", asset.url), size)
+
+        image = self._get_cached(key)
+        if image is not None:
+            AVATAR_CACHE_HITS.inc()
+            return image
+        AVATAR_CACHE_MISSES.inc()
+
+        # 同じアバターの取得が進行中ならその結果を待つ
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            image = await self._fetch(asset, size)
+            self._set_cached(key, image)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            AVATAR_FETCH_FAILURES.inc(reason=type(e).__name__)
+            print(f"[WARN] アバター取得に失敗 user={user.id}: {type(e).__name__}: {e}")
+            image = self.placeholder(size)
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(image)
+        return image
+
+
+avatar_service = AvatarService(
+    config.AVATAR_CACHE_SIZE,
+    config.AVATAR_CACHE_TTL,
+    config.AVATAR_FETCH_TIMEOUT,
+    config.AVATAR_FETCH_SIZE
+)
@@ -18,3 +18,16 @@ async def save_last_message_id_to_db(message_id: int):
 async def get_last_message_id_from_db():
     doc = bot_state_collection.find_one({"_id": "monthly_ranking"})
     return doc.get("message_id") if doc else None
+
+def get_command_tree_hash(application_id: int):
+    """前回同期したスラッシュコマンド定義のハッシュ"""
+    doc = bot_state_collection.find_one({"_id": f"command_tree:{application_id}"})
+    return doc.get("hash") if doc else None
+
+def save_command_tree_hash(application_id: int, tree_hash: str):
+    """同期したスラッシュコマンド定義のハッシュを保存"""
+    bot_state_collection.update_one(
+        {"_id": f"command_tree:{application_id}"},
+        {"$set": {"hash": tree_hash, "synced_at": datetime.now(JST)}},
+        upsert=True
+    )
@@ -0,0 +1,241 @@
+"""
+グラフ描画サービス
+matplotlib のグラフ描画を専用のワーカープロセスで実行し、PNGをメモリ上のバッファで返します
+
+matplotlib の描画はGILを解放しないため、スレッドプール（utils.render）ではなくプロセスプールを使います。
+
+    - 遅延読み込み: matplotlib はワーカープロセスで初回描画時に Agg バックエンドで読み込む（ボットの起動を遅らせない）
+    - フォント: FontProperties はワーカープロセスごとに1回だけ作成する
+    - キャッシュ: 描画するデータのハッシュごとにPNGをメモリ（LRU）と CHART_CACHE_DIR に保存し、
+                  同じデータの再送信（再起動後の起動時レポートなど）では描画しない
+    - 同時実行: 同じデータの描画が実行中なら完了を待って結果を共有する
+"""
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Optional
+
+import config
+from utils.metrics import metrics
+
+FONT_PATH = "assets/font/NotoSansJP-VariableFont_wght.ttf"
+
+# ========================================
+# メトリクス
+# ========================================
+CHART_CACHE_HITS = metrics.counter("chart_cache_hits_total", "キャッシュから返したグラフ数")
+CHART_RENDERS = metrics.counter("chart_renders_total", "描画したグラフ数")
+CHART_RENDER_SECONDS = metrics.histogram("chart_render_seconds", "グラフの描画時間（秒）")
+CHART_ERRORS = metrics.counter("chart_errors_total", "描画に失敗したグラフ数")
+
+
+# ========================================
+# ワーカープロセス側の描画
+# ========================================
+_fonts: dict[str, Any] = {}
+
+
+def _font(path: str) -> Any:
+    """フォントを読み込み（ワーカープロセスごとにキャッシュ）"""
+    font = _fonts.get(path)
+    if font is None:
+        from matplotlib import font_manager as fm
+
+        font = _fonts[path] = fm.FontProperties(fname=path)
+    return font
+
+
+def draw_profit_chart(dates: list[str], profits: list[int], font_path: str = FONT_PATH) -> bytes:
+    """
+    日次利益の推移グラフを描画（ワーカープロセスで実行）
+
+    Returns:
+        bytes: PNG画像
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+
+    jp_font = _font(font_path)
+
+    # pyplot の状態を使わない Figure を描画ごとに作成する
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.plot(dates, profits, marker='o', linestyle='-', color='blue')
+
+    ax.set_title("📊 過去30日間のカジノ収益推移", fontproperties=jp_font)
+    ax.set_xlabel("日付", fontproperties=jp_font)
+    ax.set_ylabel("利益（円）", fontproperties=jp_font)
+    ax.tick_params(axis="x", labelrotation=45)
+    for label in ax.get_xticklabels() + ax.get_yticklabels():
+        label.set_fontproperties(jp_font)
+    ax.grid(True)
+
+    # データラベルを追加
+    for date, profit in zip(dates, profits):
+        ax.annotate(
+            f"{profit:,}",
+            (date, profit),
+            textcoords="offset points",
+            xytext=(0, 8),
+            ha='center',
+            fontsize=8,
+            fontproperties=jp_font
+        )
+
+    fig.tight_layout()
+    buf = BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    return buf.getvalue()
+
+
+# ========================================
+# サービス
+# ========================================
+def chart_key(kind: str, *data: Any) -> str:
+    """グラフの種類と描画するデータのハッシュ"""
+    encoded = json.dumps([kind, *data], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ChartService:
+    """グラフ描画用プロセスプールとキャッシュ"""
+
+    def __init__(self, workers: int, cache_size: int, timeout: float, cache_dir: str):
+        self.workers = max(workers, 1)
+        self.cache_size = max(cache_size, 1)
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # fork はDBスレッドなどを持つプロセスを複製するため、spawn で新しいプロセスを起動する
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    # ========================================
+    # キャッシュ
+    # ========================================
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"chart_{key}.png")
+
+    def _remember(self, key: str, data: bytes) -> None:
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.cache_size:
+            self._entries.popitem(last=False)
+
+    def _read_file(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._cache_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_file(self, key: str, data: bytes) -> None:
+        """画像を保存（一時ファイルから置き換えるため、書きかけのファイルを読むことはない）"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._prune_files()
+        except OSError as e:
+            print(f"[WARN] グラフのキャッシュを保存できません: {e}")
+
+    def _prune_files(self) -> None:
+        """古いキャッシュファイルを削除（CHART_CACHE_SIZE 件まで残す）"""
+        files = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.startswith("chart_") and name.endswith(".png")
+        ]
+        files.sort(key=os.path.getmtime, reverse=True)
+        for path in files[self.cache_size:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # ========================================
+    # 描画
+    # ========================================
+    async def _render(self, kind: str, key: str, func: Any, *args: Any) -> bytes:
+        data = await asyncio.to_thread(self._read_file, key)
+        if data is not None:
+            CHART_CACHE_HITS.inc(kind=kind, source="file")
+            return data
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            data = await asyncio.wait_for(loop.run_in_executor(self._get_executor(), func, *args), self.timeout)
+        except Exception:
+            CHART_ERRORS.inc(kind=kind)
+            raise
+        CHART_RENDERS.inc(kind=kind)
+        CHART_RENDER_SECONDS.observe(time.perf_counter() - started, kind=kind)
+        await asyncio.to_thread(self._write_file, key, data)
+        return data
+
+    async def render(self, kind: str, func: Any, *args: Any) -> BytesIO:
+        """
+        グラフを描画（同じデータならキャッシュから返す）
+
+        Args:
+            kind: グラフの種類（キャッシュのキー・メトリクスのラベル）
+            func: ワーカープロセスで実行する描画関数（モジュールの最上位に定義し、PNGのbytesを返す）
+            args: 描画関数の引数（キャッシュのキーにも使うためJSONにできる値）
+
+        Returns:
+            BytesIO: 先頭に戻したPNGのバッファ
+
+        Raises:
+            asyncio.TimeoutError: CHART_TIMEOUT_SECONDS を過ぎた場合
+        """
+        key = chart_key(kind, *args)
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            CHART_CACHE_HITS.inc(kind=kind, source="memory")
+            return BytesIO(data)
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._render(kind, key, func, *args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        data = await asyncio.shield(future)
+        self._remember(key, data)
+        return BytesIO(data)
+
+    async def render_profit_chart(self, dates: list[str], profits: list[int]) -> BytesIO:
+        """日次利益の推移グラフ"""
+        return await self.render("profit", draw_profit_chart, list(dates), list(profits))
+
+    def shutdown(self) -> None:
+        """プロセスプールを停止"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+chart_service = ChartService(
+    config.CHART_WORKERS,
+    config.CHART_CACHE_SIZE,
+    config.CHART_TIMEOUT_SECONDS,
+    config.CHART_CACHE_DIR
+)
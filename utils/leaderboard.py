@@ -0,0 +1,211 @@
+"""
+月間貢献ランキング
+ユーザーごとの当月の payin/payout をメモリ上に保持し、金銭取引を記録するたびに更新します
+
+    - 初回: 当月分をレジャーから1回だけ読み込む（読み込み中に記録された取引は後から反映）
+    - 重複排除: 反映済みの取引の_idを保持し、同じ取引を二度数えない
+                （_id はクライアントで採番されコミット順ではないため、_id の大小では判定しない）
+    - 更新: log_financial_transaction で記録した取引をその場で反映（DBを読み直さない）
+    - 上位取得: 貢献度の降順に並べたリストを保持し、上位K件をそのまま返す
+    - 月の切り替え: 新しい月の取引が来たら集計を丸ごと新しいものに差し替える（全ユーザーを走査しない）
+
+取引は DB スレッドからも記録されるため、状態の更新はロックで保護します。
+"""
+import asyncio
+import datetime
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Any, Iterable, Optional
+
+from bson import ObjectId
+
+from config import EXCLUDED_USER_IDS, JST
+from database.reports import PROFIT_TYPES, iter_profit_entries
+from utils.metrics import metrics
+
+# ========================================
+# メトリクス
+# ========================================
+LEADERBOARD_USERS = metrics.gauge("leaderboard_users", "月間ランキングに載っているユーザー数")
+LEADERBOARD_UPDATES = metrics.counter("leaderboard_updates_total", "月間ランキングに反映した取引数")
+LEADERBOARD_LOAD_SECONDS = metrics.histogram("leaderboard_load_seconds", "月間ランキングの読み込み時間（秒）")
+
+
+def current_month() -> str:
+    """JSTの当月キー（YYYY-MM）"""
+    return datetime.datetime.now(JST).strftime("%Y-%m")
+
+
+def contribution(payin: int, payout: int) -> int:
+    """ランキングの貢献度（payin - payout × 10）"""
+    return payin - payout * 10
+
+
+class _MonthState:
+    """1か月分の集計"""
+
+    __slots__ = ("month", "seen_ids", "totals", "ranked")
+
+    def __init__(self, month: str):
+        self.month = month
+        # 反映済みの取引の_id
+        self.seen_ids: set[ObjectId] = set()
+        # ユーザーID → [payin, payout]
+        self.totals: dict[int, list[int]] = {}
+        # (-貢献度, ユーザーID) の昇順 = 貢献度の降順
+        self.ranked: list[tuple[int, int]] = []
+
+
+class MonthlyLeaderboard:
+    """月間貢献ランキング"""
+
+    def __init__(self, excluded_user_ids: Iterable[int] = ()):
+        self.excluded_user_ids = set(excluded_user_ids)
+        self._lock = threading.Lock()
+        self._state: Optional[_MonthState] = None
+        # 読み込み中に記録された取引（読み込み後に反映する）
+        self._pending: Optional[list[dict[str, Any]]] = None
+        self._load_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def month(self) -> Optional[str]:
+        """保持している月（未読み込みならNone）"""
+        state = self._state
+        return state.month if state else None
+
+    # ========================================
+    # 更新
+    # ========================================
+    def _add(self, state: _MonthState, user_id: int, payin: int, payout: int) -> None:
+        totals = state.totals.get(user_id)
+        if totals is None:
+            totals = state.totals[user_id] = [0, 0]
+            old_score = None
+        else:
+            old_score = contribution(*totals)
+        totals[0] += payin
+        totals[1] += payout
+
+        if user_id in self.excluded_user_ids:
+            return
+        if old_score is not None:
+            del state.ranked[bisect_left(state.ranked, (-old_score, user_id))]
+        insort(state.ranked, (-contribution(*totals), user_id))
+
+    def _add_entry(self, state: _MonthState, entry: dict[str, Any]) -> bool:
+        """取引を反映（反映済みの_idなら何もせずFalse）"""
+        entry_id = entry["_id"]
+        if entry_id in state.seen_ids:
+            return False
+        state.seen_ids.add(entry_id)
+        amount = entry.get("amount", 0)
+        payin, payout = (amount, 0) if entry["type"] == "payin" else (0, amount)
+        self._add(state, entry["user_id"], payin, payout)
+        return True
+
+    def apply(self, entry: dict[str, Any]) -> None:
+        """
+        記録したレジャードキュメントを反映
+
+        Args:
+            entry: insert_transaction が返したドキュメント
+        """
+        if entry.get("type") not in PROFIT_TYPES:
+            return
+
+        month = entry["day"][:7]
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(entry)
+            state = self._state
+            if state is None:
+                return
+            if month > state.month:
+                # 月が変わったら新しい集計に差し替える（前月分は捨てる）
+                state = self._state = _MonthState(month)
+            if month != state.month or not self._add_entry(state, entry):
+                return
+            LEADERBOARD_UPDATES.inc()
+            LEADERBOARD_USERS.set(len(state.ranked))
+
+    # ========================================
+    # 読み込み
+    # ========================================
+    def load(self, month: str) -> None:
+        """
+        指定した月の集計をレジャーから読み込み（DBスレッドで実行）
+
+        読み込み中に記録された取引はその後に反映します。読み込んだ取引の_idを保持するため、
+        読み込みにも含まれていた取引や、読み込み後に反映される取引を二度数えることはありません。
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = pending = []
+
+        try:
+            state = _MonthState(month)
+            for entry in iter_profit_entries(f"{month}-01", f"{month}-31"):
+                self._add_entry(state, entry)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            self._pending = None
+            for entry in pending:
+                if entry["day"][:7] == month:
+                    self._add_entry(state, entry)
+            if self._state is None or self._state.month <= month:
+                self._state = state
+            LEADERBOARD_USERS.set(len(self._state.ranked))
+        LEADERBOARD_LOAD_SECONDS.observe(time.perf_counter() - started)
+
+    async def ensure_month(self, month: str) -> None:
+        """
+        指定した月の集計を用意
+
+        起動後に読み込み済みなら、以降の取引はすべて反映されているため、
+        新しい月へは読み込まずに空の集計へ切り替えます。
+        """
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+
+        async with self._load_lock:
+            with self._lock:
+                state = self._state
+                if state is not None and state.month >= month:
+                    return
+                if state is not None:
+                    self._state = _MonthState(month)
+                    LEADERBOARD_USERS.set(0)
+                    return
+            await asyncio.to_thread(self.load, month)
+
+    # ========================================
+    # 取得
+    # ========================================
+    def top(self, k: int) -> list[tuple[int, int]]:
+        """
+        貢献度の上位K件
+
+        Returns:
+            list: (ユーザーID, 貢献度) のリスト（貢献度の降順）
+        """
+        with self._lock:
+            if self._state is None:
+                return []
+            return [(user_id, -score) for score, user_id in self._state.ranked[:k]]
+
+    def totals(self, user_id: int) -> tuple[int, int]:
+        """ユーザーの当月の (payin, payout)"""
+        with self._lock:
+            if self._state is None:
+                return 0, 0
+            totals = self._state.totals.get(user_id)
+            return (totals[0], totals[1]) if totals else (0, 0)
+
+
+# 従来のランキングと同じく EXCLUDED_USER_IDS の先頭のユーザーのみ除外する
+monthly_leaderboard = MonthlyLeaderboard(EXCLUDED_USER_IDS[:1])
@@ -0,0 +1,199 @@
+"""
+ログチャンネル送信キュー
+カジノ・入金・景品交換ログのEmbedをチャンネルごとにためて、バックグラウンドでまとめて送信します
+
+    - 非同期: enqueue() はキューに積むだけで、ゲームのコールバックは送信を待たない
+    - まとめ送信: 1メッセージに最大10件（合計6000文字以内）のEmbedをまとめる
+    - レート制限: チャンネルごとのトークンバケット（LOG_DISPATCH_RATE / LOG_DISPATCH_BURST）で送信間隔を空ける
+    - 上限: チャンネルごとの未送信数が LOG_DISPATCH_MAX_PENDING を超えたら新しいログを捨てる
+    - 停止: ボットの接続を閉じる前に stop() で未送信分を送り切る（最大 LOG_DISPATCH_DRAIN_SECONDS 秒）
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+import discord
+
+import config
+from utils.metrics import metrics
+
+# Discordの1メッセージあたりの上限
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+# ========================================
+# メトリクス
+# ========================================
+LOG_PENDING = metrics.gauge("log_dispatch_pending", "未送信のログEmbed数")
+LOG_MESSAGES = metrics.counter("log_dispatch_messages_total", "ログチャンネルに送信したメッセージ数")
+LOG_EMBEDS = metrics.counter("log_dispatch_embeds_total", "ログチャンネルに送信したEmbed数")
+LOG_DROPPED = metrics.counter("log_dispatch_dropped_total", "送信できずに捨てたログEmbed数")
+LOG_BATCH_SIZE = metrics.histogram("log_dispatch_batch_size", "1メッセージにまとめたEmbed数", buckets=(1, 2, 3, 5, 10))
+
+
+class _ChannelQueue:
+    """1チャンネル分の未送信ログと送信間隔"""
+
+    def __init__(self, channel: discord.abc.Messageable, burst: int):
+        self.channel = channel
+        self.embeds: deque[discord.Embed] = deque()
+        self.wakeup = asyncio.Event()
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+
+
+class LogDispatcher:
+    """ログチャンネルへのバックグラウンド送信"""
+
+    def __init__(self, rate: float, burst: int, linger_ms: int, max_pending: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.linger = linger_ms / 1000
+        self.max_pending = max_pending
+        self._queues: dict[int, _ChannelQueue] = {}
+        self._running = False
+        self._draining = False
+
+    # ========================================
+    # 追加
+    # ========================================
+    def enqueue(self, channel: discord.abc.Messageable, embed: discord.Embed) -> bool:
+        """
+        ログを送信キューに追加（送信はバックグラウンドで行う）
+
+        Returns:
+            bool: 追加できた場合True（未送信数が上限を超えている場合False）
+        """
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = self._queues[channel.id] = _ChannelQueue(channel, self.burst)
+        queue.channel = channel
+
+        if len(queue.embeds) >= self.max_pending:
+            LOG_DROPPED.inc(channel=channel.id, reason="full")
+            return False
+
+        queue.embeds.append(embed)
+        LOG_PENDING.set(len(queue.embeds), channel=channel.id)
+        if self._running:
+            self._ensure_worker(channel.id, queue)
+            queue.wakeup.set()
+        return True
+
+    # ========================================
+    # 送信
+    # ========================================
+    @staticmethod
+    def _take_batch(queue: _ChannelQueue) -> list[discord.Embed]:
+        batch: list[discord.Embed] = []
+        chars = 0
+        while queue.embeds and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            size = len(queue.embeds[0])
+            if batch and chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(queue.embeds.popleft())
+            chars += size
+        return batch
+
+    async def _wait_for_token(self, queue: _ChannelQueue) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        queue.tokens = min(self.burst, queue.tokens + (now - queue.updated) * self.rate)
+        queue.updated = now
+        if queue.tokens < 1:
+            await asyncio.sleep((1 - queue.tokens) / self.rate)
+            queue.tokens = 1.0
+            queue.updated = time.monotonic()
+        queue.tokens -= 1
+
+    async def _send_batch(self, channel_id: int, queue: _ChannelQueue, batch: list[discord.Embed]) -> None:
+        try:
+            await queue.channel.send(embeds=batch)
+            LOG_MESSAGES.inc(channel=channel_id)
+            LOG_EMBEDS.inc(len(batch), channel=channel_id)
+            LOG_BATCH_SIZE.observe(len(batch))
+        except Exception as e:
+            LOG_DROPPED.inc(len(batch), channel=channel_id, reason="error")
+            print(f"[ERROR] ログチャンネル {channel_id} への送信に失敗（{len(batch)}件）: {e}")
+
+    async def _run_channel(self, channel_id: int, queue: _ChannelQueue) -> None:
+        # 停止時は未送信分を送り切ったら終了する
+        while not (self._draining and not queue.embeds):
+            await queue.wakeup.wait()
+            queue.wakeup.clear()
+            # 同時に発生したログを1メッセージにまとめるため少し待つ
+            if self.linger > 0 and not self._draining and len(queue.embeds) < MAX_EMBEDS_PER_MESSAGE:
+                await asyncio.sleep(self.linger)
+
+            while queue.embeds:
+                await self._wait_for_token(queue)
+                batch = self._take_batch(queue)
+                LOG_PENDING.set(len(queue.embeds), channel=channel_id)
+                await self._send_batch(channel_id, queue, batch)
+
+    def _ensure_worker(self, channel_id: int, queue: _ChannelQueue) -> None:
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.create_task(self._run_channel(channel_id, queue))
+
+    # ========================================
+    # ライフサイクル
+    # ========================================
+    def start(self) -> None:
+        """バックグラウンドの送信処理を開始（イベントループ内で呼ぶ）"""
+        self._running = True
+        for channel_id, queue in self._queues.items():
+            self._ensure_worker(channel_id, queue)
+            if queue.embeds:
+                queue.wakeup.set()
+
+    async def _drain(self, timeout: float) -> None:
+        """未送信のログを送り切るまで待つ（最大 timeout 秒）"""
+        self._draining = True
+        tasks = []
+        for channel_id, queue in self._queues.items():
+            if queue.embeds:
+                self._ensure_worker(channel_id, queue)
+            if queue.task is not None:
+                queue.wakeup.set()
+                tasks.append(queue.task)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    async def stop(self, drain_timeout: float = 0) -> None:
+        """
+        バックグラウンド処理を停止
+
+        ボットの接続を閉じる前に呼び出し、未送信分を drain_timeout 秒まで送信します。
+        それでも送り切れなかった分は捨てます。
+        """
+        if self._running and drain_timeout > 0:
+            await self._drain(drain_timeout)
+        self._running = False
+        dropped = 0
+        for channel_id, queue in self._queues.items():
+            if queue.task is not None:
+                queue.task.cancel()
+                try:
+                    await queue.task
+                except asyncio.CancelledError:
+                    pass
+                queue.task = None
+            if queue.embeds:
+                dropped += len(queue.embeds)
+                LOG_DROPPED.inc(len(queue.embeds), channel=channel_id, reason="shutdown")
+                queue.embeds.clear()
+                LOG_PENDING.set(0, channel=channel_id)
+        self._draining = False
+        if dropped:
+            print(f"[WARN] 未送信のログ {dropped} 件を破棄しました")
+
+
+log_dispatcher = LogDispatcher(
+    config.LOG_DISPATCH_RATE,
+    config.LOG_DISPATCH_BURST,
+    config.LOG_DISPATCH_LINGER_MS,
+    config.LOG_DISPATCH_MAX_PENDING
+)
@@ -1,6 +1,8 @@
 """
 ログ管理モジュール
 カジノゲームとPayPayトランザクションのログ機能を提供します
+
+ログチャンネルへの送信は utils.log_dispatcher のキューに積むだけで、送信完了を待たずに戻ります。
 """
 import datetime
 import os
@@ -11,7 +13,13 @@ import discord
 from bot import bot
 import config
 from utils.emojis import PNC_EMOJI_STR
-from database.db import financial_transactions_collection
+from database import async_db
+from database.bet_history import game_result
+from database.ledger import FINANCIAL_TRANSACTION_TYPES, insert_transaction
+from database.rollups import apply_transaction
+from database.result_writer import game_result_writer
+from utils.leaderboard import monthly_leaderboard
+from utils.log_dispatcher import log_dispatcher
 
 # 景品絵文字
 LARGE_PRIZE_EMOJI = "🟡"
@@ -30,7 +38,7 @@ async def send_casino_log(
     color: discord.Color,
 ) -> None:
     """
-    カジノログをログチャンネルに送信
+    カジノログをログチャンネルの送信キューに追加
     
     Args:
         interaction: Discord Interaction
@@ -59,7 +67,7 @@ async def send_casino_log(
             
         casino_channel = bot.get_channel(int(config.CASINO_LOG_CHANNEL_ID))
         if casino_channel:
-            await casino_channel.send(embed=embed)
+            log_dispatcher.enqueue(casino_channel, embed)
         else:
             print(f"[ERROR] Casino log channel not found: {config.CASINO_LOG_CHANNEL_ID}")
     except Exception as e:
@@ -74,7 +82,7 @@ async def send_paypay_log(
     is_register: bool = False
 ) -> None:
     """
-    PayPay入金ログをログチャンネルに送信
+    PayPay入金ログをログチャンネルの送信キューに追加
     
     Args:
         user: Discordユーザー
@@ -103,7 +111,7 @@ async def send_paypay_log(
         embed.add_field(name="決済番号", value=f"`{deposit_info.order_id}`", inline=False)
         embed.set_footer(text=f"{deposit_info.sender_name} 様", icon_url=deposit_info.sender_icon)
 
-        await channel.send(embed=embed)
+        log_dispatcher.enqueue(channel, embed)
 
     except Exception as e:
         print(f"[ERROR] send_paypay_log: {e}")
@@ -131,7 +139,7 @@ async def send_paypay_log(
                 pass
 
 
-def log_financial_transaction(
+def record_financial_transaction(
     user_id: int,
     transaction_type: str,
     amount: int,
@@ -139,6 +147,7 @@ def log_financial_transaction(
 ) -> None:
     """
     金銭取引をログとして記録（payin、payout、exchangeのみ）
+    レジャー・日次集計へ同期的に書き込むため、イベントループからは log_financial_transaction を使ってください
     
     Args:
         user_id: ユーザーID
@@ -147,36 +156,54 @@ def log_financial_transaction(
         net_amount: 純額（手数料差し引き後）。Noneの場合はamountと同じ
     """
     # 金銭取引のみを許可
-    if transaction_type not in ["payin", "payout", "exchange"]:
-        print(f"[WARN] log_financial_transaction: 無効なトランザクションタイプ '{transaction_type}' はスキップされました")
+    if transaction_type not in FINANCIAL_TRANSACTION_TYPES:
+        print(f"[WARN] record_financial_transaction: 無効なトランザクションタイプ '{transaction_type}' はスキップされました")
         return
     
-    if net_amount is None:
-        net_amount = amount
-    
-    transaction = {
-        "type": transaction_type,
-        "amount": amount,
-        "net_amount": net_amount,
-        "timestamp": datetime.datetime.now()
-    }
+    # 1取引1ドキュメントとしてレジャーに記録
+    entry = insert_transaction(user_id, transaction_type, amount, net_amount)
+
+    # 日次集計に即時反映（失敗しても追いつき処理で補正される）
+    try:
+        apply_transaction(entry)
+    except Exception as e:
+        print(f"[WARN] daily_rollups update failed: {e}")
+
+    # 月間ランキングに即時反映
+    try:
+        monthly_leaderboard.apply(entry)
+    except Exception as e:
+        print(f"[WARN] monthly leaderboard update failed: {e}")
 
-    financial_transactions_collection.update_one(
-        {"user_id": user_id},
-        {"$push": {"transactions": transaction}},
-        upsert=True
-    )
 
+async def log_financial_transaction(
+    user_id: int,
+    transaction_type: str,
+    amount: int,
+    net_amount: int = None
+) -> None:
+    """金銭取引をログとして記録（DBスレッドで実行し、イベントループを止めない）"""
+    await async_db.run_in_db_thread(record_financial_transaction, user_id, transaction_type, amount, net_amount)
 
-# 後方互換性のためのエイリアス（ゲームログは記録しない）
-def log_transaction(user_id: int, type: str, amount: int, payout: int) -> None:
+
+# 後方互換性のためのエイリアス
+def log_transaction(user_id: int, type: str, amount: int, payout: int, result: Optional[str] = None) -> None:
     """
     レガシー関数（後方互換性）
-    金銭取引のみを記録し、ゲーム関連は無視します
+    金銭取引はレジャーに記録し、ゲーム関連（blackjack, flip, dice等）は
+    ベット履歴・ストリークとして書き込みキューに積みます
+
+    Args:
+        result: ゲームの勝敗（GAME_WIN / GAME_LOSE / GAME_DRAW）。省略時は払い戻しと賭け金から判定
+                （上回れば勝ち、同額なら引き分け）
     """
     if type in ["payin", "payout"]:
-        log_financial_transaction(user_id, type, amount, payout)
-    # ゲーム関連（blackjack, flip, dice等）は何もしない
+        # 同期的に書き込む（イベントループからは await log_financial_transaction(...) を使う）
+        record_financial_transaction(user_id, type, amount, payout)
+    elif type in ["transfer", "exchange"]:
+        return
+    else:
+        game_result_writer.record(user_id, type, int(amount), result or game_result(int(amount), int(payout)))
 
 
 async def send_exchange_log(
@@ -190,7 +217,7 @@ async def send_exchange_log(
     had_carry_over: int
 ) -> None:
     """
-    景品交換ログをログチャンネルに送信
+    景品交換ログをログチャンネルの送信キューに追加
     
     Args:
         user: Discordユーザー
@@ -280,7 +307,7 @@ async def send_exchange_log(
         embed.set_footer(text="景品交換ログ")
         embed.timestamp = datetime.datetime.now()
         
-        await channel.send(embed=embed)
+        log_dispatcher.enqueue(channel, embed)
         
     except Exception as e:
         print(f"[ERROR] send_exchange_log: {e}")
\ No newline at end of file
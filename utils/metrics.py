@@ -0,0 +1,168 @@
+"""
+メトリクスユーティリティ
+ボット内部の状態を数値で記録するカウンター・ゲージ・ヒストグラムを提供します
+
+記録した値は metrics.render() でテキストとして取得でき、管理者向けの /メトリクス コマンドで確認できます。
+"""
+import bisect
+import threading
+from typing import Iterable, Optional
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[dict[str, str]] = None) -> str:
+    pairs = list(key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.6g}"
+
+
+# ========================================
+# メトリクス
+# ========================================
+class Metric:
+    """メトリクスの共通部分（ラベルごとに値を保持）"""
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def render(self) -> list[str]:
+        """テキスト形式の行を作成"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """増加のみのカウンター"""
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: object) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """現在値を表すゲージ"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels: object) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """値の分布を記録するヒストグラム（バケットごとの件数・合計・最大値）"""
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, description: str, buckets: Optional[Iterable[float]] = None):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self._series: dict[LabelKey, dict] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * (len(self.buckets) + 1), "count": 0, "sum": 0.0, "max": 0.0}
+                self._series[key] = series
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["count"] += 1
+            series["sum"] += value
+            series["max"] = max(series["max"], value)
+
+    def render(self) -> list[str]:
+        lines = []
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': le})} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_max{_format_labels(key)} {_format_value(series['max'])}")
+        return lines
+
+
+# ========================================
+# レジストリ
+# ========================================
+class MetricsRegistry:
+    """メトリクスの登録先（同じ名前なら同じインスタンスを返す）"""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, description: str, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"メトリクス {name} は {metric.kind} として登録済みです")
+            return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str, buckets: Optional[Iterable[float]] = None) -> Histogram:
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def render(self, prefix: str = "") -> str:
+        """
+        登録済みメトリクスをテキスト形式で取得
+
+        Args:
+            prefix: 指定した場合、この文字列で始まるメトリクスのみ
+        """
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            if not metric.name.startswith(prefix):
+                continue
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines)
+
+
+metrics = MetricsRegistry()
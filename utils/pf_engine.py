@@ -0,0 +1,257 @@
+"""
+Provably Fair エンジン
+(server_seed, client_seed, nonce) から各ゲームの結果（カード順・地雷位置・じゃんけんの手）を導出します
+
+    - HMAC: サーバーシードごとに鍵を設定済みのHMACを保持し、メッセージごとに copy() して使う
+            （鍵の前処理を毎回行わない。シードを使い回す検証・ローテーションで特に効く）
+    - 参照表: カード（52枚）・じゃんけんの手はインデックス → 結果の表で引く
+    - 一括導出: CardStream でゲーム1回分のカード列を先に導出し、
+                derive_batch() で過去の大量のゲームをまとめて再計算できる
+
+導出式は各ゲームの既存実装（ui/pf.py・ui/game/mines.py・commands/rps.py）と同じで、結果も同一です。
+"""
+import hashlib
+import hmac
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Optional
+
+# ========================================
+# 参照表
+# ========================================
+SUITS = ("S", "H", "D", "C")
+RANKS = ("A",) + tuple(str(n) for n in range(2, 11)) + ("J", "Q", "K")
+
+# カードインデックス（0〜51） → (カードコード, ランク)
+CARD_TABLE: tuple[tuple[str, str], ...] = tuple(
+    (RANKS[idx % 13] + SUITS[idx // 13], RANKS[idx % 13]) for idx in range(52)
+)
+
+RPS_HANDS = ("rock", "paper", "scissors")
+
+GAMES = ("blackjack", "mines", "rps")
+
+
+# ========================================
+# HMAC
+# ========================================
+@lru_cache(maxsize=4096)
+def _keyed_hmac(server_seed: str) -> "hmac.HMAC":
+    """鍵を設定済みのHMAC（copy() して使う。直接 update() しないこと）"""
+    return hmac.new(server_seed.encode(), digestmod=hashlib.sha256)
+
+
+def hmac_digest(server_seed: str, message: str) -> bytes:
+    """HMAC-SHA256(server_seed, message) のダイジェスト"""
+    h = _keyed_hmac(server_seed).copy()
+    h.update(message.encode())
+    return h.digest()
+
+
+def game_hmac_hex(server_seed: str, client_seed: str, nonce: int) -> str:
+    """HMAC-SHA256(server_seed, "client_seed:nonce") の16進数（utils.sys.get_hmac_sha256 と同じ）"""
+    h = _keyed_hmac(server_seed).copy()
+    h.update(f"{client_seed}:{nonce}".encode())
+    return h.hexdigest()
+
+
+# ========================================
+# ブラックジャック
+# ========================================
+def card_index(server_seed: str, client_seed: str, nonce: int, cursor: int) -> int:
+    """cursor 枚目のカードインデックス（0〜51）"""
+    digest = hmac_digest(server_seed, f"{client_seed}:{nonce}:{cursor}")
+    return int(int.from_bytes(digest, "big") / 2**256 * 52)
+
+
+def card_at(server_seed: str, client_seed: str, nonce: int, cursor: int) -> tuple[str, str]:
+    """cursor 枚目のカード (カードコード, ランク)"""
+    return CARD_TABLE[card_index(server_seed, client_seed, nonce, cursor)]
+
+
+def derive_cards(server_seed: str, client_seed: str, nonce: int, count: int, start: int = 0) -> list[tuple[str, str]]:
+    """
+    カード列をまとめて導出
+
+    Args:
+        count: 枚数
+        start: 最初のカーソル
+
+    Returns:
+        list: [(カードコード, ランク), ...]
+    """
+    base = _keyed_hmac(server_seed)
+    prefix = f"{client_seed}:{nonce}:"
+    cards = []
+    for cursor in range(start, start + count):
+        h = base.copy()
+        h.update(f"{prefix}{cursor}".encode())
+        cards.append(CARD_TABLE[int(int.from_bytes(h.digest(), "big") / 2**256 * 52)])
+    return cards
+
+
+class CardStream:
+    """
+    ゲーム1回分のカード列
+
+    作成時に prefetch 枚を導出し、それを超えるカーソルは chunk 枚ずつ追加で導出します。
+    """
+
+    def __init__(self, server_seed: str, client_seed: str, nonce: int, prefetch: int = 12, chunk: int = 8):
+        self.server_seed = server_seed
+        self.client_seed = client_seed
+        self.nonce = nonce
+        self.chunk = chunk
+        self._cards = derive_cards(server_seed, client_seed, nonce, prefetch)
+
+    def card(self, cursor: int) -> tuple[str, str]:
+        """cursor 枚目のカード (カードコード, ランク)"""
+        while cursor >= len(self._cards):
+            self._cards.extend(derive_cards(self.server_seed, self.client_seed, self.nonce, self.chunk, len(self._cards)))
+        return self._cards[cursor]
+
+    def cards(self, count: int) -> list[tuple[str, str]]:
+        """先頭から count 枚"""
+        if count > 0:
+            self.card(count - 1)
+        return self._cards[:count]
+
+
+# ========================================
+# マインズ
+# ========================================
+def derive_mine_positions(hmac_hex: str, grid_size: int, mine_count: int) -> set[tuple[int, int]]:
+    """
+    HMACから地雷位置を導出
+
+    HMACを4桁ずつ区切った値で残りのマスから1つずつ選び、足りなければ SHA-256 で延長します。
+
+    Returns:
+        set: {(行, 列), ...}
+    """
+    positions = list(range(grid_size * grid_size))
+    pool = hmac_hex
+    selected = []
+    offset = 0
+    while len(selected) < mine_count:
+        if offset + 4 > len(pool):
+            pool += hashlib.sha256(pool.encode()).hexdigest()
+        selected.append(positions.pop(int(pool[offset:offset + 4], 16) % len(positions)))
+        offset += 4
+    return {divmod(pos, grid_size) for pos in selected}
+
+
+def derive_mines(server_seed: str, client_seed: str, nonce: int, grid_size: int, mine_count: int) -> set[tuple[int, int]]:
+    """シードから地雷位置を導出"""
+    return derive_mine_positions(game_hmac_hex(server_seed, client_seed, nonce), grid_size, mine_count)
+
+
+# ========================================
+# じゃんけん
+# ========================================
+def rps_number(server_seed: str, client_seed: str, nonce: int) -> float:
+    """じゃんけん用の乱数（HMAC先頭32bit / 0xFFFFFFFF）"""
+    return int(game_hmac_hex(server_seed, client_seed, nonce)[:8], 16) / 0xFFFFFFFF
+
+
+def rps_hand(server_seed: str, client_seed: str, nonce: int) -> str:
+    """相手の手"""
+    return RPS_HANDS[int(rps_number(server_seed, client_seed, nonce) * 3)]
+
+
+def derive_rps_hands(server_seed: str, client_seed: str, nonce: int, rounds: int) -> list[str]:
+    """nonce から rounds 回分の相手の手（ラウンドごとに nonce が1ずつ進む）"""
+    return [rps_hand(server_seed, client_seed, nonce + i) for i in range(rounds)]
+
+
+# ========================================
+# 一括導出
+# ========================================
+def derive_outcome(game: str, record: dict) -> Any:
+    """
+    1ゲーム分の結果を導出
+
+    Args:
+        game: blackjack / mines / rps
+        record: server_seed・client_seed・nonce と、ゲームごとのパラメータ（直下または "params" 内）
+                blackjack: count（枚数）
+                mines: grid_size・mine_count
+                rps: nonces（ラウンドごとのnonce）または rounds（nonce から連番）
+
+    Returns:
+        blackjack: カードコードのリスト / mines: 地雷位置 [行, 列] の昇順リスト / rps: 相手の手のリスト
+    """
+    params = {**record, **(record.get("params") or {})}
+    server_seed, client_seed, nonce = params["server_seed"], params["client_seed"], int(params["nonce"])
+    if game == "blackjack":
+        return [code for code, _ in derive_cards(server_seed, client_seed, nonce, int(params["count"]))]
+    if game == "mines":
+        mines = derive_mines(server_seed, client_seed, nonce, int(params.get("grid_size", 5)), int(params["mine_count"]))
+        return [list(pos) for pos in sorted(mines)]
+    if game == "rps":
+        if "nonces" in params:
+            return [rps_hand(server_seed, client_seed, int(n)) for n in params["nonces"]]
+        return derive_rps_hands(server_seed, client_seed, nonce, int(params.get("rounds", 1)))
+    raise ValueError(f"unknown game: {game}")
+
+
+def derive_batch(game: str, records: Iterable[dict], errors: Optional[list] = None) -> Iterator[Any]:
+    """
+    複数ゲームの結果をまとめて導出（records と同じ順で返す）
+
+    同じサーバーシードのゲームは鍵設定済みのHMACを共有します。
+    errors を渡した場合、導出できなかったレコードは (レコード, 例外) を追加して None を返します。
+    """
+    for record in records:
+        try:
+            yield derive_outcome(game, record)
+        except (KeyError, TypeError, ValueError) as e:
+            if errors is None:
+                raise
+            errors.append((record, e))
+            yield None
+
+
+# ========================================
+# 検証
+# ========================================
+def verify_record(record: dict) -> Optional[dict]:
+    """
+    保存されたPFレコード1件を検証
+
+    Args:
+        record: database.pf_records の形式（game・シード・params・outcome）
+
+    Returns:
+        不一致の場合は {"reason", "expected", "actual"}、一致すればNone
+    """
+    server_seed = record.get("server_seed")
+    commitment = record.get("server_seed_hash")
+    if commitment and server_seed and hashlib.sha256(server_seed.encode()).hexdigest() != commitment:
+        return {"reason": "hash", "expected": commitment, "actual": hashlib.sha256(server_seed.encode()).hexdigest()}
+
+    try:
+        expected = derive_outcome(record.get("game"), record)
+    except (KeyError, TypeError, ValueError) as e:
+        return {"reason": "invalid", "expected": None, "actual": f"{type(e).__name__}: {e}"}
+
+    actual = record.get("outcome")
+    if record.get("game") == "mines":
+        actual = sorted(list(pos) for pos in actual or [])
+    if expected != actual:
+        return {"reason": "outcome", "expected": expected, "actual": actual}
+    return None
+
+
+def verify_chunk(records: list[dict]) -> tuple[int, list[tuple[dict, dict]]]:
+    """
+    PFレコードをまとめて検証（プロセスプールのワーカーから呼ぶ）
+
+    Returns:
+        tuple: (検証件数, [(レコード, 不一致内容), ...])
+    """
+    mismatches = []
+    for record in records:
+        mismatch = verify_record(record)
+        if mismatch is not None:
+            mismatches.append((record, mismatch))
+    return len(records), mismatches
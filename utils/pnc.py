@@ -2,7 +2,6 @@
 PNC（仮想通貨）関連ユーティリティ
 PNCと日本円の変換、利益計算、ランキング機能を提供します
 """
-import datetime
 import random
 from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
@@ -13,7 +12,8 @@ from discord import Embed, ButtonStyle
 from discord.ui import View, Button
 import pytz
 
-from database.db import users_collection, financial_transactions_collection
+from database.db import users_collection
+from database.reports import get_daily_totals, get_lifetime_totals
 from bot import bot
 import config
 from config import CURRENCY_NAME
@@ -148,47 +148,8 @@ def get_daily_profit(target_date: str) -> int:
     Raises:
         ValueError: 日付形式が不正な場合
     """
-    try:
-        target_datetime = datetime.datetime.strptime(target_date, "%Y-%m-%d").replace(tzinfo=JST)
-    except ValueError:
-        raise ValueError("日付の形式が正しくありません！`YYYY-MM-DD` の形式で指定してください。")
-
-    start_time = target_datetime.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_time = target_datetime.replace(hour=23, minute=59, second=59, microsecond=999)
-
-    total_profit = 0
-
-    users = financial_transactions_collection.find({})
-    for user in users:
-        for txn in user.get("transactions", []):
-            ts = txn.get("timestamp")
-            if not ts:
-                continue
-
-            # ISODate → datetime変換
-            if isinstance(ts, str):
-                ts = datetime.datetime.fromisoformat(ts.replace("Z", "+00:00"))
-            elif isinstance(ts, dict) and "$date" in ts:
-                ts = datetime.datetime.fromtimestamp(int(ts["$date"]["$numberLong"]) / 1000, tz=JST)
-            elif isinstance(ts, datetime.datetime):
-                ts = ts.astimezone(JST)
-
-            if not (start_time <= ts <= end_time):
-                continue
-
-            ttype = txn.get("type")
-            amount = txn.get("amount", 0)
-            if isinstance(amount, dict):
-                amount = int(amount.get("$numberInt", 0))
-            elif not isinstance(amount, (int, float)):
-                amount = 0
-
-            if ttype == "payin":
-                total_profit += amount  # ユーザーが賭けた → カジノの利益
-            elif ttype == "payout":
-                total_profit -= amount  # ユーザーが受け取った → カジノの損
-
-    return total_profit
+    # payin: ユーザーが賭けた → カジノの利益 / payout: ユーザーが受け取った → カジノの損
+    return get_daily_totals(target_date, target_date)[0].profit
 
 def get_total_pnc() -> int:
     """
@@ -212,37 +173,10 @@ def get_total_revenue() -> int:
     Returns:
         int: 累計純利益（円）
     """
-    total_profit = 0
-    user_count = 0
-    txn_count = 0
-
-    users = financial_transactions_collection.find({})
-    for user in users:
-        user_id = user.get("user_id", "不明")
-        if user_id in EXCLUDED_USER_IDS:
-            continue
-            
-        transactions = user.get("transactions", [])
-        if not transactions:
-            continue
-
-        user_count += 1
-
-        for txn in transactions:
-            ttype = txn.get("type")
-            amount = txn.get("amount", 0)
-
-            # MongoDBの特殊な数値型を処理
-            if isinstance(amount, dict):
-                amount = int(amount.get("$numberInt", 0))
-            elif not isinstance(amount, (int, float)):
-                continue
-
-            if ttype == "payin":
-                txn_count += 1
-                total_profit += amount
-            elif ttype == "payout":
-                total_profit -= amount
+    totals = get_lifetime_totals(exclude_user_ids=EXCLUDED_USER_IDS)
+    total_profit = totals["profit"]
+    user_count = totals["users"]
+    txn_count = totals["payin_count"]
 
     print(f"\n処理完了: {user_count}人、payin {txn_count}件")
     print(f"カジノ全体の累計純利益: {total_profit:,}円")
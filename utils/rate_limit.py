@@ -0,0 +1,213 @@
+"""
+レート制限ユーティリティ
+ユーザー・チャンネルごとのトークンバケットと、ユーザーごとの処理中ロックでコマンド・ボタン連打を抑えます
+
+    - トークンバケット: rate（1秒あたりの補充数）と burst（最大保持数）で連続実行を制限
+        コマンド: ユーザー（RATE_LIMIT_COMMAND_*）とチャンネル（RATE_LIMIT_CHANNEL_*）の両方
+        ボタン: ユーザー（RATE_LIMIT_INTERACTION_*）
+    - 通知: 制限中の通知は制限が解けるまで1回だけ送る（連打のたびにメッセージを送らない）
+    - 処理中ロック: ゲーム・送金コマンドとゲームのボタンはユーザーごとに1つずつ処理する
+        コマンド: 前の処理が終わるまで GAME_LOCK_WAIT_SECONDS 待ち、終わらなければ拒否
+        ボタン: 待たずに拒否（古いクリックを後から処理しない）
+"""
+import asyncio
+import functools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Hashable
+
+import discord
+
+import config
+from utils.metrics import metrics
+
+# ========================================
+# メトリクス
+# ========================================
+RATE_LIMITED = metrics.counter("rate_limited_total", "レート制限で拒否したコマンド・ボタン操作数")
+IN_FLIGHT_REJECTED = metrics.counter("in_flight_rejected_total", "処理中のため拒否したコマンド・ボタン操作数")
+IN_FLIGHT_WAIT_SECONDS = metrics.histogram("in_flight_wait_seconds", "前の処理の完了を待った時間（秒）")
+
+RATE_LIMITED_TEXT = "操作が速すぎます。少し待ってからお試しください。"
+IN_FLIGHT_TEXT = "前の操作を処理中です。完了してからお試しください。"
+
+
+class TokenBucketLimiter:
+    """キーごとのトークンバケット"""
+
+    # バケット数がこの値を超えたら、満タンに戻ったバケットを削除する
+    PRUNE_THRESHOLD = 10000
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1)
+        # キー → [トークン数, 最終更新時刻, 通知済みか]
+        self._buckets: dict[Hashable, list] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: Hashable) -> tuple[bool, bool]:
+        """
+        トークンを1つ消費
+
+        Returns:
+            tuple: (許可するか, 拒否した場合にユーザーへ通知するか)
+        """
+        if not self.enabled:
+            return True, False
+
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.PRUNE_THRESHOLD:
+                self._prune(now)
+            bucket = self._buckets[key] = [float(self.burst), now, False]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            return True, False
+
+        notify = not bucket[2]
+        bucket[2] = True
+        return False, notify
+
+    def _prune(self, now: float) -> None:
+        full_after = self.burst / self.rate
+        for key in [key for key, (_, updated, _) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+
+class UserLocks:
+    """ユーザーごとの処理中ロック"""
+
+    def __init__(self):
+        # ユーザーID → [ロック, 取得中・待機中の数]
+        self._locks: dict[int, list] = {}
+
+    @asynccontextmanager
+    async def hold(self, user_id: int, wait: float, source: str) -> AsyncIterator[bool]:
+        """
+        ロックを取得して処理を実行
+
+        Args:
+            wait: 前の処理を待つ最大秒数（0なら待たない）
+            source: メトリクスのラベル（command / interaction）
+
+        Yields:
+            bool: ロックを取得できた場合True（False の場合は処理せずに拒否する）
+        """
+        entry = self._locks.setdefault(user_id, [asyncio.Lock(), 0])
+        lock = entry[0]
+        entry[1] += 1
+        acquired = False
+        try:
+            if not lock.locked():
+                await lock.acquire()
+                acquired = True
+            elif wait > 0:
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(lock.acquire(), timeout=wait)
+                    acquired = True
+                except asyncio.TimeoutError:
+                    pass
+                IN_FLIGHT_WAIT_SECONDS.observe(time.perf_counter() - started, source=source)
+
+            if not acquired:
+                IN_FLIGHT_REJECTED.inc(source=source)
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[user_id]
+
+
+# ========================================
+# インスタンス
+# ========================================
+command_user_limiter = TokenBucketLimiter("command_user", config.RATE_LIMIT_COMMAND_RATE, config.RATE_LIMIT_COMMAND_BURST)
+command_channel_limiter = TokenBucketLimiter("command_channel", config.RATE_LIMIT_CHANNEL_RATE, config.RATE_LIMIT_CHANNEL_BURST)
+interaction_user_limiter = TokenBucketLimiter(
+    "interaction_user", config.RATE_LIMIT_INTERACTION_RATE, config.RATE_LIMIT_INTERACTION_BURST
+)
+user_locks = UserLocks()
+
+
+def check_command_rate(message: discord.Message) -> tuple[bool, bool]:
+    """
+    コマンドのレート制限を確認（ユーザー → チャンネルの順）
+
+    Returns:
+        tuple: (許可するか, 拒否した場合にユーザーへ通知するか)
+    """
+    for limiter, key in (
+        (command_user_limiter, message.author.id),
+        (command_channel_limiter, message.channel.id),
+    ):
+        allowed, notify = limiter.acquire(key)
+        if not allowed:
+            RATE_LIMITED.inc(scope=limiter.name, source="command")
+            return False, notify
+    return True, False
+
+
+# ========================================
+# ボタン用デコレーター
+# ========================================
+InteractionCallback = Callable[..., Awaitable[None]]
+
+
+async def _reject_interaction(interaction: discord.Interaction, text: str) -> None:
+    if interaction.response.is_done():
+        return
+    try:
+        await interaction.response.send_message(text, ephemeral=True)
+    except discord.HTTPException:
+        pass
+
+
+async def _defer(interaction: discord.Interaction) -> None:
+    if interaction.response.is_done():
+        return
+    try:
+        await interaction.response.defer()
+    except discord.HTTPException:
+        pass
+
+
+def guard_interaction(func: InteractionCallback) -> InteractionCallback:
+    """
+    ゲームのボタンコールバックにレート制限と処理中ロックを適用
+
+    Button.callback(self, interaction) と @discord.ui.button のコールバック
+    (self, interaction, button) のどちらにも使えます（@discord.ui.button の下に付ける）。
+    """
+    @functools.wraps(func)
+    async def wrapper(self, interaction: discord.Interaction, *args, **kwargs) -> None:
+        user_id = interaction.user.id
+        allowed, notify = interaction_user_limiter.acquire(user_id)
+        if not allowed:
+            RATE_LIMITED.inc(scope=interaction_user_limiter.name, source="interaction")
+            if notify:
+                await _reject_interaction(interaction, RATE_LIMITED_TEXT)
+            else:
+                # 通知済みの場合は応答だけ返して「インタラクションに失敗しました」を防ぐ
+                await _defer(interaction)
+            return
+
+        async with user_locks.hold(user_id, wait=0, source="interaction") as acquired:
+            if not acquired:
+                await _reject_interaction(interaction, IN_FLIGHT_TEXT)
+                return
+            await func(self, interaction, *args, **kwargs)
+
+    return wrapper
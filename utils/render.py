@@ -0,0 +1,161 @@
+"""
+画像描画サービス
+PILによるゲーム画像の描画とPNGエンコードを専用スレッドプールで実行し、イベントループを止めないようにします
+
+PILの描画・エンコードはGILを解放するため、プロセスプールではなくスレッドプールを使います
+（画像やフォントをプロセス間で受け渡す必要もありません）。
+
+    - 上限: 実行中 + 待機中が RENDER_WORKERS + RENDER_QUEUE_SIZE を超える依頼は RenderBusyError で即座に拒否
+    - タイムアウト: RENDER_TIMEOUT_SECONDS を過ぎた依頼は asyncio.TimeoutError（未着手なら取り消し）
+    - 出力形式: render_encoded() は RENDER_IMAGE_FORMAT（png / png8 / webp）でエンコード
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Callable, Optional, TypeVar
+
+import config
+from utils.metrics import metrics
+
+T = TypeVar("T")
+
+# ========================================
+# メトリクス
+# ========================================
+RENDER_QUEUE_DEPTH = metrics.gauge("render_queue_depth", "実行中・待機中の描画数")
+RENDER_LATENCY = metrics.histogram("render_latency_seconds", "描画依頼から完了までの時間（秒）")
+RENDER_WAIT = metrics.histogram("render_wait_seconds", "描画依頼から実行開始までの待ち時間（秒）")
+RENDER_REJECTED = metrics.counter("render_rejected_total", "混雑により拒否した描画数")
+RENDER_TIMEOUTS = metrics.counter("render_timeouts_total", "タイムアウトした描画数")
+RENDER_ERRORS = metrics.counter("render_errors_total", "失敗した描画数")
+
+
+class RenderBusyError(Exception):
+    """描画の待機数が上限に達している"""
+
+
+IMAGE_EXTENSIONS = {"png": "png", "png8": "png", "webp": "webp"}
+
+
+def encode_png(image: Any, **save_options: Any) -> BytesIO:
+    """画像をPNGにエンコードし、先頭に戻したバッファを返す"""
+    buf = BytesIO()
+    image.save(buf, format="PNG", **save_options)
+    buf.seek(0)
+    return buf
+
+
+def encode_image(image: Any, image_format: Optional[str] = None) -> BytesIO:
+    """
+    画像を指定形式でエンコードし、先頭に戻したバッファを返す
+
+    Args:
+        image: PIL画像
+        image_format: png / png8 / webp（省略時は RENDER_IMAGE_FORMAT）
+    """
+    image_format = image_format or config.RENDER_IMAGE_FORMAT
+    if image_format == "webp":
+        buf = BytesIO()
+        image.save(buf, format="WEBP", quality=config.RENDER_WEBP_QUALITY, method=4)
+        buf.seek(0)
+        return buf
+    if image_format == "png8":
+        # 不透明なテーブル画像向け: RGBに落としてから256色へ減色（FASTOCTREE）
+        return encode_png(image.convert("RGB").quantize(colors=256, method=2))
+    return encode_png(image)
+
+
+def image_filename(name: str, image_format: Optional[str] = None) -> str:
+    """出力形式に合わせた添付ファイル名を作成"""
+    return f"{name}.{IMAGE_EXTENSIONS.get(image_format or config.RENDER_IMAGE_FORMAT, 'png')}"
+
+
+class RenderService:
+    """描画専用スレッドプール"""
+
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """実行中・待機中の描画数"""
+        return self._pending
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+        return self._executor
+
+    def _on_done(self, kind: str, started: float, loop: asyncio.AbstractEventLoop, future: Future) -> None:
+        # 完了・取り消しはワーカースレッドから通知されるため、カウンタの更新はループ側で行う
+        def finish() -> None:
+            self._pending -= 1
+            RENDER_QUEUE_DEPTH.set(self._pending)
+            if not future.cancelled():
+                RENDER_LATENCY.observe(time.perf_counter() - started, kind=kind)
+                if future.exception() is not None:
+                    RENDER_ERRORS.inc(kind=kind)
+
+        try:
+            loop.call_soon_threadsafe(finish)
+        except RuntimeError:
+            # イベントループ終了後の完了通知は無視
+            pass
+
+    async def run(self, kind: str, func: Callable[..., T], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> T:
+        """
+        描画関数をスレッドプールで実行
+
+        Args:
+            kind: 描画の種類（メトリクスのラベル）
+            func: 描画関数
+            timeout: 待機上限（秒、省略時は RENDER_TIMEOUT_SECONDS）
+
+        Raises:
+            RenderBusyError: 待機数が上限に達している場合
+            asyncio.TimeoutError: 待機上限を過ぎた場合
+        """
+        if self._pending >= self.capacity:
+            RENDER_REJECTED.inc(kind=kind)
+            raise RenderBusyError(f"render queue is full ({self._pending}/{self.capacity})")
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+
+        def job() -> T:
+            RENDER_WAIT.observe(time.perf_counter() - started, kind=kind)
+            return func(*args, **kwargs)
+
+        future = self._get_executor().submit(job)
+        self._pending += 1
+        RENDER_QUEUE_DEPTH.set(self._pending)
+        future.add_done_callback(functools.partial(self._on_done, kind, started, loop))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            RENDER_TIMEOUTS.inc(kind=kind)
+            raise
+
+    async def render_png(self, kind: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> BytesIO:
+        """描画関数を実行し、結果の画像をPNGにエンコードしたバッファを返す（エンコードもスレッドプールで実行）"""
+        return await self.run(kind, lambda: encode_png(func(*args, **kwargs)))
+
+    async def render_encoded(self, kind: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> BytesIO:
+        """描画関数を実行し、RENDER_IMAGE_FORMAT でエンコードしたバッファを返す（ファイル名は image_filename() で作成）"""
+        return await self.run(kind, lambda: encode_image(func(*args, **kwargs)))
+
+    def shutdown(self) -> None:
+        """スレッドプールを停止"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_service = RenderService(config.RENDER_WORKERS, config.RENDER_QUEUE_SIZE, config.RENDER_TIMEOUT_SECONDS)
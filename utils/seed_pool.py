@@ -0,0 +1,156 @@
+"""
+サーバーシードプール
+サーバーシードと SHA-256 ハッシュ（コミットメント）を事前に生成しておき、ゲーム開始時はすぐに取り出せるようにします
+
+    - 補充: 残りが PF_SEED_POOL_LOW_WATER を下回るとバックグラウンドで PF_SEED_POOL_SIZE まで生成
+    - 枯渇時: プールが空なら、その場で1つ生成して返す（seed_pool_misses_total に記録）
+    - シードの使い方（PF_SEED_MODE）:
+        game: ゲームごとにプールから新しいシードを取り出し、ゲーム終了時に公開
+        rotate: ユーザーごとのシード（と次のシードのハッシュ）を pf_params に保持し、
+                nonce を進めて使い回す。?シード 変更 で次のシードに切り替え、使い終わったシードを公開
+"""
+import asyncio
+import secrets
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+import config
+from database import async_db
+from utils.metrics import metrics
+from utils.sys import generate_server_seed, hash_server_seed
+
+# ========================================
+# メトリクス
+# ========================================
+SEED_POOL_SIZE = metrics.gauge("seed_pool_size", "事前生成済みのサーバーシード数")
+SEED_POOL_MISSES = metrics.counter("seed_pool_misses_total", "プールが空でその場で生成したシード数")
+SEED_POOL_GENERATED = metrics.counter("seed_pool_generated_total", "バックグラウンドで生成したシード数")
+
+
+@dataclass(frozen=True)
+class SeedCommitment:
+    """サーバーシードとそのハッシュ"""
+    server_seed: str
+    server_seed_hash: str
+
+
+def new_commitment() -> SeedCommitment:
+    """サーバーシードを1つ生成"""
+    seed = generate_server_seed()
+    return SeedCommitment(seed, hash_server_seed(seed))
+
+
+class SeedPool:
+    """事前生成したサーバーシードのプール"""
+
+    def __init__(self, size: int, low_water: int):
+        self.size = size
+        self.low_water = low_water
+        self._seeds: deque[SeedCommitment] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._seeds)
+
+    def pop(self) -> SeedCommitment:
+        """シードを1つ取り出す（残りが少なければ補充を依頼）"""
+        try:
+            commitment = self._seeds.popleft()
+        except IndexError:
+            SEED_POOL_MISSES.inc()
+            commitment = new_commitment()
+
+        SEED_POOL_SIZE.set(len(self._seeds))
+        if len(self._seeds) < self.low_water and self._wakeup is not None:
+            self._wakeup.set()
+        return commitment
+
+    def fill(self) -> int:
+        """プールを上限まで補充（同期、生成した数を返す）"""
+        count = max(self.size - len(self._seeds), 0)
+        self._seeds.extend(new_commitment() for _ in range(count))
+        SEED_POOL_GENERATED.inc(count)
+        SEED_POOL_SIZE.set(len(self._seeds))
+        return count
+
+    # ========================================
+    # ライフサイクル
+    # ========================================
+    def start(self) -> None:
+        """バックグラウンドの補充処理を開始（イベントループ内で呼ぶ）"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.fill)
+            except Exception as e:
+                print(f"[ERROR] シードプールの補充に失敗: {e}")
+
+    async def stop(self) -> None:
+        """バックグラウンド処理を停止"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+seed_pool = SeedPool(config.PF_SEED_POOL_SIZE, config.PF_SEED_POOL_LOW_WATER)
+
+
+# ========================================
+# ゲーム開始時のシード取得
+# ========================================
+@dataclass(frozen=True)
+class GameSeed:
+    """
+    ゲーム1回分のPFパラメータ
+
+    Attributes:
+        reveal: ゲーム終了時にサーバーシードを公開してよいか（rotate では次のシードへの変更まで非公開）
+    """
+    client_seed: str
+    server_seed: str
+    server_seed_hash: str
+    nonce: int
+    reveal: bool
+
+
+def rotates_seeds() -> bool:
+    """ユーザーごとのシードを使い回すか"""
+    return config.PF_SEED_MODE == "rotate"
+
+
+async def acquire_game_seed(user_id: int, nonces: int = 1) -> GameSeed:
+    """
+    ゲーム開始時のPFパラメータを取得
+
+    Args:
+        user_id: ユーザーID
+        nonces: このゲームで使うnonceの数（rotate では nonce..nonce+nonces-1 を予約）
+    """
+    if rotates_seeds():
+        # 初回のみシードペアを作成（DBスレッドで呼ばれるためプールではなくその場で生成）
+        doc = await async_db.acquire_pf_seed(user_id, nonces, new_commitment)
+        return GameSeed(doc["client_seed"], doc["server_seed"], doc["server_seed_hash"], doc["nonce"], False)
+
+    client_seed, nonce = await async_db.load_pf_params(user_id)
+    commitment = seed_pool.pop()
+    return GameSeed(
+        client_seed or secrets.token_hex(8),
+        commitment.server_seed,
+        commitment.server_seed_hash,
+        nonce or 0,
+        True
+    )
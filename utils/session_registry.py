@@ -0,0 +1,259 @@
+"""
+ゲームセッションレジストリ
+各ゲームのセッションストアを一か所で管理し、同時進行数の上限・放置セッションの精算・ボタンの後始末を行います
+
+    - 上限: ユーザーごと（SESSION_MAX_PER_USER）と全体（SESSION_MAX_GLOBAL）の同時進行数
+    - 放置: ゲームごとの放置タイムアウト（SESSION_IDLE_TIMEOUTS）を過ぎたセッションを
+            SESSION_EXPIRE_ACTIONS に従って refund / cashout / forfeit で精算
+            （カードや目標ポイントなど結果に関わる情報を見せた後のセッションは refund せず forfeit。
+              見てから放置して賭け金を取り戻せないようにする）
+    - 排他: 精算はユーザーの処理中ロック（utils.rate_limit.user_locks）を取ってから行い、
+            処理中のボタン操作と同じセッションを二重に精算しない
+    - ボタン: timeout=None のViewは discord.py に登録されたままになるため、
+              セッションが終わったものを sweep() で stop() して登録を解除
+
+各ゲームモジュールはストア作成後に session_registry.register() で登録し、
+Viewの作成時に track_view() で紐付けます。
+"""
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import bson
+import discord
+
+import config
+from database import async_db
+from database.result_writer import game_result_writer
+from database.session_store import SessionStore
+from utils.logs import log_transaction
+from utils.metrics import metrics
+from utils.rate_limit import user_locks
+
+EXPIRE_ACTIONS = ("refund", "cashout", "forfeit")
+
+# ========================================
+# メトリクス
+# ========================================
+SESSIONS_ACTIVE = metrics.gauge("game_sessions_active", "進行中のゲームセッション数")
+SESSIONS_BYTES = metrics.gauge("game_sessions_bytes", "進行中セッションのスナップショットサイズ合計（バイト）")
+SESSION_VIEWS = metrics.gauge("game_session_views", "追跡中のボタンView数")
+SESSIONS_REJECTED = metrics.counter("game_sessions_rejected_total", "上限により開始を拒否したゲーム数")
+SESSIONS_EXPIRED = metrics.counter("game_sessions_expired_total", "放置により精算したセッション数")
+SESSIONS_SETTLED = metrics.counter("game_sessions_settled_amount_total", "放置セッションの精算で支払った額")
+VIEWS_STOPPED = metrics.counter("game_session_views_stopped_total", "終了したセッションから登録解除したView数")
+SWEEP_SECONDS = metrics.histogram("game_session_sweep_seconds", "放置セッション掃除の所要時間（秒）")
+
+
+@dataclass(frozen=True)
+class GameSessionSpec:
+    """
+    レジストリに登録するゲームの定義
+
+    Attributes:
+        name: ゲーム名（ストア名・ログのゲームタイプと同じ）
+        store: セッションストア（user_id → セッション）
+        bet_of: セッション → 賭け金
+        cashout_of: セッション → その時点の払い戻し額（cashout に対応しないゲームはNone）
+        restore_views: 再起動後にボタンを再登録する関数（bot → 再登録数）
+        on_expire: 放置で精算したセッションに対する後処理（ゲーム終了フラグを立てるなど）
+        pf_record_of: (user_id, セッション) → 検証用のPF記録（database.pf_records）
+        revealed_of: セッション → 結果に関わる情報（カード・目標ポイント・開いたマスなど）を見せたか
+                     （Trueのセッションは refund せず forfeit。Noneなら常に見せたものとみなす）
+    """
+    name: str
+    store: SessionStore
+    bet_of: Callable[[Any], int]
+    cashout_of: Optional[Callable[[Any], int]] = None
+    restore_views: Optional[Callable[[Any], int]] = None
+    on_expire: Optional[Callable[[Any], None]] = None
+    pf_record_of: Optional[Callable[[int, Any], dict]] = None
+    revealed_of: Optional[Callable[[Any], bool]] = None
+
+    @property
+    def expire_action(self) -> str:
+        """放置時の精算方法（不明な値・cashout 非対応のゲームでは forfeit）"""
+        action = config.SESSION_EXPIRE_ACTIONS.get(self.name, "forfeit")
+        if action not in EXPIRE_ACTIONS:
+            print(f"[WARN] 不明な精算方法 {action!r}（{self.name}）のため forfeit を使用します")
+            return "forfeit"
+        if action == "cashout" and self.cashout_of is None:
+            return "forfeit"
+        return action
+
+    def expire_action_for(self, session: Any) -> str:
+        """セッションの精算方法（情報を見せた後のセッションは refund せず forfeit）"""
+        action = self.expire_action
+        if action == "refund" and (self.revealed_of is None or self.revealed_of(session)):
+            return "forfeit"
+        return action
+
+
+class SessionRegistry:
+    """ゲームセッションの中央レジストリ"""
+
+    def __init__(self, max_per_user: int, max_global: int):
+        self.max_per_user = max_per_user
+        self.max_global = max_global
+        self._specs: dict[str, GameSessionSpec] = {}
+        self._views: dict[tuple[str, int], weakref.WeakSet] = {}
+
+    # ========================================
+    # 登録
+    # ========================================
+    def register(self, spec: GameSessionSpec) -> None:
+        """ゲームを登録"""
+        self._specs[spec.name] = spec
+
+    @property
+    def specs(self) -> list[GameSessionSpec]:
+        return list(self._specs.values())
+
+    def track_view(self, game: str, user_id: int, view: discord.ui.View) -> None:
+        """セッションのボタンViewを紐付け（セッション終了後に sweep() で stop() する）"""
+        self._views.setdefault((game, user_id), weakref.WeakSet()).add(view)
+
+    # ========================================
+    # 上限チェック
+    # ========================================
+    def count_user_sessions(self, user_id: int) -> int:
+        """ユーザーの進行中セッション数"""
+        return sum(1 for spec in self._specs.values() if user_id in spec.store)
+
+    def count_sessions(self) -> int:
+        """全体のセッション数（精算待ちの放置セッションを含む）"""
+        return sum(len(spec.store) for spec in self._specs.values())
+
+    def check_start(self, game: str, user_id: int) -> Optional[str]:
+        """
+        新しいゲームを開始できるか確認
+
+        Returns:
+            Optional[str]: 開始できない場合はユーザー向けの理由、開始できる場合はNone
+        """
+        spec = self._specs.get(game)
+        if spec is not None and user_id in spec.store:
+            SESSIONS_REJECTED.inc(game=game, reason="duplicate")
+            return "進行中のゲームがあります。終了してから新しいゲームを開始してください。"
+        if self.count_user_sessions(user_id) >= self.max_per_user:
+            SESSIONS_REJECTED.inc(game=game, reason="user_limit")
+            return f"同時に進行できるゲームは{self.max_per_user}つまでです。"
+        if self.count_sessions() >= self.max_global:
+            SESSIONS_REJECTED.inc(game=game, reason="global_limit")
+            return "現在ゲームが混み合っています。しばらくしてからお試しください。"
+        return None
+
+    # ========================================
+    # 復元
+    # ========================================
+    def restore(self, bot) -> dict[str, int]:
+        """
+        全ゲームのセッションをスナップショットから復元し、ボタンを再登録
+
+        Returns:
+            dict: ゲーム名 → 再登録したゲーム数
+        """
+        counts = {}
+        for spec in self._specs.values():
+            try:
+                spec.store.restore()
+                counts[spec.name] = spec.restore_views(bot) if spec.restore_views else 0
+            except Exception as e:
+                print(f"[ERROR] {spec.name} セッションの復元に失敗: {e}")
+        self.refresh_metrics()
+        return counts
+
+    # ========================================
+    # 放置セッションの精算
+    # ========================================
+    async def _settle(self, spec: GameSessionSpec, user_id: int, session: Any) -> None:
+        action = spec.expire_action_for(session)
+        bet = int(spec.bet_of(session))
+
+        if spec.on_expire is not None:
+            spec.on_expire(session)
+        if spec.pf_record_of is not None:
+            game_result_writer.record_pf(spec.pf_record_of(user_id, session))
+
+        if action == "refund":
+            amount = bet
+            await async_db.update_user_balance(user_id, amount)
+        elif action == "cashout":
+            amount = int(spec.cashout_of(session))
+            await async_db.update_user_balance(user_id, amount)
+            log_transaction(user_id, spec.name, bet, amount)
+        else:
+            amount = 0
+            log_transaction(user_id, spec.name, bet, 0)
+
+        SESSIONS_EXPIRED.inc(game=spec.name, action=action)
+        SESSIONS_SETTLED.inc(amount, game=spec.name, action=action)
+        print(f"[SESSION] {spec.name} user={user_id} idle timeout → {action} {amount}")
+
+    def _stop_finished_views(self) -> int:
+        """セッションが終わったユーザーのViewを stop() して discord.py の登録を解除"""
+        stopped = 0
+        for key in list(self._views):
+            game, user_id = key
+            spec = self._specs.get(game)
+            if spec is not None and user_id in spec.store:
+                continue
+            for view in list(self._views.pop(key)):
+                if not view.is_finished():
+                    view.stop()
+                    stopped += 1
+        VIEWS_STOPPED.inc(stopped)
+        return stopped
+
+    async def sweep(self) -> dict[str, int]:
+        """
+        放置タイムアウトを過ぎたセッションを精算し、終了したセッションのViewを登録解除
+
+        Returns:
+            dict: {"expired": 精算したセッション数, "views": 登録解除したView数}
+        """
+        started = time.perf_counter()
+        expired = 0
+        for spec in self._specs.values():
+            for user_id in spec.store.expired_keys():
+                # 処理中のボタン操作が終わるのを待ってから、まだ放置されている場合のみ精算する
+                async with user_locks.hold(user_id, config.GAME_LOCK_WAIT_SECONDS, source="sweep") as acquired:
+                    if not acquired:
+                        continue  # 操作中のため次回の掃除で確認する
+                    session = spec.store.evict_if_expired(user_id)
+                    if session is None:
+                        continue
+                    try:
+                        await self._settle(spec, user_id, session)
+                        expired += 1
+                    except Exception as e:
+                        print(f"[ERROR] {spec.name} user={user_id} の放置セッション精算に失敗: {e}")
+
+        views = self._stop_finished_views()
+        self.refresh_metrics()
+        SWEEP_SECONDS.observe(time.perf_counter() - started)
+        return {"expired": expired, "views": views}
+
+    # ========================================
+    # メトリクス
+    # ========================================
+    def refresh_metrics(self) -> None:
+        """セッション数・スナップショットサイズ・View数のゲージを更新"""
+        view_counts: dict[str, int] = {}
+        for (game, _), views in self._views.items():
+            view_counts[game] = view_counts.get(game, 0) + len(views)
+
+        for spec in self._specs.values():
+            size = 0
+            for _, session in spec.store.items():
+                try:
+                    size += len(bson.encode({"data": spec.store.encode(session)}))
+                except Exception:
+                    pass
+            SESSIONS_ACTIVE.set(len(spec.store), game=spec.name)
+            SESSIONS_BYTES.set(size, game=spec.name)
+            SESSION_VIEWS.set(view_counts.get(spec.name, 0), game=spec.name)
+
+
+session_registry = SessionRegistry(config.SESSION_MAX_PER_USER, config.SESSION_MAX_GLOBAL)
@@ -0,0 +1,164 @@
+"""
+起動処理ユーティリティ
+起動処理の各ステップの所要時間を記録し、依存関係のないステップを並行して実行します
+
+    timer = StartupTimer("bootstrap")
+    with timer.step("mongo"):
+        ...
+    print(timer.report())
+
+    orchestrator = StartupOrchestrator("on_ready")
+    orchestrator.add(StartupStep("tree_sync", sync_tree, after=("table_commands",)))
+    await orchestrator.run()
+
+各ステップの時間は startup_step_seconds（phase・step ラベル）にも記録します。
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterator, Optional
+
+from utils.metrics import metrics
+
+STARTUP_STEP_SECONDS = metrics.histogram("startup_step_seconds", "起動処理の各ステップの所要時間（秒）")
+STARTUP_SECONDS = metrics.gauge("startup_seconds", "起動処理の所要時間（秒）")
+
+
+class StartupTimer:
+    """起動処理のステップごとの所要時間"""
+
+    def __init__(self, phase: str, started: Optional[float] = None):
+        """
+        Args:
+            phase: 起動処理の名前（bootstrap / on_ready など）
+            started: 計測の開始時刻（time.perf_counter()、省略時は現在）
+        """
+        self.phase = phase
+        self.started = started if started is not None else time.perf_counter()
+        # (ステップ名, 所要時間, 状態)
+        self.steps: list[tuple[str, float, str]] = []
+
+    def record(self, name: str, seconds: float, status: str = "ok") -> None:
+        """ステップの所要時間を記録"""
+        self.steps.append((name, seconds, status))
+        STARTUP_STEP_SECONDS.observe(seconds, phase=self.phase, step=name)
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """with ブロックの所要時間を記録（例外は記録してから再送出）"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(name, time.perf_counter() - started, "error")
+            raise
+        self.record(name, time.perf_counter() - started)
+
+    @property
+    def elapsed(self) -> float:
+        """開始からの経過時間（秒）"""
+        return time.perf_counter() - self.started
+
+    def report(self) -> str:
+        """ステップごとの所要時間の表"""
+        total = self.elapsed
+        STARTUP_SECONDS.set(total, phase=self.phase)
+        width = max([len(name) for name, _, _ in self.steps] + [5])
+        lines = [f"[STARTUP] {self.phase}", f"  {'step':<{width}}  {'seconds':>8}  status"]
+        for name, seconds, status in self.steps:
+            lines.append(f"  {name:<{width}}  {seconds:>8.3f}  {status}")
+        lines.append(f"  {'total':<{width}}  {total:>8.3f}")
+        return "\n".join(lines)
+
+
+# ========================================
+# 並行実行
+# ========================================
+@dataclass(frozen=True)
+class StartupStep:
+    """
+    起動処理の1ステップ
+
+    Attributes:
+        name: ステップ名（タイミング表・依存関係の指定に使用）
+        func: 実行する関数
+        after: 完了を待つステップ名（失敗・スキップしたステップも完了とみなす）
+        background: 完了を待たずにバックグラウンドで実行するか（重い集計・送信など）
+        once: プロセス中に1回だけ成功すればよいか（False なら再接続時の on_ready でも毎回実行）
+    """
+    name: str
+    func: Callable[[], Awaitable[None]]
+    after: tuple[str, ...] = ()
+    background: bool = False
+    once: bool = True
+
+
+class StartupOrchestrator:
+    """依存関係に従ってステップを並行に実行する起動処理"""
+
+    def __init__(self, phase: str):
+        self.phase = phase
+        self._steps: list[StartupStep] = []
+        self._completed: set[str] = set()
+        self._background: set[asyncio.Task] = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def add(self, step: StartupStep) -> None:
+        """ステップを追加（after に指定するステップより後に追加する）"""
+        known = {s.name for s in self._steps}
+        missing = [name for name in step.after if name not in known]
+        if missing:
+            raise ValueError(f"{step.name} の依存ステップ {missing} が登録されていません")
+        self._steps.append(step)
+
+    async def _run_step(self, step: StartupStep, timer: StartupTimer, deps: list[asyncio.Task]) -> None:
+        if deps:
+            await asyncio.gather(*deps, return_exceptions=True)
+        started = time.perf_counter()
+        try:
+            await step.func()
+        except Exception as e:
+            timer.record(step.name, time.perf_counter() - started, "error")
+            print(f"[ERROR] 起動処理 {self.phase}/{step.name} に失敗: {e}")
+            return
+        seconds = time.perf_counter() - started
+        timer.record(step.name, seconds, "background" if step.background else "ok")
+        if step.once:
+            self._completed.add(step.name)
+        if step.background:
+            print(f"[STARTUP] {self.phase}/{step.name} {seconds:.3f}s（バックグラウンド）")
+
+    async def run(self) -> StartupTimer:
+        """
+        全ステップを実行（バックグラウンドのステップは完了を待たない）
+
+        同時に呼ばれた場合は前の実行が終わるまで待ちます。
+        once のステップは成功済みならスキップし、失敗したものは次回の実行で再試行します。
+
+        Returns:
+            StartupTimer: 待機したステップの所要時間
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            timer = StartupTimer(self.phase)
+            tasks: dict[str, asyncio.Task] = {}
+            waited: list[asyncio.Task] = []
+            for step in self._steps:
+                running = next((t for t in self._background if t.get_name() == step.name), None)
+                if step.once and step.name in self._completed or running is not None:
+                    timer.record(step.name, 0.0, "skipped")
+                    continue
+                deps = [tasks[name] for name in step.after if name in tasks]
+                task = asyncio.create_task(self._run_step(step, timer, deps), name=step.name)
+                tasks[step.name] = task
+                if step.background:
+                    self._background.add(task)
+                    task.add_done_callback(self._background.discard)
+                else:
+                    waited.append(task)
+
+            await asyncio.gather(*waited)
+            return timer